@@ -0,0 +1,51 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Foreign key changelist filter picking the related object with the admin
+    autocomplete, where RelatedFieldListFilter lists every related object.
+
+    The related model admin needs search_fields, and the model admin the
+    AutocompleteFilterMixin media.
+    """
+
+    template = "admin/autocomplete_filter.html"
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = f"{field_path}__{field.target_field.name}__exact"
+        self.lookup_val = params.get(self.lookup_kwarg)
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(
+                field, model_admin.admin_site, attrs={"data-width": "100%"}
+            ),
+            required=False,
+        )
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def choices(self, changelist):
+        # Rendered by the autocomplete widget, only the selected object is loaded
+        return []
+
+    def rendered_widget(self):
+        return self.form_field.widget.render(self.lookup_kwarg, self.lookup_val)
+
+
+class AutocompleteFilterMixin:
+    """
+    ModelAdmin mixin adding the media of AutocompleteFilter.
+    """
+
+    @property
+    def media(self):
+        return (
+            super().media
+            + AutocompleteSelect(None, self.admin_site).media
+            + forms.Media(js=["admin/js/autocomplete_filter.js"])
+        )
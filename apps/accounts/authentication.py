@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.authentication import TokenAuthentication
+
+from apps.monitoring.metrics import timing
+from mini_aspire.async_utils import database_sync_to_async
+
+
+def token_cache_key(key):
+    return f"auth-token:{key}"
+
+
+def token_cache_enabled():
+    # Invalidations of a process local cache would not reach the other workers
+    return settings.AUTH_TOKEN_CACHE_TIMEOUT > 0 and not isinstance(
+        caches[DEFAULT_CACHE_ALIAS], LocMemCache
+    )
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Token authentication with the token and its user cached.
+
+    - Saves the Token + User query of every authenticated request.
+    - Only with a cache shared by the worker processes (memcached, database),
+      tokens are looked up in the database with the process local LocMemCache
+      (the default) or when AUTH_TOKEN_CACHE_TIMEOUT is 0.
+    - Entries expire after AUTH_TOKEN_CACHE_TIMEOUT seconds.
+    - Entries are invalidated on token deletion and on any user save
+      (deactivation, password change), see apps.accounts.signals. Bulk updates
+      (QuerySet.update) send no signal, their users stay cached until their
+      entries expire.
+    - Invalid or inactive tokens are never cached.
+    """
+
+    def authenticate(self, request):
+        with timing("auth"):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        if not token_cache_enabled():
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        credentials = cache.get(cache_key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return credentials
+
+    async def authenticate_async(self, request):
+        """
+        authenticate() for async views, the cache and database lookups run in
+        a worker thread, the event loop is not blocked on cache misses.
+        """
+        return await database_sync_to_async(self.authenticate)(request)
@@ -0,0 +1,52 @@
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for admin changelists of large tables.
+
+    Unfiltered querysets are counted from the database statistics (PostgreSQL
+    pg_class, SQLite sqlite_stat1 after ANALYZE) instead of an exact COUNT(*)
+    scanning the table, when the estimate is over `estimate_above` rows.
+    Filtered querysets and small tables are counted exactly.
+    """
+
+    estimate_above = 10000
+
+    @cached_property
+    def count(self):
+        if not self.object_list.query.where:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and estimate > self.estimate_above:
+                return estimate
+        return super().count
+
+
+def estimated_count(queryset):
+    """
+    Estimated row count of the queryset's table, None when not available.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(%s)"
+    elif connection.vendor == "sqlite":
+        # A row per index, its stat starts with the table row count
+        sql = "SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1"
+    else:
+        return None
+
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 is only created by ANALYZE
+        return None
+    if row is None or row[0] is None:
+        return None
+    estimate = int(str(row[0]).split()[0])
+    # -1 or 0 when the table was never analyzed
+    return estimate if estimate > 0 else None
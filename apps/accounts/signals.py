@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from apps.accounts.authentication import token_cache_key
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    cache.delete(token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    # Cached users may be deactivated or have a new password
+    if created:
+        return
+    keys = Token.objects.filter(user=instance).values_list("key", flat=True)
+    cache.delete_many([token_cache_key(key) for key in keys])
@@ -0,0 +1,19 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Reload the changelist filtered by the picked object, see AutocompleteFilter
+    $(function() {
+        $('.autocomplete-filter select').on('change', function() {
+            const params = new URLSearchParams(window.location.search);
+            if (this.value) {
+                params.set(this.name, this.value);
+            } else {
+                params.delete(this.name);
+            }
+            // Back to the first page
+            params.delete('p');
+            window.location.search = params.toString();
+        });
+    });
+}
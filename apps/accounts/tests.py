@@ -1,9 +1,17 @@
+import tempfile
+
 from django.contrib.auth.models import User
+from django.test import override_settings
 
 from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 
+from apps.accounts.authentication import CachedTokenAuthentication
+
+LOCMEM_CACHE = "django.core.cache.backends.locmem.LocMemCache"
+
 
 class AccountTestCase(APITestCase):
     def setUp(self):
@@ -74,3 +82,91 @@ class AccountTestCase(APITestCase):
         response = request.json()
         self.assertEqual(request.status_code, status.HTTP_200_OK)
         self.assertEqual(response["token"], self.user_token.key)
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        # A cache shared by processes, tokens are not cached with LocMemCache
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        shared_cache = override_settings(
+            CACHES={
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": cache_dir.name,
+                }
+            }
+        )
+        shared_cache.enable()
+        self.addCleanup(shared_cache.disable)
+        self.authentication = CachedTokenAuthentication()
+
+        # Create user and token
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com", password="user@@password"
+        )
+        self.user_token = Token.objects.create(user=self.user)
+
+    def test_cached_token(self):
+        """
+        Test token and user are only queried on the first request
+        """
+        with self.assertNumQueries(1):
+            user, token = self.authentication.authenticate_credentials(
+                self.user_token.key
+            )
+        self.assertEqual(user, self.user)
+        self.assertEqual(token, self.user_token)
+
+        with self.assertNumQueries(0):
+            user, token = self.authentication.authenticate_credentials(
+                self.user_token.key
+            )
+        self.assertEqual(user, self.user)
+
+        # Invalid tokens are not cached
+        for _ in range(2):
+            with self.assertNumQueries(1), self.assertRaises(AuthenticationFailed):
+                self.authentication.authenticate_credentials("invalid")
+
+    def test_process_local_cache(self):
+        """
+        Test tokens are not cached with a process local cache
+        """
+        for settings in (
+            {"CACHES": {"default": {"BACKEND": LOCMEM_CACHE}}},
+            {"AUTH_TOKEN_CACHE_TIMEOUT": 0},
+        ):
+            with override_settings(**settings):
+                for _ in range(2):
+                    with self.assertNumQueries(1):
+                        user, _ = self.authentication.authenticate_credentials(
+                            self.user_token.key
+                        )
+                    self.assertEqual(user, self.user)
+
+    def test_cached_token_invalidation(self):
+        """
+        Test cached token invalidation on password change, deactivation and deletion
+        """
+        self.authentication.authenticate_credentials(self.user_token.key)
+
+        # Password change
+        self.user.set_password("new@@password")
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.authentication.authenticate_credentials(self.user_token.key)
+
+        # Deactivation
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.user_token.key)
+
+        # Token deletion
+        self.user.is_active = True
+        self.user.save()
+        self.authentication.authenticate_credentials(self.user_token.key)
+        self.user_token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authentication.authenticate_credentials(self.user_token.key)
@@ -1,19 +1,17 @@
 from django.contrib import admin
 
+from apps.accounts.admin_filters import AutocompleteFilter, AutocompleteFilterMixin
+from apps.accounts.paginators import EstimatedCountPaginator
+from apps.loans.choices import LoanState
 from apps.loans.models import Loan, LoanTerm
+from apps.loans.search import search_loans
+from apps.loans.summary import record_created, record_updated
 
 
 @admin.register(Loan)
-class LoanAdmin(admin.ModelAdmin):
-    search_fields = (
-        "id",
-        "user__first_name",
-        "user__last_name",
-        "user__username",
-        "user__email",
-        "term",
-        "state",
-    )
+class LoanAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
+    # Searched with the search index, see get_search_results
+    search_fields = ("search_document__document",)
     list_display = (
         "id",
         "user",
@@ -23,19 +21,62 @@ class LoanAdmin(admin.ModelAdmin):
         "approved_by",
         "approved_date",
     )
-    list_filter = ("user", "term", "state", "approved_by", "approved_date")
+    list_filter = (
+        ("user", AutocompleteFilter),
+        "term",
+        "state",
+        ("approved_by", AutocompleteFilter),
+        "approved_date",
+    )
+    # Users of the page in the same query, instead of a query per row
+    list_select_related = ("user", "approved_by")
+    autocomplete_fields = ("user", "approved_by")
+    # Served by the loan_created_idx index
+    date_hierarchy = "created"
+    ordering = ("-created",)
+    paginator = EstimatedCountPaginator
+    # No COUNT(*) of the unfiltered table on filtered pages
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        # Also the loan autocomplete of the loan term admin
+        return search_loans(queryset, search_term), False
+
+    def save_model(self, request, obj, form, change):
+        # Summary deltas of the loan, in the change form's transaction
+        if not change:
+            super().save_model(request, obj, form, change)
+            record_created([(obj.created, obj.amount)])
+            if obj.state != LoanState.PENDING:
+                record_updated(obj, LoanState.PENDING, obj.amount, 0)
+            return
+
+        before = (
+            Loan.objects.filter(pk=obj.pk)
+            .values_list("state", "amount", "outstanding_amount")
+            .get()
+        )
+        super().save_model(request, obj, form, change)
+        record_updated(obj, *before)
 
 
 @admin.register(LoanTerm)
-class LoanAdmin(admin.ModelAdmin):
-    search_fields = (
-        "id",
-        "loan__id",
-        "loan__user__first_name",
-        "loan__user__last_name",
-        "loan__user__username",
-        "loan__user__email",
+class LoanTermAdmin(AutocompleteFilterMixin, admin.ModelAdmin):
+    search_fields = ("loan__search_document__document",)
+    list_display = ("id", "loan", "amount", "due_date", "status", "paid_date")
+    list_filter = (
+        ("loan__user", AutocompleteFilter),
+        "due_date",
         "status",
+        "paid_date",
     )
-    list_display = ("id", "loan", "amount", "due_date", "status", "paid_date")
-    list_filter = ("due_date", "status", "paid_date")
+    # Loan terms display their loan and its user
+    list_select_related = ("loan__user",)
+    autocomplete_fields = ("loan",)
+    # Served by the loanterm_due_idx index
+    date_hierarchy = "due_date"
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        return search_loans(queryset, search_term, prefix="loan__"), False
@@ -0,0 +1,134 @@
+from datetime import time, timedelta
+from functools import partial
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.loans.choices import UNPAID_LOAN_TERM_STATUSES, LoanState, LoanTermStatus
+
+# (bucket, from days, to days) past due date, by day, to days excluded. Loan
+# terms are marked overdue on their due day, 0 days past due
+OVERDUE_BUCKETS = (
+    ("0-30", 0, 31),
+    ("31-60", 31, 61),
+    ("61-90", 61, 91),
+    ("90+", 91, None),
+)
+
+
+def _amount(value):
+    return round(value or 0, 2)
+
+
+def day_aligned(value):
+    """
+    Whether a created date filter falls on a summary day boundary.
+    """
+    return value is None or timezone.localtime(value).time() == time.min
+
+
+def overdue_aggregates(count, due_day, today, overdue=None):
+    """
+    Overdue loan terms count and amount aggregates, total and per bucket.
+
+    - count: aggregate counting loan terms, called with a filter.
+    - due_day: due day lookup, buckets are by days past due day.
+    - overdue: condition of overdue loan terms, if not all of them are.
+    """
+    aggregates = {
+        "overdue_count": count(filter=overdue),
+        "overdue_amount": Sum("amount", filter=overdue),
+    }
+    for i, (_, start, end) in enumerate(OVERDUE_BUCKETS):
+        condition = Q(**{f"{due_day}__lte": today - timedelta(days=start)})
+        if overdue is not None:
+            condition &= overdue
+        if end is not None:
+            condition &= Q(**{f"{due_day}__gt": today - timedelta(days=end)})
+        aggregates[f"overdue_{i}_count"] = count(filter=condition)
+        aggregates[f"overdue_{i}_amount"] = Sum("amount", filter=condition)
+    return aggregates
+
+
+def portfolio_analytics(
+    loans, loan_terms, summaries=None, overdue_summaries=None, now=None
+):
+    """
+    Portfolio totals computed in the database, with two grouped queries.
+
+    Overdue amounts are of loan terms marked overdue (see sweep_overdue).
+
+    - loans: loans queryset, grouped by state.
+    - loan_terms: loan terms of the same loans, aggregated with conditional
+      expressions for collected, outstanding and overdue amounts.
+    - summaries, overdue_summaries: optional PortfolioSummary and
+      OverdueSummary querysets of the same loans, totals are then read from
+      them alone, their size does not depend on the number of loans.
+    """
+    today = timezone.localdate(now or timezone.now())
+
+    if summaries is None:
+        by_state = {
+            row["state"]: row
+            for row in loans.order_by()
+            .values("state")
+            .annotate(count=Count("id"), amount=Sum("amount"))
+        }
+        totals = loan_terms.aggregate(
+            collected_amount=Sum("paid_amount", filter=Q(status=LoanTermStatus.PAID)),
+            outstanding_amount=Sum(
+                "amount", filter=Q(status__in=UNPAID_LOAN_TERM_STATUSES)
+            ),
+            **overdue_aggregates(
+                partial(Count, "id"),
+                "due_date__date",
+                today,
+                overdue=Q(status=LoanTermStatus.OVERDUE),
+            ),
+        )
+    else:
+        by_state = {
+            row["state"]: row
+            for row in summaries.order_by()
+            .values("state")
+            .annotate(
+                count=Sum("loans_count"),
+                amount=Sum("amount"),
+                collected_amount=Sum("collected_amount"),
+                outstanding_amount=Sum("outstanding_amount"),
+            )
+        }
+        totals = overdue_summaries.aggregate(
+            **overdue_aggregates(partial(Sum, "terms_count"), "due_day", today)
+        )
+        for field in ("collected_amount", "outstanding_amount"):
+            totals[field] = sum(row[field] or 0 for row in by_state.values())
+
+    return {
+        "loans": {
+            "count": sum(row["count"] or 0 for row in by_state.values()),
+            "amount": _amount(sum(row["amount"] or 0 for row in by_state.values())),
+        },
+        "by_state": [
+            {
+                "state": state,
+                "count": by_state.get(state, {}).get("count") or 0,
+                "amount": _amount(by_state.get(state, {}).get("amount")),
+            }
+            for state in LoanState.values
+        ],
+        "collected_amount": _amount(totals["collected_amount"]),
+        "outstanding_amount": _amount(totals["outstanding_amount"]),
+        "overdue": {
+            "count": totals["overdue_count"] or 0,
+            "amount": _amount(totals["overdue_amount"]),
+            "buckets": [
+                {
+                    "bucket": bucket,
+                    "count": totals[f"overdue_{i}_count"] or 0,
+                    "amount": _amount(totals[f"overdue_{i}_amount"]),
+                }
+                for i, (bucket, _, _) in enumerate(OVERDUE_BUCKETS)
+            ],
+        },
+    }
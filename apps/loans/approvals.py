@@ -0,0 +1,108 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, DateTimeField, F, FloatField, Value, When
+from django.utils import timezone
+
+from apps.loans.choices import LoanState
+from apps.loans.models import Loan, LoanTerm
+from apps.loans.schedules import build_schedules
+from apps.loans.summary import record_approved
+
+# Loan terms per INSERT, databases may lower it (SQLite variable limit)
+LOAN_TERM_BATCH_SIZE = 1000
+
+
+def approve_loans(loan_ids, approved_by):
+    """
+    Approve pending loans and create their loan terms (weekly).
+
+    - Loan states and balances are updated with a single UPDATE.
+    - Loan terms of every loan are created with batched INSERTs.
+
+    Returns a result per loan id, in the given order: the new loan state or an
+    error for loans which can not be approved.
+    """
+    loan_ids = list(dict.fromkeys(loan_ids))
+    now = timezone.now()
+
+    with transaction.atomic():
+        loans = {
+            loan["id"]: loan
+            for loan in Loan.objects.select_for_update()
+            .filter(pk__in=loan_ids)
+            .values("id", "state", "amount", "term", "created")
+        }
+        pending = [
+            loans[loan_id]
+            for loan_id in loan_ids
+            if loan_id in loans and loans[loan_id]["state"] == LoanState.PENDING
+        ]
+
+        if pending:
+            schedules = build_schedules(
+                [loan["amount"] for loan in pending],
+                [loan["term"] for loan in pending],
+                now,
+            )
+
+            # Loans sharing a first loan term are updated by the same WHEN
+            next_terms = defaultdict(list)
+            for loan, schedule in zip(pending, schedules):
+                next_terms[(schedule.amounts[0], schedule.due_dates[0])].append(
+                    loan["id"]
+                )
+
+            Loan.objects.filter(
+                pk__in=[loan["id"] for loan in pending], state=LoanState.PENDING
+            ).update(
+                state=LoanState.APPROVED,
+                approved_by=approved_by,
+                approved_date=now,
+                updated=now,
+                outstanding_amount=F("amount"),
+                paid_terms_count=0,
+                next_due_amount=Case(
+                    *(
+                        When(pk__in=ids, then=Value(amount))
+                        for (amount, _), ids in next_terms.items()
+                    ),
+                    output_field=FloatField(),
+                ),
+                next_due_date=Case(
+                    *(
+                        When(pk__in=ids, then=Value(due_date))
+                        for (_, due_date), ids in next_terms.items()
+                    ),
+                    output_field=DateTimeField(),
+                ),
+            )
+            LoanTerm.objects.bulk_create(
+                (
+                    LoanTerm(loan_id=loan["id"], amount=amount, due_date=due_date)
+                    for loan, schedule in zip(pending, schedules)
+                    for amount, due_date in zip(*schedule)
+                ),
+                batch_size=LOAN_TERM_BATCH_SIZE,
+            )
+            record_approved((loan["created"], loan["amount"]) for loan in pending)
+
+    results = []
+    for loan_id in loan_ids:
+        loan = loans.get(loan_id)
+        if loan is None:
+            results.append({"id": loan_id, "error": "Loan does not exist"})
+        elif loan["state"] == LoanState.PAID:
+            results.append(
+                {
+                    "id": loan_id,
+                    "error": f"Loan is already {LoanState.PAID}, no action is possible",
+                }
+            )
+        elif loan["state"] == LoanState.APPROVED:
+            results.append(
+                {"id": loan_id, "error": f"Loan is already {LoanState.APPROVED}"}
+            )
+        else:
+            results.append({"id": loan_id, "state": LoanState.APPROVED})
+    return results
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LoansConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.loans"
+
+    def ready(self):
+        from apps.loans import signals  # noqa: F401
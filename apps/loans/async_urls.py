@@ -0,0 +1,9 @@
+from django.urls import path
+
+from apps.loans import async_views
+
+urlpatterns = [
+    path("", async_views.loan_list, name="async-loan-list"),
+    path("<str:pk>/", async_views.loan_retrieve, name="async-loan-detail"),
+    path("<str:pk>/terms/", async_views.loan_term_list, name="async-loan-terms"),
+]
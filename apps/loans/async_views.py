@@ -0,0 +1,143 @@
+"""
+Async loan read endpoints (list, retrieve, terms), for the ASGI application.
+
+Same query params, output, access rules and conditional GET as LoanViewSet.
+Token authentication and database work run in the thread pool, the event loop
+keeps serving other requests while a query is in flight.
+"""
+
+from functools import wraps
+
+from django.http import Http404, HttpResponse
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    NotFound,
+)
+from rest_framework.request import Request
+
+from apps.accounts.authentication import CachedTokenAuthentication
+from apps.loans.etags import conditional_response, loans_validators, set_validators
+from apps.loans.reads import (
+    loan_access_validators,
+    loan_detail,
+    loan_terms,
+    loans_pagination_class,
+    loans_queryset,
+)
+from apps.loans.representations import LOAN_COLUMNS, loan_representations
+from apps.loans.serializers import LoanListQuerySerializer
+from mini_aspire.async_utils import database_sync_to_async
+from mini_aspire.renderers import FastJSONRenderer
+
+authentication = CachedTokenAuthentication()
+renderer = FastJSONRenderer()
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(
+        renderer.render(data), content_type=renderer.media_type, status=status
+    )
+
+
+def error_response(exc):
+    response = json_response({"detail": exc.detail}, status=exc.status_code)
+    if isinstance(exc, (AuthenticationFailed, NotAuthenticated)):
+        response["WWW-Authenticate"] = authentication.authenticate_header(None)
+    return response
+
+
+def async_api_view(view):
+    """
+    GET only, token authenticated async view.
+
+    API errors (authentication, permission, not found) are returned as JSON
+    error responses, as with DRF views. Reads go to the read replica when one
+    is configured, see mini_aspire.db_routers.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != "GET":
+            response = json_response(
+                {"detail": f'Method "{request.method}" not allowed.'},
+                status=status.HTTP_405_METHOD_NOT_ALLOWED,
+            )
+            response["Allow"] = "GET"
+            return response
+
+        try:
+            credentials = await authentication.authenticate_async(request)
+            if credentials is None:
+                raise NotAuthenticated()
+            request.user, request.auth = credentials
+            return await view(request, *args, **kwargs)
+        except Http404:
+            return error_response(NotFound())
+        except APIException as exc:
+            return error_response(exc)
+
+    wrapper.replica_reads = True
+    return wrapper
+
+
+@database_sync_to_async
+def _loan_list(request, query_params):
+    queryset = loans_queryset(request.user, query_params)
+    paginator = loans_pagination_class(query_params)()
+    page = paginator.paginate_queryset(queryset.values(*LOAN_COLUMNS), Request(request))
+
+    # Not modified, skip loading loan terms and serializing loans
+    validators = loans_validators(page, request, paginator)
+    response = conditional_response(request, validators)
+    if response is not None:
+        return response
+
+    data = paginator.get_paginated_response(
+        loan_representations(page, terms=query_params.get("terms"))
+    ).data
+    return set_validators(json_response(data), validators)
+
+
+@database_sync_to_async
+def _loan_read(request, loan_id, read):
+    validators = loan_access_validators(loan_id, request.user)
+
+    # Not modified, skip loading and serializing the loan
+    response = conditional_response(request, validators)
+    if response is not None:
+        return response
+
+    data = read(loan_id)
+    if data is None:
+        raise Http404
+    return set_validators(json_response(data), validators)
+
+
+@async_api_view
+async def loan_list(request):
+    """
+    List loans endpoint, see LoanViewSet.list.
+    """
+    query_serializer = LoanListQuerySerializer(data=request.GET)
+    if not query_serializer.is_valid():
+        return json_response(query_serializer.errors, status.HTTP_400_BAD_REQUEST)
+    return await _loan_list(request, query_serializer.data)
+
+
+@async_api_view
+async def loan_retrieve(request, pk):
+    """
+    Get a loan details endpoint, see LoanViewSet.retrieve.
+    """
+    return await _loan_read(request, pk, loan_detail)
+
+
+@async_api_view
+async def loan_term_list(request, pk):
+    """
+    Get loan terms of a loan endpoint, see LoanViewSet.terms.
+    """
+    return await _loan_read(request, pk, loan_terms)
@@ -9,4 +9,25 @@ class LoanState(models.TextChoices):
 
 class LoanTermStatus(models.TextChoices):
     PENDING = "pending", "Pending"
+    OVERDUE = "overdue", "Overdue"
     PAID = "paid", "Paid"
+
+
+# Loan terms which are still to be paid, overdue ones are marked by sweep_overdue
+UNPAID_LOAN_TERM_STATUSES = (LoanTermStatus.PENDING, LoanTermStatus.OVERDUE)
+
+
+class LoanPagination(models.TextChoices):
+    PAGE = "page", "Page number"
+    CURSOR = "cursor", "Cursor"
+
+
+class LoanTermFrequency(models.TextChoices):
+    WEEKLY = "weekly", "Weekly"
+    BIWEEKLY = "biweekly", "Biweekly"
+    MONTHLY = "monthly", "Monthly"
+
+
+class LoanFileFormat(models.TextChoices):
+    CSV = "csv", "CSV"
+    NDJSON = "ndjson", "NDJSON"
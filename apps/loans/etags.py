@@ -0,0 +1,88 @@
+"""
+Conditional GET validators for loans.
+
+A loan's validators are computed with a single aggregate query, a 304 Not
+Modified response is returned without loading or serializing the loan. A list
+page's validators are computed from the rows of the page being served, a 304
+Not Modified response skips loading loan terms and serializing loans. Writes to
+loan terms (approval, repayment) also touch their loan, so loan.updated is
+enough for list pages.
+"""
+
+import hashlib
+from collections import namedtuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from apps.loans.models import Loan
+
+Validators = namedtuple("Validators", ("user_id", "etag", "last_modified"))
+
+
+def make_etag(*parts):
+    value = ":".join(str(part) for part in parts)
+    return quote_etag(hashlib.md5(value.encode()).hexdigest())
+
+
+def loan_validators(loan_id):
+    """
+    Validators of a loan, from the loan's and its loan terms' updated timestamps.
+    """
+    try:
+        loan = (
+            Loan.objects.filter(pk=loan_id)
+            .values("id", "user_id", "updated")
+            .annotate(terms=Count("loan_term"), terms_updated=Max("loan_term__updated"))
+            .first()
+        )
+    except (TypeError, ValueError, ValidationError):
+        loan = None
+    if loan is None:
+        raise Http404
+
+    last_modified = max(filter(None, (loan["updated"], loan["terms_updated"])))
+    etag = make_etag(loan["id"], loan["updated"], loan["terms"], loan["terms_updated"])
+    return Validators(loan["user_id"], etag, last_modified)
+
+
+def loans_validators(rows, request, paginator=None):
+    """
+    Validators of a page of loans, from the ids and updated timestamps of its
+    rows, and the paginator's count and links when paginated.
+    """
+    # Count and links, without the results
+    links = paginator.get_paginated_response([]).data if paginator else None
+    last_modified = max((row["updated"] for row in rows), default=None)
+    etag = make_etag(
+        request.user.pk,
+        request.get_full_path(),
+        links,
+        *(f"{row['id']}@{row['updated']}" for row in rows),
+    )
+    return Validators(request.user.pk, etag, last_modified)
+
+
+def set_validators(response, validators):
+    response["ETag"] = validators.etag
+    if validators.last_modified:
+        response["Last-Modified"] = http_date(validators.last_modified.timestamp())
+    return response
+
+
+def conditional_response(request, validators):
+    """
+    Return a 304 Not Modified response when the client copy is fresh.
+    """
+    last_modified = validators.last_modified
+    response = get_conditional_response(
+        request,
+        etag=validators.etag,
+        last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+    if response is not None:
+        return set_validators(response, validators)
+    return None
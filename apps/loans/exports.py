@@ -0,0 +1,107 @@
+import csv
+from datetime import datetime
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from apps.loans.choices import LoanFileFormat
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Rows fetched from the database per round trip, server side cursor on PostgreSQL
+EXPORT_CHUNK_SIZE = 2000
+
+# (column, lookup) of exported rows, a row per loan term
+EXPORT_COLUMNS = (
+    ("loan_id", "id"),
+    ("user", "user_id"),
+    ("amount", "amount"),
+    ("term", "term"),
+    ("state", "state"),
+    ("created", "created"),
+    ("approved_by", "approved_by_id"),
+    ("approved_date", "approved_date"),
+    ("closed_date", "closed_date"),
+    ("loan_term_id", "loan_term__id"),
+    ("loan_term_amount", "loan_term__amount"),
+    ("loan_term_due_date", "loan_term__due_date"),
+    ("loan_term_status", "loan_term__status"),
+    ("loan_term_paid_amount", "loan_term__paid_amount"),
+    ("loan_term_paid_date", "loan_term__paid_date"),
+)
+
+
+def export_rows(queryset):
+    """
+    Iterate loans joined with their loan terms, without loading them in memory.
+
+    Loans without loan terms are exported once, with empty loan term columns.
+    """
+    return (
+        queryset.order_by("created", "id", "loan_term__due_date")
+        .values_list(*(lookup for _, lookup in EXPORT_COLUMNS))
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+class Echo:
+    """
+    File-like object returning what is written, for csv.writer.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _chunks(rows, size=EXPORT_CHUNK_SIZE):
+    # Yield lists of rows, fewer and larger writes to the client
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([column for column, _ in EXPORT_COLUMNS])
+    for chunk in _chunks(rows):
+        yield "".join(
+            writer.writerow([_csv_value(value) for value in row]) for row in chunk
+        )
+
+
+def stream_ndjson(rows):
+    columns = [column for column, _ in EXPORT_COLUMNS]
+    encoder = DjangoJSONEncoder()
+    if orjson is not None:
+        # Datetimes are formatted by DjangoJSONEncoder, as without orjson
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_APPEND_NEWLINE
+        for chunk in _chunks(rows):
+            yield b"".join(
+                orjson.dumps(
+                    dict(zip(columns, row)), default=encoder.default, option=options
+                )
+                for row in chunk
+            )
+        return
+
+    for chunk in _chunks(rows):
+        yield "".join(encoder.encode(dict(zip(columns, row))) + "\n" for row in chunk)
+
+
+# Export format -> (stream, content type)
+STREAMS = {
+    LoanFileFormat.CSV: (stream_csv, "text/csv"),
+    LoanFileFormat.NDJSON: (stream_ndjson, "application/x-ndjson"),
+}
@@ -0,0 +1,187 @@
+import csv
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.fields import empty
+
+from apps.loans.choices import LoanFileFormat
+from apps.loans.models import Loan
+from apps.loans.serializers import validate_loan_amount, validate_loan_term
+from apps.loans.summary import record_created
+
+User = get_user_model()
+
+# Rows validated and inserted per batch
+IMPORT_CHUNK_SIZE = 1000
+
+# Content type -> file format
+IMPORT_CONTENT_TYPES = {
+    "text/csv": LoanFileFormat.CSV,
+    "application/x-ndjson": LoanFileFormat.NDJSON,
+}
+
+# Shared, stateless fields to coerce row values
+FIELDS = {
+    "amount": serializers.FloatField(),
+    "term": serializers.IntegerField(),
+    "user": serializers.IntegerField(required=False),
+}
+VALIDATORS = {
+    "amount": validate_loan_amount,
+    "term": validate_loan_term,
+}
+
+
+# Row of lines which are not valid UTF-8
+UNDECODABLE_ROW = object()
+
+
+def decode_lines(stream, undecodable):
+    """
+    Decode lines of an uploaded file, one at a time.
+
+    Lines which are not valid UTF-8 are decoded with replacement characters and
+    their numbers added to undecodable, for their rows to be reported.
+    """
+    for number, line in enumerate(stream or (), start=1):
+        try:
+            yield line.decode("utf-8-sig" if number == 1 else "utf-8")
+        except UnicodeDecodeError:
+            undecodable.add(number)
+            yield line.decode("utf-8", errors="replace")
+
+
+def parse_csv(lines):
+    """
+    Rows with the numbers of their lines, blank lines are skipped.
+    """
+    reader = csv.reader(lines)
+    header = []
+    while header == []:
+        header = next(reader, None)
+    line_number = reader.line_num
+    for values in reader:
+        # Quoted values may span lines
+        row_lines = range(line_number + 1, reader.line_num + 1)
+        line_number = reader.line_num
+        if values:
+            yield row_lines, dict(zip(header, values))
+
+
+def parse_ndjson(lines):
+    """
+    Rows with the numbers of their lines, blank lines are skipped.
+    """
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        # Invalid rows are reported by validate_row
+        yield range(number, number + 1), row if isinstance(row, dict) else None
+
+
+PARSERS = {
+    # Parser, header lines
+    LoanFileFormat.CSV: (parse_csv, 1),
+    LoanFileFormat.NDJSON: (parse_ndjson, 0),
+}
+
+
+def read_rows(stream, import_format):
+    """
+    Parse rows of an uploaded file, line by line.
+
+    Yields (row number, row), rows are numbered by the line they start on,
+    header lines excluded.
+    """
+    parse, header_lines = PARSERS[import_format]
+    undecodable = set()
+    for lines, row in parse(decode_lines(stream, undecodable)):
+        if undecodable.intersection(lines):
+            row = UNDECODABLE_ROW
+        yield lines[0] - header_lines, row
+
+
+def validate_row(row):
+    """
+    Validate a row with the loan creation rules.
+
+    Returns (values, errors).
+    """
+    if row is None:
+        return None, {"non_field_errors": ["Invalid row"]}
+    if row is UNDECODABLE_ROW:
+        return None, {"non_field_errors": ["Row is not valid UTF-8"]}
+
+    values, errors = {}, {}
+    for name, field in FIELDS.items():
+        value = row.get(name)
+        if value in (None, ""):
+            if not field.required:
+                continue
+            value = empty
+        try:
+            values[name] = field.run_validation(value)
+            if name in VALIDATORS:
+                values[name] = VALIDATORS[name](values[name])
+        except serializers.ValidationError as e:
+            errors[name] = e.detail
+    return values, errors
+
+
+def import_loans(rows, user):
+    """
+    Create loans from numbered rows (see read_rows), in chunks.
+
+    - Rows are validated with the loan creation rules, invalid rows are skipped.
+    - Rows without user are created for the given user.
+    - Valid rows of a chunk are inserted with a single bulk_create.
+
+    Returns (created count, list of row errors).
+    """
+    created, errors = 0, []
+    numbered = iter(rows)
+
+    while True:
+        chunk = list(islice(numbered, IMPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+
+        validated = []
+        for number, row in chunk:
+            values, row_errors = validate_row(row)
+            if row_errors:
+                errors.append({"row": number, "errors": row_errors})
+            else:
+                validated.append((number, values))
+
+        # Check users of the chunk with a single query
+        user_ids = {values["user"] for _, values in validated if "user" in values}
+        existing = set(
+            User.objects.filter(pk__in=user_ids).values_list("pk", flat=True)
+        )
+
+        loans = []
+        for number, values in validated:
+            user_id = values.get("user", user.pk)
+            if user_id not in existing and user_id != user.pk:
+                errors.append(
+                    {"row": number, "errors": {"user": ["User does not exist"]}}
+                )
+                continue
+            loans.append(
+                Loan(user_id=user_id, amount=values["amount"], term=values["term"])
+            )
+
+        with transaction.atomic():
+            Loan.objects.bulk_create(loans)
+            record_created((loan.created, loan.amount) for loan in loans)
+        created += len(loans)
+
+    return created, errors
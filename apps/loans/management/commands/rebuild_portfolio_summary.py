@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.loans.summary import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the portfolio summary table from loans and loan terms."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Exit with an error when summary rows drifted, after rebuilding.",
+        )
+
+    def handle(self, *args, **options):
+        drifted = rebuild_summary()
+        self.stdout.write(f"Portfolio summary rebuilt, {drifted} rows drifted.")
+        if drifted and options["check"]:
+            raise CommandError(f"{drifted} portfolio summary rows drifted.")
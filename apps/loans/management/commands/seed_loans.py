@@ -0,0 +1,73 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.loans.seeding import SEED_CHUNK_SIZE, SEED_PASSWORD, seed_loans
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic users, loans and loan terms, deterministic from "
+        f"--seed. Seeded users log in with the password {SEED_PASSWORD!r}."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--loans", type=int, default=10000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=SEED_CHUNK_SIZE,
+            help="Users and loans generated and inserted per chunk.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Loans are created over the last --days days.",
+        )
+        parser.add_argument(
+            "--username-prefix",
+            default="seed",
+            help="Prefix of seeded usernames, should not be in use.",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1:
+            raise CommandError("--users should be at least 1.")
+        if options["loans"] < 0 or options["chunk_size"] < 1 or options["days"] < 1:
+            raise CommandError("--loans, --chunk-size and --days should be positive.")
+        prefix = options["username_prefix"]
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f"Users named {prefix}* already exist, "
+                "use another --username-prefix."
+            )
+
+        def progress(count):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{count} loans created.")
+
+        started = time.perf_counter()
+        counts = seed_loans(
+            options["users"],
+            options["loans"],
+            seed=options["seed"],
+            chunk_size=options["chunk_size"],
+            days=options["days"],
+            username_prefix=prefix,
+            progress=progress,
+        )
+
+        seconds = time.perf_counter() - started
+        rows = sum(counts.values())
+        rate = rows / seconds if seconds else 0
+        self.stdout.write(
+            f"{counts['users']} users, {counts['loans']} loans and "
+            f"{counts['loan_terms']} loan terms created in {seconds:.2f} seconds "
+            f"({rate:.0f} rows/sec)."
+        )
@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.loans.overdue import SWEEP_BATCH_SIZE, overdue_terms, sweep_overdue_batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark pending loan terms past their due date as overdue, in batches. "
+        "Interrupted sweeps resume from the earliest pending loan term."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=SWEEP_BATCH_SIZE,
+            help="Loan terms marked per UPDATE.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches, to throttle the sweep.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count loan terms to mark.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        if batch_size < 1:
+            raise CommandError("--batch-size should be at least 1.")
+
+        now = timezone.now()
+        if options["dry_run"]:
+            count = overdue_terms(now).count()
+            self.stdout.write(f"{count} loan terms would be marked overdue.")
+            return
+
+        marked, batches = 0, 0
+        started = time.perf_counter()
+        while True:
+            count = sweep_overdue_batch(now, batch_size)
+            if not count:
+                break
+            marked += count
+            batches += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Batch {batches}: {count} loan terms marked.")
+            if count < batch_size:
+                break
+            if options["sleep"]:
+                time.sleep(options["sleep"])
+
+        seconds = time.perf_counter() - started
+        rate = marked / seconds if seconds else 0
+        self.stdout.write(
+            f"{marked} loan terms marked overdue in {batches} batches, "
+            f"{seconds:.2f} seconds ({rate:.0f} rows/sec)."
+        )
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.13 on 2026-10-18 05:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0002_auto_20220423_1709"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(
+                fields=["user", "created", "id"], name="loan_user_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loan",
+            index=models.Index(fields=["created", "id"], name="loan_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="loanterm",
+            index=models.Index(
+                fields=["loan", "status", "due_date"],
+                name="loanterm_loan_status_due_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loanterm",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["due_date"],
+                name="loanterm_pending_due_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,66 @@
+# Generated by Django 3.2.13 on 2026-10-18 05:46
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0003_loan_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PortfolioSummary",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("day", models.DateField(verbose_name="day")),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("approved", "Approved"),
+                            ("paid", "Paid"),
+                        ],
+                        max_length=30,
+                        verbose_name="state",
+                    ),
+                ),
+                (
+                    "loans_count",
+                    models.IntegerField(default=0, verbose_name="loans count"),
+                ),
+                ("amount", models.FloatField(default=0, verbose_name="amount")),
+                (
+                    "collected_amount",
+                    models.FloatField(default=0, verbose_name="collected amount"),
+                ),
+                (
+                    "outstanding_amount",
+                    models.FloatField(default=0, verbose_name="outstanding amount"),
+                ),
+            ],
+            options={
+                "verbose_name": "Portfolio Summary",
+                "verbose_name_plural": "Portfolio Summaries",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="portfoliosummary",
+            constraint=models.UniqueConstraint(
+                fields=("day", "state"), name="portfolio_summary_day_state_uniq"
+            ),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 3.2.13 on 2026-10-18 05:50
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_loan_balance(apps, schema_editor):
+    """
+    Compute balance fields of loans with loan terms, with a single UPDATE.
+    """
+    Loan = apps.get_model("loans", "Loan")
+    LoanTerm = apps.get_model("loans", "LoanTerm")
+
+    loan_terms = LoanTerm.objects.filter(loan=OuterRef("pk")).order_by()
+    pending = loan_terms.filter(status="pending")
+    next_term = pending.order_by("due_date")[:1]
+
+    Loan.objects.filter(pk__in=LoanTerm.objects.values("loan")).update(
+        outstanding_amount=Coalesce(
+            Subquery(
+                pending.values("loan").annotate(total=Sum("amount")).values("total")
+            ),
+            0.0,
+        ),
+        paid_terms_count=Coalesce(
+            Subquery(
+                loan_terms.filter(status="paid")
+                .values("loan")
+                .annotate(count=Count("id"))
+                .values("count")
+            ),
+            0,
+        ),
+        next_due_date=Subquery(next_term.values("due_date")),
+        next_due_amount=Subquery(next_term.values("amount")),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0004_portfoliosummary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="loan",
+            name="next_due_amount",
+            field=models.FloatField(
+                blank=True, null=True, verbose_name="next due amount"
+            ),
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="next_due_date",
+            field=models.DateTimeField(
+                blank=True, null=True, verbose_name="next due date"
+            ),
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="outstanding_amount",
+            field=models.FloatField(default=0, verbose_name="outstanding amount"),
+        ),
+        migrations.AddField(
+            model_name="loan",
+            name="paid_terms_count",
+            field=models.IntegerField(default=0, verbose_name="paid terms count"),
+        ),
+        migrations.RunPython(backfill_loan_balance, migrations.RunPython.noop),
+    ]
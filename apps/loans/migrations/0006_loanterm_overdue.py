@@ -0,0 +1,37 @@
+# Generated by Django 3.2.13 on 2026-10-18 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0005_loan_balance"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="loanterm",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("overdue", "Overdue"),
+                    ("paid", "Paid"),
+                ],
+                default="pending",
+                max_length=30,
+                verbose_name="status",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="loanterm",
+            index=models.Index(
+                fields=["status", "due_date"], name="loanterm_status_due_idx"
+            ),
+        ),
+        migrations.RemoveIndex(
+            model_name="loanterm",
+            name="loanterm_pending_due_idx",
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.13 on 2026-10-18 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0006_loanterm_overdue"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loanterm",
+            index=models.Index(fields=["due_date"], name="loanterm_due_idx"),
+        ),
+    ]
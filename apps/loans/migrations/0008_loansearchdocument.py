@@ -0,0 +1,269 @@
+# Generated by Django 3.2.13 on 2026-10-18 06:32
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DatabaseError, migrations, models, transaction
+import django.db.models.deletion
+
+DOCUMENTS = "loans_loansearchdocument"
+FTS = "loans_loansearchdocument_fts"
+
+TRIGRAM_EXTENSION_ERROR = (
+    "The loan search index needs the pg_trgm extension, which the database user "
+    "is not allowed to create. Create it once as a superuser, then run migrate "
+    "again: psql -d <database> -c 'CREATE EXTENSION IF NOT EXISTS pg_trgm'"
+)
+
+
+def document(loan_id, user):
+    """
+    Search document SQL of a loan: hex id, username, names and email, lowercased.
+    """
+    return (
+        f"lower(replace(CAST({loan_id} AS TEXT), '-', '') || ' ' || "
+        f"{user}.username || ' ' || {user}.first_name || ' ' || "
+        f"{user}.last_name || ' ' || {user}.email)"
+    )
+
+
+def user_changed(distinct="IS DISTINCT FROM"):
+    """
+    Trigger condition SQL, a user column of the search document changed.
+    """
+    return " OR ".join(
+        f"OLD.{column} {distinct} NEW.{column}"
+        for column in ("username", "first_name", "last_name", "email")
+    )
+
+
+def postgresql_statements(user_table):
+    """
+    Trigram index on documents, documents maintained by PL/pgSQL triggers.
+    """
+    return [
+        f"CREATE INDEX loansearch_document_trgm ON {DOCUMENTS} "
+        "USING gin (document gin_trgm_ops)",
+        f"""
+        CREATE FUNCTION loans_loan_search_document() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            INSERT INTO {DOCUMENTS} (loan_id, document)
+            SELECT NEW.id, {document("NEW.id", "u")}
+            FROM {user_table} u WHERE u.id = NEW.user_id
+            ON CONFLICT (loan_id) DO UPDATE SET document = EXCLUDED.document;
+            RETURN NULL;
+        END
+        $$
+        """,
+        "CREATE TRIGGER loans_loan_search_insert AFTER INSERT ON loans_loan "
+        "FOR EACH ROW EXECUTE FUNCTION loans_loan_search_document()",
+        "CREATE TRIGGER loans_loan_search_update AFTER UPDATE OF user_id "
+        "ON loans_loan FOR EACH ROW "
+        "WHEN (OLD.user_id IS DISTINCT FROM NEW.user_id) "
+        "EXECUTE FUNCTION loans_loan_search_document()",
+        f"""
+        CREATE FUNCTION user_loan_search_document() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE {DOCUMENTS} SET document = {document("loan_id", "NEW")}
+            WHERE loan_id IN (SELECT id FROM loans_loan WHERE user_id = NEW.id);
+            RETURN NULL;
+        END
+        $$
+        """,
+        f"CREATE TRIGGER user_loan_search_update AFTER UPDATE OF "
+        f"username, first_name, last_name, email ON {user_table} FOR EACH ROW "
+        f"WHEN ({user_changed()}) "
+        "EXECUTE FUNCTION user_loan_search_document()",
+    ]
+
+
+def postgresql_reverse_statements(user_table):
+    return [
+        f"DROP TRIGGER IF EXISTS user_loan_search_update ON {user_table}",
+        "DROP FUNCTION IF EXISTS user_loan_search_document()",
+        "DROP TRIGGER IF EXISTS loans_loan_search_update ON loans_loan",
+        "DROP TRIGGER IF EXISTS loans_loan_search_insert ON loans_loan",
+        "DROP FUNCTION IF EXISTS loans_loan_search_document()",
+        "DROP INDEX IF EXISTS loansearch_document_trgm",
+    ]
+
+
+def sqlite_fts_statements():
+    """
+    FTS5 trigram index over documents, kept in sync by triggers (external
+    content table).
+    """
+    return [
+        f"CREATE VIRTUAL TABLE {FTS} USING fts5(document, content='{DOCUMENTS}', "
+        "content_rowid='id', tokenize='trigram')",
+        f"""
+        CREATE TRIGGER {FTS}_insert AFTER INSERT ON {DOCUMENTS} BEGIN
+            INSERT INTO {FTS} (rowid, document) VALUES (NEW.id, NEW.document);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {FTS}_delete AFTER DELETE ON {DOCUMENTS} BEGIN
+            INSERT INTO {FTS} ({FTS}, rowid, document)
+            VALUES ('delete', OLD.id, OLD.document);
+        END
+        """,
+        f"""
+        CREATE TRIGGER {FTS}_update AFTER UPDATE OF document ON {DOCUMENTS} BEGIN
+            INSERT INTO {FTS} ({FTS}, rowid, document)
+            VALUES ('delete', OLD.id, OLD.document);
+            INSERT INTO {FTS} (rowid, document) VALUES (NEW.id, NEW.document);
+        END
+        """,
+    ]
+
+
+def sqlite_statements(user_table):
+    """
+    FTS5 trigram index over documents when SQLite supports it, documents
+    maintained by triggers.
+    """
+    return (sqlite_fts_statements() if sqlite_fts_trigram() else []) + [
+        f"""
+        CREATE TRIGGER loans_loan_search_insert AFTER INSERT ON loans_loan BEGIN
+            INSERT INTO {DOCUMENTS} (loan_id, document)
+            SELECT NEW.id, {document("NEW.id", "u")}
+            FROM {user_table} u WHERE u.id = NEW.user_id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER loans_loan_search_update AFTER UPDATE OF user_id ON loans_loan
+        WHEN OLD.user_id IS NOT NEW.user_id BEGIN
+            UPDATE {DOCUMENTS} SET document = (
+                SELECT {document("NEW.id", "u")}
+                FROM {user_table} u WHERE u.id = NEW.user_id
+            )
+            WHERE loan_id = NEW.id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER user_loan_search_update AFTER UPDATE OF
+        username, first_name, last_name, email ON {user_table}
+        WHEN {user_changed("IS NOT")} BEGIN
+            UPDATE {DOCUMENTS} SET document = {document("loan_id", "NEW")}
+            WHERE loan_id IN (SELECT id FROM loans_loan WHERE user_id = NEW.id);
+        END
+        """,
+    ]
+
+
+def sqlite_reverse_statements(user_table):
+    return [
+        "DROP TRIGGER IF EXISTS user_loan_search_update",
+        "DROP TRIGGER IF EXISTS loans_loan_search_update",
+        "DROP TRIGGER IF EXISTS loans_loan_search_insert",
+        f"DROP TRIGGER IF EXISTS {FTS}_update",
+        f"DROP TRIGGER IF EXISTS {FTS}_delete",
+        f"DROP TRIGGER IF EXISTS {FTS}_insert",
+        f"DROP TABLE IF EXISTS {FTS}",
+    ]
+
+
+def sqlite_fts_trigram():
+    """
+    Whether SQLite has FTS5 and its trigram tokenizer (3.34+). Without them
+    documents are searched with LIKE conditions, see apps.loans.search.
+    """
+    from django.db.backends.sqlite3.base import Database
+
+    if Database.sqlite_version_info < (3, 34, 0):
+        return False
+    connection = Database.connect(":memory:")
+    try:
+        connection.execute("CREATE VIRTUAL TABLE t USING fts5(a, tokenize='trigram')")
+    except Database.Error:
+        return False
+    finally:
+        connection.close()
+    return True
+
+
+STATEMENTS = {
+    "postgresql": (postgresql_statements, postgresql_reverse_statements),
+    "sqlite": (sqlite_statements, sqlite_reverse_statements),
+}
+
+
+def create_trigram_extension(apps, schema_editor):
+    """
+    Create the pg_trgm extension of the PostgreSQL trigram index, unless it
+    exists. Creating it needs a superuser (or the CREATE privilege on the
+    database for trusted extensions, PostgreSQL 13+), it can be created
+    beforehand by one, see README.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        if cursor.fetchone() is not None:
+            return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except DatabaseError as e:
+        raise ImproperlyConfigured(TRIGRAM_EXTENSION_ERROR) from e
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Create the search index and triggers, then the documents of existing loans.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor not in STATEMENTS:
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    for statement in STATEMENTS[vendor][0](user_table):
+        schema_editor.execute(statement)
+    schema_editor.execute(
+        f"INSERT INTO {DOCUMENTS} (loan_id, document) "
+        f"SELECT l.id, {document('l.id', 'u')} "
+        f"FROM loans_loan l INNER JOIN {user_table} u ON u.id = l.user_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor not in STATEMENTS:
+        return
+    user_table = apps.get_model(settings.AUTH_USER_MODEL)._meta.db_table
+    for statement in STATEMENTS[vendor][1](user_table):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("loans", "0007_loanterm_due_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LoanSearchDocument",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("document", models.TextField(verbose_name="document")),
+                (
+                    "loan",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_document",
+                        to="loans.loan",
+                        verbose_name="loan",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Loan Search Document",
+                "verbose_name_plural": "Loan Search Documents",
+            },
+        ),
+        # The extension is left in place on reverse, other apps may use it
+        migrations.RunPython(create_trigram_extension, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
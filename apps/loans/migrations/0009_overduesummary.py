@@ -0,0 +1,60 @@
+# Generated by Django 3.2.13 on 2026-10-18 06:59
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0008_loansearchdocument"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OverdueSummary",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("day", models.DateField(verbose_name="day")),
+                (
+                    "state",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("approved", "Approved"),
+                            ("paid", "Paid"),
+                        ],
+                        max_length=30,
+                        verbose_name="state",
+                    ),
+                ),
+                ("due_day", models.DateField(verbose_name="due day")),
+                (
+                    "terms_count",
+                    models.IntegerField(default=0, verbose_name="loan terms count"),
+                ),
+                ("amount", models.FloatField(default=0, verbose_name="amount")),
+            ],
+            options={
+                "verbose_name": "Overdue Summary",
+                "verbose_name_plural": "Overdue Summaries",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="overduesummary",
+            constraint=models.UniqueConstraint(
+                fields=("day", "state", "due_day"),
+                name="overdue_summary_day_state_due_uniq",
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.13 on 2026-10-18 12:10
+
+from django.db import migrations
+
+
+def backfill_summaries(apps, schema_editor):
+    """
+    Compute the summary tables, created empty by 0004 and 0009, from loans and
+    loan terms, as the rebuild_portfolio_summary command does.
+    """
+    from apps.loans.summary import rebuild_summary
+
+    rebuild_summary()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("loans", "0009_overduesummary"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -29,12 +29,26 @@ class Loan(BaseModel):
     approved_date = models.DateTimeField(_("approved date"), null=True, blank=True)
     closed_date = models.DateTimeField(_("closed date"), null=True, blank=True)
 
+    # Balance of the loan terms, maintained by approval and repayment
+    outstanding_amount = models.FloatField(_("outstanding amount"), default=0)
+    paid_terms_count = models.IntegerField(_("paid terms count"), default=0)
+    next_due_date = models.DateTimeField(_("next due date"), null=True, blank=True)
+    next_due_amount = models.FloatField(_("next due amount"), null=True, blank=True)
+
     def __str__(self):
         return f"{self.user}, amount: {self.amount}, terms: {self.term}"
 
     class Meta:
         verbose_name = _("Loan")
         verbose_name_plural = _("Loans")
+        indexes = [
+            # User specific loan list, ordered by creation
+            models.Index(
+                fields=["user", "created", "id"], name="loan_user_created_idx"
+            ),
+            # All loans list and cursor pagination
+            models.Index(fields=["created", "id"], name="loan_created_idx"),
+        ]
 
 
 class LoanTerm(BaseModel):
@@ -58,3 +72,100 @@ class LoanTerm(BaseModel):
     class Meta:
         verbose_name = _("Loan Term")
         verbose_name_plural = _("Loan Terms")
+        indexes = [
+            # Pending loan terms of a loan in repayment order
+            models.Index(
+                fields=["loan", "status", "due_date"],
+                name="loanterm_loan_status_due_idx",
+            ),
+            # Overdue scans and sweep_overdue batches
+            models.Index(fields=["status", "due_date"], name="loanterm_status_due_idx"),
+            # Admin date hierarchy
+            models.Index(fields=["due_date"], name="loanterm_due_idx"),
+        ]
+
+
+class PortfolioSummary(BaseModel):
+    """
+    Portfolio totals per loan creation day and loan state.
+
+    Maintained in the same transaction as loan writes (creation, approval,
+    repayment, admin updates), rebuilt with `manage.py rebuild_portfolio_summary`.
+    """
+
+    day = models.DateField(_("day"))
+    state = models.CharField(_("state"), choices=LoanState.choices, max_length=30)
+    loans_count = models.IntegerField(_("loans count"), default=0)
+    amount = models.FloatField(_("amount"), default=0)
+    collected_amount = models.FloatField(_("collected amount"), default=0)
+    outstanding_amount = models.FloatField(_("outstanding amount"), default=0)
+
+    def __str__(self):
+        return f"{self.day}, state: {self.state}, loans: {self.loans_count}"
+
+    class Meta:
+        verbose_name = _("Portfolio Summary")
+        verbose_name_plural = _("Portfolio Summaries")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "state"], name="portfolio_summary_day_state_uniq"
+            )
+        ]
+
+
+class OverdueSummary(BaseModel):
+    """
+    Overdue loan terms per loan creation day, loan state and due day.
+
+    Maintained in the same transaction as the overdue sweep (sweep_overdue) and
+    loan writes (repayment, admin updates), rebuilt with the portfolio summary.
+    Overdue buckets are computed from due days when read.
+    """
+
+    day = models.DateField(_("day"))
+    state = models.CharField(_("state"), choices=LoanState.choices, max_length=30)
+    due_day = models.DateField(_("due day"))
+    terms_count = models.IntegerField(_("loan terms count"), default=0)
+    amount = models.FloatField(_("amount"), default=0)
+
+    def __str__(self):
+        return (
+            f"{self.day}, state: {self.state}, due: {self.due_day}, "
+            f"loan terms: {self.terms_count}"
+        )
+
+    class Meta:
+        verbose_name = _("Overdue Summary")
+        verbose_name_plural = _("Overdue Summaries")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["day", "state", "due_day"],
+                name="overdue_summary_day_state_due_uniq",
+            )
+        ]
+
+
+class LoanSearchDocument(models.Model):
+    """
+    Search document of a loan: its id and its borrower's username, names and
+    email, lowercased.
+
+    Maintained by database triggers on loan and user writes, see
+    apps.loans.search. The integer id keys the SQLite full-text index.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    loan = models.OneToOneField(
+        Loan,
+        on_delete=CASCADE,
+        verbose_name=_("loan"),
+        related_name="search_document",
+    )
+    document = models.TextField(_("document"))
+
+    def __str__(self):
+        return self.document
+
+    class Meta:
+        verbose_name = _("Loan Search Document")
+        verbose_name_plural = _("Loan Search Documents")
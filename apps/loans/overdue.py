@@ -0,0 +1,40 @@
+from django.db import transaction
+from django.utils import timezone
+
+from apps.loans.choices import LoanTermStatus
+from apps.loans.models import Loan, LoanTerm
+from apps.loans.summary import record_overdue
+
+# Loan terms marked per UPDATE, keeps each transaction and its row locks short
+SWEEP_BATCH_SIZE = 5000
+
+
+def overdue_terms(now):
+    """
+    Pending loan terms past their due date, served by loanterm_status_due_idx.
+    """
+    return LoanTerm.objects.filter(status=LoanTermStatus.PENDING, due_date__lt=now)
+
+
+def sweep_overdue_batch(now, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Mark the next batch of pending loan terms past due as overdue.
+
+    - The batch is the earliest due loan terms, marked terms leave the pending
+      range of the index, so each batch (and each run) resumes where the
+      previous one stopped.
+    - Loans of the batch are touched first, in the same transaction, as
+      repayments lock the loan before its loan terms. The batch can not be
+      repaid until the transaction ends.
+    - Marked loan terms are added to the overdue summary, grouped by loan
+      creation day, loan state and due day.
+
+    Returns the number of loan terms marked.
+    """
+    batch = overdue_terms(now).order_by("due_date", "id")[:batch_size]
+    updated = timezone.now()
+    with transaction.atomic():
+        Loan.objects.filter(pk__in=batch.values("loan")).update(updated=updated)
+        loan_terms = LoanTerm.objects.filter(pk__in=batch.values("pk"))
+        record_overdue(loan_terms)
+        return loan_terms.update(status=LoanTermStatus.OVERDUE, updated=updated)
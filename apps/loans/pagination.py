@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+
+class LoanCursorPagination(CursorPagination):
+    """
+    Keyset pagination over (created, id).
+
+    - No COUNT(*) and no OFFSET scan, deep pages cost the same as the first.
+    - Rows inserted concurrently do not shift or duplicate already seen rows.
+    """
+
+    ordering = ("created", "id")
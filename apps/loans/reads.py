@@ -0,0 +1,71 @@
+"""
+Loan read endpoints (list, retrieve, terms), shared by LoanViewSet and the
+async views.
+"""
+
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.settings import api_settings
+
+from apps.loans.choices import LoanPagination
+from apps.loans.etags import loan_validators
+from apps.loans.models import Loan
+from apps.loans.pagination import LoanCursorPagination
+from apps.loans.representations import (
+    LOAN_COLUMNS,
+    loan_representations,
+    loan_term_representations,
+)
+from apps.loans.search import search_loans
+
+
+def loans_queryset(user, query_params):
+    """
+    Loans listed for a user, filtered by LoanListQuerySerializer query params.
+
+    - all: all loans for staff users, otherwise only the user's loans.
+    - search: loans matching the search words, see apps.loans.search.
+    - Stable ordering for both pagination modes.
+    """
+    queryset = Loan.objects.all()
+    if not query_params.get("all") or not user.is_staff:
+        queryset = queryset.filter(user=user)
+    if query_params.get("search"):
+        queryset = search_loans(queryset, query_params["search"])
+    return queryset.order_by(*LoanCursorPagination.ordering)
+
+
+def loans_pagination_class(query_params):
+    if query_params.get("pagination") == LoanPagination.CURSOR:
+        return LoanCursorPagination
+    return api_settings.DEFAULT_PAGINATION_CLASS
+
+
+def loan_access_validators(loan_id, user):
+    """
+    Validators of a loan the user can read, owners and staff users only.
+    """
+    validators = loan_validators(loan_id)
+    if validators.user_id != user.pk and not user.is_staff:
+        raise PermissionDenied()
+    return validators
+
+
+def loan_detail(loan_id):
+    """
+    Loan with its loan terms, same output as LoanSerializer.
+
+    Returns None when the loan does not exist.
+    """
+    row = Loan.objects.filter(pk=loan_id).values(*LOAN_COLUMNS).first()
+    if row is None:
+        return None
+    (loan,) = loan_representations([row])
+    return loan
+
+
+def loan_terms(loan_id):
+    """
+    Loan terms of a loan ordered by due date, same output as LoanTermSerializer.
+    """
+    representations = loan_term_representations([loan_id])
+    return next(iter(representations.values()), [])
@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from rest_framework.generics import get_object_or_404
+
+from apps.loans.choices import UNPAID_LOAN_TERM_STATUSES, LoanState, LoanTermStatus
+from apps.loans.models import Loan, LoanTerm
+from apps.loans.summary import record_repayment
+
+
+class RepaymentError(Exception):
+    pass
+
+
+def repay_loan(loan_id, amount):
+    """
+    Pay the earliest pending (or overdue) loan term of a loan.
+
+    - Only the loan row is locked, concurrent repayments of a loan are serialized.
+    - The earliest pending loan term and the next one are read with a single
+      query, the earliest one is paid with a single UPDATE.
+    - In the same transaction, the loan is touched, so loan.updated reflects
+      changes of its terms, its balance fields are updated and it is closed
+      once no pending term is left.
+
+    Returns True when the repayment closed the loan.
+    """
+    with transaction.atomic():
+        loan = get_object_or_404(
+            Loan.objects.select_for_update().only("id", "created", "amount", "state"),
+            pk=loan_id,
+        )
+        # Pending terms can not change while the loan row is locked
+        pending_terms = list(
+            LoanTerm.objects.filter(loan=loan, status__in=UNPAID_LOAN_TERM_STATUSES)
+            .order_by("due_date")
+            .values("pk", "amount", "status", "due_date")[:2]
+        )
+
+        if not pending_terms:
+            if LoanTerm.objects.filter(loan=loan).exists():
+                raise RepaymentError("Loan is already fully paid")
+            raise RepaymentError("Loan is not approved or loan terms does not exists")
+        loan_term = pending_terms[0]
+        if loan_term["amount"] != amount:
+            raise RepaymentError(
+                f"Loan repayment amount should be equal to {loan_term['amount']}"
+            )
+
+        now = timezone.now()
+        LoanTerm.objects.filter(pk=loan_term["pk"]).update(
+            status=LoanTermStatus.PAID, paid_amount=amount, paid_date=now, updated=now
+        )
+
+        # Touch the loan, update its balance and close it if it was the last
+        # pending term
+        next_term = pending_terms[1] if len(pending_terms) > 1 else None
+        closed = next_term is None
+        changes = {
+            "updated": now,
+            "outstanding_amount": F("outstanding_amount") - amount,
+            "paid_terms_count": F("paid_terms_count") + 1,
+            "next_due_date": next_term and next_term["due_date"],
+            "next_due_amount": next_term and next_term["amount"],
+        }
+        collected_amount = None
+        if closed:
+            changes.update(state=LoanState.PAID, closed_date=now, outstanding_amount=0)
+            collected_amount = LoanTerm.objects.filter(loan=loan).aggregate(
+                collected_amount=Sum("paid_amount")
+            )["collected_amount"]
+        Loan.objects.filter(pk=loan.pk).update(**changes)
+        record_repayment(loan, loan_term, amount, collected_amount)
+        return closed
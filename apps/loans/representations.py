@@ -0,0 +1,112 @@
+"""
+Read path representations of loans, built from values() rows.
+
+The output is the same as LoanSerializer (with loan terms) and
+LoanListSerializer (without), without ModelSerializer field introspection and
+per field to_representation calls for every row.
+"""
+
+from collections import defaultdict
+
+from rest_framework import serializers
+
+from apps.loans.models import LoanTerm
+from apps.monitoring.metrics import timing
+
+# Shared, stateless field, DRF datetime format and timezone
+_datetime_field = serializers.DateTimeField()
+
+
+def _datetime(value):
+    return None if value is None else _datetime_field.to_representation(value)
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _value(value):
+    return value
+
+
+# (output field, values() column, conversion), in serializer field order
+LOAN_FIELDS = (
+    ("id", "id", str),
+    ("amount", "amount", float),
+    ("term", "term", int),
+    ("state", "state", str),
+    ("approved_date", "approved_date", _datetime),
+    ("user", "user_id", _value),
+    ("approved_by", "approved_by_id", _value),
+    ("loan_terms", None, None),
+    ("closed_date", "closed_date", _datetime),
+    ("outstanding_amount", "outstanding_amount", float),
+    ("paid_terms_count", "paid_terms_count", int),
+    ("next_due_date", "next_due_date", _datetime),
+    ("next_due_amount", "next_due_amount", _float),
+)
+LOAN_TERM_FIELDS = (
+    ("id", "id", str),
+    ("amount", "amount", float),
+    ("due_date", "due_date", _datetime),
+    ("status", "status", str),
+    ("paid_amount", "paid_amount", float),
+    ("paid_date", "paid_date", _datetime),
+)
+
+# Columns to select for loans, created is the cursor pagination position and
+# updated the list validators' (see apps.loans.etags)
+LOAN_COLUMNS = tuple(column for _, column, _ in LOAN_FIELDS if column) + (
+    "created",
+    "updated",
+)
+LOAN_TERM_COLUMNS = ("loan_id",) + tuple(column for _, column, _ in LOAN_TERM_FIELDS)
+
+
+def _represent(row, fields):
+    return {name: convert(row[column]) for name, column, convert in fields}
+
+
+def loan_term_representations(loan_ids):
+    """
+    Loan terms of loans, ordered by due date, with a single query.
+
+    Returns a dict of loan id -> list of loan term representations.
+    """
+    loan_terms = defaultdict(list)
+    if not loan_ids:
+        return loan_terms
+    with timing("serialize"):
+        for row in (
+            LoanTerm.objects.filter(loan_id__in=loan_ids)
+            .order_by("due_date")
+            .values(*LOAN_TERM_COLUMNS)
+        ):
+            loan_terms[row["loan_id"]].append(_represent(row, LOAN_TERM_FIELDS))
+    return loan_terms
+
+
+def loan_representations(rows, terms=True):
+    """
+    Represent loans, given as values(*LOAN_COLUMNS) rows.
+
+    terms: include loan terms (LoanSerializer), loaded with one query for all
+    the rows, otherwise the output is the one of LoanListSerializer.
+    """
+    with timing("serialize"):
+        rows = list(rows)
+        loan_terms = (
+            loan_term_representations([row["id"] for row in rows]) if terms else None
+        )
+
+        loans = []
+        for row in rows:
+            loan = {}
+            for name, column, convert in LOAN_FIELDS:
+                if column is not None:
+                    loan[name] = convert(row[column])
+                elif terms:
+                    # Same as LoanSerializer.get_loan_terms, None without loan terms
+                    loan[name] = loan_terms.get(row["id"]) or None
+            loans.append(loan)
+    return loans
@@ -0,0 +1,87 @@
+"""
+Loan term schedule engine.
+
+Pure functions without database access, shared by single and bulk loan
+approval. Amounts are split in integer cents, so instalments always add up to
+the loan amount. Work is done per distinct (amount, term) and (start, term)
+instead of per loan term, a batch of loans reuses the same instalment and due
+date columns.
+"""
+
+import calendar
+from collections import namedtuple
+from datetime import timedelta
+from functools import lru_cache
+
+from apps.loans.choices import LoanTermFrequency
+
+Schedule = namedtuple("Schedule", ("amounts", "due_dates"))
+
+FREQUENCY_DAYS = {
+    LoanTermFrequency.WEEKLY: 7,
+    LoanTermFrequency.BIWEEKLY: 14,
+}
+
+
+@lru_cache(maxsize=4096)
+def split_amount(amount, term):
+    """
+    Split an amount in `term` cent exact instalments.
+
+    Remainder cents are spread over the last instalments, one cent each, so
+    instalments differ by at most a cent.
+    """
+    base, remainder = divmod(round(amount * 100), term)
+    return (base / 100,) * (term - remainder) + ((base + 1) / 100,) * remainder
+
+
+@lru_cache(maxsize=256)
+def _offsets(days, term):
+    return tuple(timedelta(days=days * i) for i in range(1, term + 1))
+
+
+def add_months(value, months):
+    """
+    Add calendar months, clamping the day to the end of shorter months.
+    """
+    month = value.month - 1 + months
+    year = value.year + month // 12
+    month = month % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def due_dates(start, term, frequency=LoanTermFrequency.WEEKLY):
+    """
+    Due dates of `term` instalments, the first one a period after `start`.
+    """
+    if frequency == LoanTermFrequency.MONTHLY:
+        return tuple(add_months(start, i) for i in range(1, term + 1))
+    return tuple(start + offset for offset in _offsets(FREQUENCY_DAYS[frequency], term))
+
+
+def build_schedule(amount, term, start, frequency=LoanTermFrequency.WEEKLY):
+    return Schedule(split_amount(amount, term), due_dates(start, term, frequency))
+
+
+def build_schedules(amounts, terms, starts, frequency=LoanTermFrequency.WEEKLY):
+    """
+    Build schedules for a batch of loans.
+
+    - amounts, terms: columns with a value per loan.
+    - starts: a column with a start date per loan, or a single start date
+      shared by every loan (bulk approval).
+
+    Returns a list of Schedule, in the order of the loans.
+    """
+    if not isinstance(starts, (list, tuple)):
+        starts = (starts,) * len(amounts)
+
+    dates = {}
+    schedules = []
+    for amount, term, start in zip(amounts, terms, starts):
+        key = (start, term)
+        if key not in dates:
+            dates[key] = due_dates(start, term, frequency)
+        schedules.append(Schedule(split_amount(amount, term), dates[key]))
+    return schedules
@@ -0,0 +1,94 @@
+"""
+Loan search over maintained search documents (LoanSearchDocument).
+
+Each loan has a search document, its hex id and its borrower's username,
+names and email, lowercased and kept up to date by database triggers on loan
+and user writes (see migration 0008). A search matches loans whose document
+contains every word of the query:
+
+- PostgreSQL: LIKE conditions served by a pg_trgm GIN index on documents.
+- SQLite: an FTS5 trigram index on documents, words shorter than a trigram
+  are matched with LIKE on the documents found. Without FTS5 or its trigram
+  tokenizer (before 3.34) the migration skips the index, and documents are
+  scanned with LIKE conditions.
+
+Unlike icontains lookups across the loan -> user join, neither scans every loan
+(given the index).
+"""
+
+import uuid
+
+from django.db import connections
+from django.db.models.expressions import RawSQL
+
+from apps.loans.models import LoanSearchDocument
+
+# Words of a query used, longer queries are truncated
+SEARCH_MAX_WORDS = 8
+# Shortest word the SQLite trigram index can match
+TRIGRAM_LENGTH = 3
+
+FTS_TABLE = "loans_loansearchdocument_fts"
+FTS_MATCH_SQL = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+
+# SQLite database name -> whether it has the FTS5 trigram index
+_fts_indexes = {}
+
+
+def has_fts_index(connection):
+    """
+    Whether the SQLite database has the FTS5 trigram index, looked up once.
+    """
+    name = connection.settings_dict["NAME"]
+    if name not in _fts_indexes:
+        with connection.cursor() as cursor:
+            _fts_indexes[name] = FTS_TABLE in connection.introspection.table_names(
+                cursor
+            )
+    return _fts_indexes[name]
+
+
+def search_words(query):
+    """
+    Distinct lowercased words of a search query, UUIDs in their hex form.
+    """
+    words = []
+    for word in query.lower().split():
+        try:
+            word = uuid.UUID(word).hex
+        except ValueError:
+            pass
+        if word not in words:
+            words.append(word)
+    return words[:SEARCH_MAX_WORDS]
+
+
+def fts_query(words):
+    """
+    FTS5 query matching documents containing every word, as quoted strings.
+    """
+    return " AND ".join('"%s"' % word.replace('"', '""') for word in words)
+
+
+def search_loans(queryset, query, prefix=""):
+    """
+    Filter a queryset by loans matching the search query.
+
+    prefix: lookup path to the loan, to search related models (loan terms).
+    """
+    words = search_words(query)
+    if not words:
+        return queryset
+
+    documents = LoanSearchDocument.objects.all()
+    connection = connections[queryset.db]
+    if connection.vendor == "sqlite" and has_fts_index(connection):
+        indexed = [word for word in words if len(word) >= TRIGRAM_LENGTH]
+        if indexed:
+            documents = documents.filter(
+                id__in=RawSQL(FTS_MATCH_SQL, [fts_query(indexed)])
+            )
+        words = [word for word in words if len(word) < TRIGRAM_LENGTH]
+    for word in words:
+        documents = documents.filter(document__contains=word)
+    return queryset.filter(**{f"{prefix}id__in": documents.values("loan_id")})
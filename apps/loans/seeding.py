@@ -0,0 +1,318 @@
+"""
+Synthetic portfolio generator, see `manage.py seed_loans`.
+
+Deterministic: the same seed, counts and `now` generate the same users, loans
+and loan terms, ids included, whatever the chunk size. Rows are generated in
+chunks, without serializers, signals or per user password hashing (seeded
+users share one precomputed password hash).
+
+- Loan amounts are log-normal around 5000 (within AMOUNT_MIN and AMOUNT_MAX),
+  terms from TERM_WEIGHTS.
+- Loans are created over the last `days` days, pending ones recently.
+- Approved loans have weekly schedules, terms due before `now` are mostly
+  paid, the others overdue. Loans with every term paid are paid.
+- A few users hold most loans.
+"""
+
+import math
+import random
+import uuid
+from datetime import timedelta
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connections, models, router, transaction
+from django.utils import timezone
+
+from apps.loans.choices import LoanState, LoanTermStatus
+from apps.loans.models import Loan, LoanTerm
+from apps.loans.schedules import build_schedule
+from apps.loans.serializers import AMOUNT_MAX, AMOUNT_MIN
+from apps.loans.summary import rebuild_summary
+
+User = get_user_model()
+
+SEED_CHUNK_SIZE = 5000
+# Rows per INSERT, databases may lower it (SQLite variable limit)
+INSERT_BATCH_SIZE = 1000
+SEED_PASSWORD = "seed@@password"
+
+FIRST_NAMES = ("Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie")
+LAST_NAMES = ("Tan", "Lee", "Nguyen", "Smith", "Garcia", "Kumar", "Lim", "Wong")
+
+# Loan terms (weeks) and their weights
+TERM_WEIGHTS = {4: 10, 8: 15, 12: 30, 26: 25, 52: 20}
+PENDING_SHARE = 0.1
+# Pending loans were created in the last PENDING_DAYS days
+PENDING_DAYS = 14
+# Days between a loan creation and its approval, at most
+APPROVAL_DAYS = 3
+# Share of approved loans whose borrower missed the last due loan terms
+LATE_SHARE = 0.08
+
+LOAN_FIELDS = (
+    "id",
+    "created",
+    "updated",
+    "user",
+    "amount",
+    "term",
+    "state",
+    "approved_by",
+    "approved_date",
+    "closed_date",
+    "outstanding_amount",
+    "paid_terms_count",
+    "next_due_date",
+    "next_due_amount",
+)
+LOAN_TERM_FIELDS = (
+    "id",
+    "created",
+    "updated",
+    "loan",
+    "amount",
+    "due_date",
+    "status",
+    "paid_amount",
+    "paid_date",
+)
+
+# Values of these fields are passed to the database as they are
+PLAIN_FIELDS = (
+    models.BooleanField,
+    models.CharField,
+    models.FloatField,
+    models.IntegerField,
+)
+
+
+def insert_rows(model, field_names, rows):
+    """
+    Insert rows, tuples of field_names values, with multi-row INSERTs.
+
+    Same SQL as bulk_create, without model instances, pre_save and value
+    validation:
+
+    - bulk_create calls pre_save, which sets the auto_now_add created and
+      auto_now updated fields to the current time, the generated history
+      (creation, approval, repayment timestamps) would be lost.
+    - Model instances and pre_save take most of bulk_create time, 20000 loans
+      and their 400000 loan terms are inserted about 2x faster (SQLite).
+    """
+    connection = connections[router.db_for_write(model)]
+    fields = [model._meta.get_field(name) for name in field_names]
+    # Values are of the fields' Python types already, only adapted to the database
+    prepare = [
+        None
+        if isinstance(field.target_field if field.is_relation else field, PLAIN_FIELDS)
+        else partial(field.get_db_prep_value, connection=connection, prepared=True)
+        for field in fields
+    ]
+    batch_size = max(
+        min(connection.ops.bulk_batch_size(fields, rows), INSERT_BATCH_SIZE), 1
+    )
+
+    quote_name = connection.ops.quote_name
+    sql = "INSERT INTO %s (%s) VALUES " % (
+        quote_name(model._meta.db_table),
+        ", ".join(quote_name(field.column) for field in fields),
+    )
+    placeholder = "(%s)" % ", ".join(["%s"] * len(fields))
+
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), batch_size):
+            batch = rows[offset : offset + batch_size]
+            params = [
+                value if convert is None else convert(value)
+                for row in batch
+                for convert, value in zip(prepare, row)
+            ]
+            cursor.execute(sql + ", ".join([placeholder] * len(batch)), params)
+
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _chunks(count, chunk_size):
+    for offset in range(0, count, chunk_size):
+        yield range(offset, min(offset + chunk_size, count))
+
+
+def seed_users(rng, count, chunk_size, username_prefix, now):
+    """
+    Create users, a staff user (loan approver) first. Returns the staff user id
+    and user ids, in creation order.
+    """
+    password = make_password(SEED_PASSWORD)
+    staff = User.objects.create(
+        username=f"{username_prefix}staff",
+        password=password,
+        is_staff=True,
+        date_joined=now,
+    )
+
+    for chunk in _chunks(count, chunk_size):
+        User.objects.bulk_create(
+            User(
+                username=f"{username_prefix}{i:08d}",
+                email=f"{username_prefix}{i:08d}@example.com",
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=now,
+            )
+            for i in chunk
+        )
+
+    # Zero padded usernames sort in creation order
+    user_ids = list(
+        User.objects.filter(username__startswith=username_prefix)
+        .exclude(pk=staff.pk)
+        .order_by("username")
+        .values_list("id", flat=True)
+    )
+    return staff.pk, user_ids
+
+
+def generate_loan(rng, user_id, staff_id, now, days):
+    """
+    Generate a loan and its loan terms, as LOAN_FIELDS and LOAN_TERM_FIELDS rows.
+    """
+    terms, weights = zip(*TERM_WEIGHTS.items())
+    term = rng.choices(terms, weights)[0]
+    amount = round(rng.lognormvariate(math.log(5000), 0.8), -2)
+    # Within the loan creation limits
+    amount = float(max(AMOUNT_MIN, min(amount, AMOUNT_MAX)))
+    loan_id = _uuid(rng)
+
+    if rng.random() < PENDING_SHARE:
+        created = now - timedelta(seconds=rng.uniform(0, PENDING_DAYS * 86400))
+        loan = (
+            loan_id,
+            created,
+            created,
+            user_id,
+            amount,
+            term,
+            LoanState.PENDING,
+            None,
+            None,
+            None,
+            0,
+            0,
+            None,
+            None,
+        )
+        return loan, []
+
+    created = now - timedelta(seconds=rng.uniform(0, days * 86400))
+    approved_date = min(
+        created + timedelta(seconds=rng.uniform(0, APPROVAL_DAYS * 86400)), now
+    )
+    amounts, due_dates = build_schedule(amount, term, approved_date)
+
+    due = sum(1 for due_date in due_dates if due_date <= now)
+    paid = due
+    if due and rng.random() < LATE_SHARE:
+        paid = max(0, due - rng.randint(1, 3))
+
+    loan_terms = []
+    for i, (term_amount, due_date) in enumerate(zip(amounts, due_dates)):
+        if i < paid:
+            status, paid_amount = LoanTermStatus.PAID, term_amount
+            paid_date = updated = min(
+                due_date - timedelta(hours=rng.randint(0, 72)), now
+            )
+        else:
+            status = LoanTermStatus.OVERDUE if i < due else LoanTermStatus.PENDING
+            paid_amount, paid_date, updated = 0, None, approved_date
+        loan_terms.append(
+            (
+                _uuid(rng),
+                approved_date,
+                updated,
+                loan_id,
+                term_amount,
+                due_date,
+                status,
+                paid_amount,
+                paid_date,
+            )
+        )
+
+    if paid < term:
+        state, closed_date, updated = LoanState.APPROVED, None, approved_date
+        next_due_date, next_due_amount = due_dates[paid], amounts[paid]
+    else:
+        state, next_due_date, next_due_amount = LoanState.PAID, None, None
+        # Closed with the last loan term repayment
+        closed_date = updated = loan_terms[-1][-1]
+    loan = (
+        loan_id,
+        created,
+        updated,
+        user_id,
+        amount,
+        term,
+        state,
+        staff_id,
+        approved_date,
+        closed_date,
+        sum(amounts[paid:]),
+        paid,
+        next_due_date,
+        next_due_amount,
+    )
+    return loan, loan_terms
+
+
+def seed_loans(
+    users,
+    loans,
+    seed=0,
+    chunk_size=SEED_CHUNK_SIZE,
+    days=365,
+    username_prefix="seed",
+    now=None,
+    progress=None,
+):
+    """
+    Create users, their loans and loan terms, and rebuild the portfolio summary.
+
+    - now: end of the generated history, defaults to the start of today.
+    - progress: called with the number of loans created after every chunk.
+
+    Returns the number of users, loans and loan terms created.
+    """
+    rng = random.Random(seed)
+    if now is None:
+        now = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    staff_id, user_ids = seed_users(rng, users, chunk_size, username_prefix, now)
+
+    loan_terms_count = 0
+    for chunk in _chunks(loans, chunk_size):
+        loan_rows, loan_term_rows = [], []
+        for _ in chunk:
+            # A few users hold most loans
+            user_id = user_ids[int(len(user_ids) * rng.random() ** 3)]
+            loan, loan_terms = generate_loan(rng, user_id, staff_id, now, days)
+            loan_rows.append(loan)
+            loan_term_rows += loan_terms
+
+        with transaction.atomic():
+            insert_rows(Loan, LOAN_FIELDS, loan_rows)
+            insert_rows(LoanTerm, LOAN_TERM_FIELDS, loan_term_rows)
+        loan_terms_count += len(loan_term_rows)
+        if progress is not None:
+            progress(chunk.stop)
+
+    rebuild_summary()
+    return {
+        "users": len(user_ids) + 1,
+        "loans": loans,
+        "loan_terms": loan_terms_count,
+    }
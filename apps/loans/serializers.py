@@ -1,6 +1,10 @@
+from django.db import transaction
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+
+from apps.loans.choices import LoanFileFormat, LoanPagination, LoanState
 from apps.loans.models import Loan, LoanTerm
+from apps.loans.summary import record_created
 
 # Terms in weekly
 TERM_MIN = 1  # 1 week
@@ -10,6 +14,33 @@ TERM_MAX = 52  # 52 week (1 year)
 AMOUNT_MIN = 1000
 AMOUNT_MAX = 1000000
 
+# Loans per bulk approval request
+BULK_APPROVE_MAX = 1000
+
+
+def validate_loan_amount(amount):
+    if amount < AMOUNT_MIN:
+        raise serializers.ValidationError(
+            f"amount($) should be greater than or equal {AMOUNT_MIN}"
+        )
+    if amount > AMOUNT_MAX:
+        raise serializers.ValidationError(
+            f"amount($) should be less than or equal {AMOUNT_MAX}"
+        )
+    return amount
+
+
+def validate_loan_term(term):
+    if term < TERM_MIN:
+        raise serializers.ValidationError(
+            f"term(weekly) should be greater than or equal {TERM_MIN}"
+        )
+    if term > TERM_MAX:
+        raise serializers.ValidationError(
+            f"term(weekly) should be less than or equal {TERM_MAX}"
+        )
+    return term
+
 
 class LoanTermSerializer(serializers.ModelSerializer):
     class Meta:
@@ -32,8 +63,21 @@ class LoanSerializer(serializers.ModelSerializer):
             "approved_by",
             "loan_terms",
             "closed_date",
+            "outstanding_amount",
+            "paid_terms_count",
+            "next_due_date",
+            "next_due_amount",
+        )
+        read_only_fields = (
+            "user",
+            "approved_by",
+            "loan_terms",
+            "closed_date",
+            "outstanding_amount",
+            "paid_terms_count",
+            "next_due_date",
+            "next_due_amount",
         )
-        read_only_fields = ("user", "approved_by", "loan_terms", "closed_date")
 
     @extend_schema_field(LoanTermSerializer)
     def get_loan_terms(self, obj):
@@ -41,6 +85,30 @@ class LoanSerializer(serializers.ModelSerializer):
         return instance if instance else None
 
 
+class LoanListSerializer(serializers.ModelSerializer):
+    """
+    Loan with its balance fields, without loan terms.
+    """
+
+    class Meta:
+        model = Loan
+        fields = (
+            "id",
+            "amount",
+            "term",
+            "state",
+            "approved_date",
+            "user",
+            "approved_by",
+            "closed_date",
+            "outstanding_amount",
+            "paid_terms_count",
+            "next_due_date",
+            "next_due_amount",
+        )
+        read_only_fields = fields
+
+
 class LoanCreateInputSerializer(serializers.ModelSerializer):
     class Meta:
         model = Loan
@@ -61,30 +129,16 @@ class LoanCreateInputSerializer(serializers.ModelSerializer):
         # Update user
         validated_data["user"] = user
 
-        loan = super().create(validated_data)
+        with transaction.atomic():
+            loan = super().create(validated_data)
+            record_created([(loan.created, loan.amount)])
         return loan
 
     def validate_amount(self, amount):
-        if amount < AMOUNT_MIN:
-            raise serializers.ValidationError(
-                f"amount($) should be greater than or equal {AMOUNT_MIN}"
-            )
-        if amount > AMOUNT_MAX:
-            raise serializers.ValidationError(
-                f"amount($) should be less than or equal {AMOUNT_MAX}"
-            )
-        return amount
+        return validate_loan_amount(amount)
 
     def validate_term(self, term):
-        if term < TERM_MIN:
-            raise serializers.ValidationError(
-                f"term(weekly) should be greater than or equal {TERM_MIN}"
-            )
-        if term > TERM_MAX:
-            raise serializers.ValidationError(
-                f"term(weekly) should be less than or equal {TERM_MAX}"
-            )
-        return term
+        return validate_loan_term(term)
 
 
 class LoanApproveInputSerializer(serializers.ModelSerializer):
@@ -93,10 +147,103 @@ class LoanApproveInputSerializer(serializers.ModelSerializer):
         fields = ("state",)
 
 
+class LoanBulkApproveInputSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.UUIDField(),
+        min_length=1,
+        max_length=BULK_APPROVE_MAX,
+        help_text="Loan ids to approve",
+    )
+
+
+class LoanBulkApproveResultSerializer(serializers.Serializer):
+    id = serializers.UUIDField()
+    state = serializers.ChoiceField(choices=LoanState.choices, required=False)
+    error = serializers.CharField(required=False)
+
+
 class LoanListQuerySerializer(serializers.Serializer):
     all = serializers.BooleanField(
         required=False, default=False, help_text="List all loans"
     )
+    pagination = serializers.ChoiceField(
+        choices=LoanPagination.choices,
+        required=False,
+        default=LoanPagination.PAGE,
+        help_text="Pagination mode, cursor pagination skips counting all loans",
+    )
+    terms = serializers.BooleanField(
+        required=False,
+        default=True,
+        help_text="Include loan terms, loan balance fields are always included",
+    )
+    search = serializers.CharField(
+        required=False,
+        allow_blank=True,
+        max_length=200,
+        help_text="Loans whose id or borrower's username, names or email contain "
+        "every word",
+    )
+
+
+class LoanImportRowErrorSerializer(serializers.Serializer):
+    row = serializers.IntegerField(
+        help_text="Row number, by the line it starts on, header line excluded"
+    )
+    errors = serializers.DictField(
+        child=serializers.ListField(child=serializers.CharField())
+    )
+
+
+class LoanImportResultSerializer(serializers.Serializer):
+    created = serializers.IntegerField()
+    errors = LoanImportRowErrorSerializer(many=True)
+
+
+class LoanAnalyticsTotalSerializer(serializers.Serializer):
+    count = serializers.IntegerField()
+    amount = serializers.FloatField()
+
+
+class LoanAnalyticsStateSerializer(LoanAnalyticsTotalSerializer):
+    state = serializers.ChoiceField(choices=LoanState.choices)
+
+
+class LoanAnalyticsOverdueBucketSerializer(LoanAnalyticsTotalSerializer):
+    bucket = serializers.CharField(help_text="Days past due date")
+
+
+class LoanAnalyticsOverdueSerializer(LoanAnalyticsTotalSerializer):
+    buckets = LoanAnalyticsOverdueBucketSerializer(many=True)
+
+
+class LoanAnalyticsSerializer(serializers.Serializer):
+    loans = LoanAnalyticsTotalSerializer()
+    by_state = LoanAnalyticsStateSerializer(many=True)
+    collected_amount = serializers.FloatField()
+    outstanding_amount = serializers.FloatField()
+    overdue = LoanAnalyticsOverdueSerializer()
+
+
+class LoanFilterQuerySerializer(serializers.Serializer):
+    state = serializers.ChoiceField(
+        choices=LoanState.choices, required=False, help_text="Filter by loan state"
+    )
+    created_after = serializers.DateTimeField(
+        required=False, help_text="Loans created at or after this date"
+    )
+    created_before = serializers.DateTimeField(
+        required=False, help_text="Loans created before this date"
+    )
+
+
+class LoanExportQuerySerializer(LoanFilterQuerySerializer):
+    output = serializers.ChoiceField(
+        choices=LoanFileFormat.choices,
+        required=False,
+        default=LoanFileFormat.CSV,
+        help_text="Export file format",
+    )
 
 
 class LoanRePaymentInputSerializer(serializers.ModelSerializer):
@@ -0,0 +1,11 @@
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+
+from apps.loans.models import Loan
+from apps.loans.summary import record_deleted
+
+
+@receiver(pre_delete, sender=Loan)
+def record_deleted_loan(sender, instance, **kwargs):
+    # Before the delete, its loan terms are deleted along with it
+    record_deleted(instance)
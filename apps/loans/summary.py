@@ -0,0 +1,304 @@
+"""
+Incrementally maintained portfolio summary (PortfolioSummary, OverdueSummary).
+
+Loan writes record their changes as deltas per (loan creation day, loan state),
+and per due day for overdue loan terms, applied with
+UPDATE ... SET field = field + delta in the caller's transaction. Loan deletes
+(admin, user deletion) are recorded by a pre_delete handler, see
+apps.loans.signals.
+"""
+
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.loans.choices import UNPAID_LOAN_TERM_STATUSES, LoanState, LoanTermStatus
+from apps.loans.models import Loan, LoanTerm, OverdueSummary, PortfolioSummary
+
+SUMMARY_FIELDS = ("loans_count", "amount", "collected_amount", "outstanding_amount")
+OVERDUE_FIELDS = ("terms_count", "amount")
+
+# Summary model -> (key fields, summed fields)
+SUMMARIES = {
+    PortfolioSummary: (("day", "state"), SUMMARY_FIELDS),
+    OverdueSummary: (("day", "state", "due_day"), OVERDUE_FIELDS),
+}
+
+
+def _day(created):
+    return timezone.localdate(created)
+
+
+def _deltas(fields=SUMMARY_FIELDS):
+    return defaultdict(lambda: dict.fromkeys(fields, 0))
+
+
+def apply_deltas(deltas, model=PortfolioSummary):
+    """
+    Apply deltas, a dict of key -> {field: delta}, keys are (day, state) of
+    PortfolioSummary rows or (day, state, due day) of OverdueSummary rows.
+
+    Rows are updated in key order, so concurrent writers do not deadlock, and
+    created on first use.
+    """
+    key_fields = SUMMARIES[model][0]
+    now = timezone.now()
+    for key, changes in sorted(deltas.items()):
+        changes = {field: delta for field, delta in changes.items() if delta}
+        if not changes:
+            continue
+
+        lookups = dict(zip(key_fields, key))
+        rows = model.objects.filter(**lookups)
+        updates = {field: F(field) + delta for field, delta in changes.items()}
+        if rows.update(updated=now, **updates):
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(**lookups, **changes)
+        except IntegrityError:
+            # Created concurrently
+            rows.update(updated=now, **updates)
+
+
+def overdue_totals(loan_terms):
+    """
+    Count and amount of loan terms per loan creation day, loan state and due day.
+    """
+    return (
+        loan_terms.annotate(
+            day=TruncDate("loan__created"), due_day=TruncDate("due_date")
+        )
+        .values("day", "loan__state", "due_day")
+        .annotate(terms_count=Count("id"), amount=Sum("amount"))
+        .order_by()
+    )
+
+
+def record_created(loans):
+    """
+    Record new (pending) loans, given as (created, amount).
+    """
+    deltas = _deltas()
+    for created, amount in loans:
+        row = deltas[(_day(created), LoanState.PENDING)]
+        row["loans_count"] += 1
+        row["amount"] += amount
+    apply_deltas(deltas)
+
+
+def record_approved(loans):
+    """
+    Record approved loans, given as (created, amount), their loan terms add up
+    to the loan amount.
+    """
+    deltas = _deltas()
+    for created, amount in loans:
+        day = _day(created)
+        deltas[(day, LoanState.PENDING)]["loans_count"] -= 1
+        deltas[(day, LoanState.PENDING)]["amount"] -= amount
+        deltas[(day, LoanState.APPROVED)]["loans_count"] += 1
+        deltas[(day, LoanState.APPROVED)]["amount"] += amount
+        deltas[(day, LoanState.APPROVED)]["outstanding_amount"] += amount
+    apply_deltas(deltas)
+
+
+def record_overdue(loan_terms):
+    """
+    Record loan terms about to be marked overdue, given as a queryset.
+    """
+    deltas = _deltas(OVERDUE_FIELDS)
+    for row in overdue_totals(loan_terms):
+        deltas[(row["day"], row["loan__state"], row["due_day"])] = {
+            "terms_count": row["terms_count"],
+            "amount": row["amount"],
+        }
+    apply_deltas(deltas, OverdueSummary)
+
+
+def record_repayment(loan, loan_term, paid_amount, collected_amount=None):
+    """
+    Record a loan term repayment.
+
+    loan_term: the paid loan term as a dict of its amount, status and due date.
+    collected_amount: total paid amount of the loan, when the repayment closed it.
+    """
+    deltas = _deltas()
+    day = _day(loan.created)
+    current = deltas[(day, loan.state)]
+    current["collected_amount"] += paid_amount
+    current["outstanding_amount"] -= loan_term["amount"]
+
+    if collected_amount is not None:
+        # Move the closed loan to paid state
+        paid = deltas[(day, LoanState.PAID)]
+        current["loans_count"] -= 1
+        current["amount"] -= loan.amount
+        current["collected_amount"] -= collected_amount
+        paid["loans_count"] += 1
+        paid["amount"] += loan.amount
+        paid["collected_amount"] += collected_amount
+    apply_deltas(deltas)
+
+    if loan_term["status"] == LoanTermStatus.OVERDUE:
+        overdue = _deltas(OVERDUE_FIELDS)
+        row = overdue[(day, loan.state, _day(loan_term["due_date"]))]
+        row["terms_count"] -= 1
+        row["amount"] -= loan_term["amount"]
+        apply_deltas(overdue, OverdueSummary)
+
+
+def _settled_terms(loan):
+    # Paid and overdue loan terms of a loan, their amounts move with its state
+    return LoanTerm.objects.filter(
+        loan=loan, status__in=(LoanTermStatus.PAID, LoanTermStatus.OVERDUE)
+    ).values("status", "amount", "paid_amount", "due_date")
+
+
+def record_updated(loan, state, amount, outstanding_amount):
+    """
+    Record an update of a loan (admin updates, approval), given its state,
+    amount and outstanding amount before the update.
+
+    A loan changing state takes its collected amount and overdue loan terms
+    along, read with a single query.
+    """
+    deltas = _deltas()
+    day = _day(loan.created)
+    before, after = deltas[(day, state)], deltas[(day, loan.state)]
+    before["loans_count"] -= 1
+    before["amount"] -= amount
+    before["outstanding_amount"] -= outstanding_amount
+    after["loans_count"] += 1
+    after["amount"] += loan.amount
+    after["outstanding_amount"] += loan.outstanding_amount
+
+    overdue = _deltas(OVERDUE_FIELDS)
+    if state != loan.state:
+        for loan_term in _settled_terms(loan):
+            if loan_term["status"] == LoanTermStatus.PAID:
+                before["collected_amount"] -= loan_term["paid_amount"]
+                after["collected_amount"] += loan_term["paid_amount"]
+                continue
+            due_day = _day(loan_term["due_date"])
+            overdue[(day, state, due_day)]["terms_count"] -= 1
+            overdue[(day, state, due_day)]["amount"] -= loan_term["amount"]
+            overdue[(day, loan.state, due_day)]["terms_count"] += 1
+            overdue[(day, loan.state, due_day)]["amount"] += loan_term["amount"]
+    apply_deltas(deltas)
+    apply_deltas(overdue, OverdueSummary)
+
+
+def record_deleted(loan):
+    """
+    Record a loan about to be deleted, with its collected amount and overdue
+    loan terms, read with a single query.
+    """
+    deltas = _deltas()
+    day = _day(loan.created)
+    row = deltas[(day, loan.state)]
+    row["loans_count"] -= 1
+    row["amount"] -= loan.amount
+    row["outstanding_amount"] -= loan.outstanding_amount
+
+    overdue = _deltas(OVERDUE_FIELDS)
+    for loan_term in _settled_terms(loan):
+        if loan_term["status"] == LoanTermStatus.PAID:
+            row["collected_amount"] -= loan_term["paid_amount"]
+            continue
+        due = overdue[(day, loan.state, _day(loan_term["due_date"]))]
+        due["terms_count"] -= 1
+        due["amount"] -= loan_term["amount"]
+    apply_deltas(deltas)
+    apply_deltas(overdue, OverdueSummary)
+
+
+def compute_summary():
+    """
+    Compute summary rows from scratch, with two grouped queries.
+    """
+    rows = _deltas()
+    loans = (
+        Loan.objects.annotate(day=TruncDate("created"))
+        .values("day", "state")
+        .annotate(loans_count=Count("id"), amount=Sum("amount"))
+        .order_by()
+    )
+    for loan in loans:
+        row = rows[(loan["day"], loan["state"])]
+        row["loans_count"] = loan["loans_count"]
+        row["amount"] = loan["amount"] or 0
+
+    loan_terms = (
+        LoanTerm.objects.annotate(day=TruncDate("loan__created"))
+        .values("day", "loan__state")
+        .annotate(
+            collected_amount=Sum("paid_amount", filter=Q(status=LoanTermStatus.PAID)),
+            outstanding_amount=Sum(
+                "amount", filter=Q(status__in=UNPAID_LOAN_TERM_STATUSES)
+            ),
+        )
+        .order_by()
+    )
+    for loan_term in loan_terms:
+        row = rows[(loan_term["day"], loan_term["loan__state"])]
+        row["collected_amount"] = loan_term["collected_amount"] or 0
+        row["outstanding_amount"] = loan_term["outstanding_amount"] or 0
+    return rows
+
+
+def compute_overdue_summary():
+    """
+    Compute overdue summary rows from scratch, with a grouped query.
+    """
+    rows = _deltas(OVERDUE_FIELDS)
+    for row in overdue_totals(LoanTerm.objects.filter(status=LoanTermStatus.OVERDUE)):
+        rows[(row["day"], row["loan__state"], row["due_day"])] = {
+            "terms_count": row["terms_count"],
+            "amount": row["amount"] or 0,
+        }
+    return rows
+
+
+def _rebuild(model, compute):
+    """
+    Replace rows of a summary model with rows computed from scratch.
+
+    Returns the number of rows which drifted from the computed rows.
+    """
+    key_fields, fields = SUMMARIES[model]
+    # Writers recording deltas wait for the rebuild, then apply their deltas
+    existing = {
+        tuple(row[field] for field in key_fields): row
+        for row in model.objects.select_for_update().values(*key_fields, *fields)
+    }
+    rows = compute()
+    drifted = sum(
+        1
+        for key in set(rows) | set(existing)
+        if any(
+            round(rows.get(key, {}).get(field, 0), 2)
+            != round(existing.get(key, {}).get(field, 0), 2)
+            for field in fields
+        )
+    )
+    model.objects.all().delete()
+    model.objects.bulk_create(
+        model(**dict(zip(key_fields, key)), **values) for key, values in rows.items()
+    )
+    return drifted
+
+
+def rebuild_summary():
+    """
+    Replace summary rows (portfolio and overdue) with rows computed from scratch.
+
+    Returns the number of rows which drifted from the computed rows.
+    """
+    with transaction.atomic():
+        return _rebuild(PortfolioSummary, compute_summary) + _rebuild(
+            OverdueSummary, compute_overdue_summary
+        )
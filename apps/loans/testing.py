@@ -0,0 +1,72 @@
+import re
+from contextlib import contextmanager
+
+from django.db import connection, connections, transaction
+from django.test.utils import CaptureQueriesContext
+
+# Maximum number of queries a loans endpoint may issue, whatever the page size
+LOAN_LIST_QUERY_BUDGET = 4  # auth + count + loans + loan terms
+LOAN_DETAIL_QUERY_BUDGET = 4  # auth + validators + loan + loan terms
+# session + user + estimate + count + rows + date hierarchy (2) + term filter
+LOAN_ADMIN_CHANGELIST_QUERY_BUDGET = 8
+
+# Full table scan lines of EXPLAIN output, per database vendor
+SEQUENTIAL_SCAN_PATTERNS = {
+    "sqlite": re.compile(r"\bSCAN (?:TABLE )?\w+\s*$", re.MULTILINE),
+    "postgresql": re.compile(r"\bSeq Scan on \w+"),
+}
+
+
+class QueryBudgetMixin:
+    """
+    Test case mixin to assert an upper bound on executed queries.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget, using=connection):
+        with CaptureQueriesContext(using) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = "\n".join(
+                f"{i}. {query['sql']}"
+                for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(
+                f"{executed} queries executed, query budget is {budget}\n{queries}"
+            )
+
+
+class QueryPlanMixin:
+    """
+    Test case mixin to assert a query is served by indexes.
+    """
+
+    def explain(self, queryset):
+        """
+        Capture EXPLAIN output of a queryset.
+
+        On PostgreSQL, sequential scans are disabled for the statement so that
+        the planner picks an index whenever one exists, even for the small
+        tables of the test database.
+        """
+        vendor = connections[queryset.db].vendor
+        if vendor not in SEQUENTIAL_SCAN_PATTERNS:
+            self.skipTest(f"EXPLAIN plan checks are not supported on {vendor}")
+
+        with transaction.atomic(using=queryset.db):
+            if vendor == "postgresql":
+                with connections[queryset.db].cursor() as cursor:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+            return queryset.explain()
+
+    def assertNoSequentialScan(self, queryset):
+        plan = self.explain(queryset)
+        vendor = connections[queryset.db].vendor
+        match = SEQUENTIAL_SCAN_PATTERNS[vendor].search(plan)
+        if match:
+            self.fail(
+                f"Sequential scan ({match.group(0).strip()}) in query plan of\n"
+                f"{queryset.query}\n{plan}"
+            )
@@ -1,11 +1,85 @@
+import csv
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
+from threading import Barrier, Thread
+from unittest import mock, skipUnless
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.admin import site
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, connections
+from django.db.models import Prefetch
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
 
 from rest_framework import status
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APITestCase, APIClient
 from rest_framework.authtoken.models import Token
 
-from apps.loans.choices import LoanState, LoanTermStatus
-from apps.loans.serializers import AMOUNT_MIN, TERM_MIN, AMOUNT_MAX, TERM_MAX
+from apps.accounts.paginators import EstimatedCountPaginator
+from apps.loans.admin import LoanAdmin
+from apps.loans.choices import (
+    UNPAID_LOAN_TERM_STATUSES,
+    LoanState,
+    LoanTermFrequency,
+    LoanTermStatus,
+)
+from apps.loans.analytics import portfolio_analytics
+from apps.loans.approvals import approve_loans
+from apps.loans.models import (
+    Loan,
+    LoanSearchDocument,
+    LoanTerm,
+    OverdueSummary,
+    PortfolioSummary,
+)
+from apps.loans.overdue import overdue_terms, sweep_overdue_batch
+from apps.loans.repayments import RepaymentError, repay_loan
+from apps.loans.representations import LOAN_COLUMNS, loan_representations
+from apps.loans.schedules import build_schedule, build_schedules, split_amount
+from apps.loans.search import search_loans
+from apps.loans.seeding import seed_loans
+from apps.loans.serializers import (
+    AMOUNT_MAX,
+    AMOUNT_MIN,
+    TERM_MAX,
+    TERM_MIN,
+    LoanListSerializer,
+    LoanSerializer,
+)
+from apps.loans.summary import rebuild_summary
+from apps.loans.testing import (
+    LOAN_ADMIN_CHANGELIST_QUERY_BUDGET,
+    LOAN_DETAIL_QUERY_BUDGET,
+    LOAN_LIST_QUERY_BUDGET,
+    QueryBudgetMixin,
+    QueryPlanMixin,
+)
+from mini_aspire.db_routers import (
+    REPLICA_DB_ALIAS,
+    ReplicaRouter,
+    ReplicaRoutingMiddleware,
+)
+from mini_aspire.parsers import FastJSONParser
+from mini_aspire.renderers import FastJSONRenderer, orjson
 
 
 class LoanTestCase(APITestCase):
@@ -133,6 +207,12 @@ class LoanTestCase(APITestCase):
         self.assertEqual(response["user"], self.user.id)
         self.assertEqual(response["approved_by"], self.admin.id)
         self.assertEqual(len(response["loan_terms"]), 3)
+        self.assertEqual(response["outstanding_amount"], 10000)
+        self.assertEqual(response["paid_terms_count"], 0)
+        self.assertEqual(response["next_due_amount"], 3333.33)
+        self.assertEqual(
+            response["next_due_date"], response["loan_terms"][0]["due_date"]
+        )
 
         # With authorization (admin user) - error for already approved
         request = self.client.patch(
@@ -144,6 +224,244 @@ class LoanTestCase(APITestCase):
         self.assertEqual(request.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response["error"], "Loan is already approved")
 
+    def test_api_bulk_approve_loan(self):
+        """
+        Test admin bulk approve loan endpoint
+        """
+        # With authorization (normal user)
+        request = self.client.patch(
+            "/api/loans/bulk-approve-loan/",
+            {"ids": [self.loan1["id"]]},
+            HTTP_AUTHORIZATION=f"Token {self.user_token.key}",
+        )
+        self.assertEqual(request.status_code, status.HTTP_403_FORBIDDEN)
+
+        # With authorization (admin user)
+        missing = "00000000-0000-0000-0000-000000000000"
+        request = self.client.patch(
+            "/api/loans/bulk-approve-loan/",
+            {"ids": [self.loan1["id"], self.loan2["id"], self.loan1["id"], missing]},
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        response = request.json()
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response,
+            [
+                {"id": self.loan1["id"], "state": LoanState.APPROVED},
+                {"id": self.loan2["id"], "state": LoanState.APPROVED},
+                {"id": missing, "error": "Loan does not exist"},
+            ],
+        )
+
+        # Loan terms are created
+        request = self.client.get(
+            f"/api/loans/{self.loan2['id']}/",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        response = request.json()
+        self.assertEqual(response["state"], LoanState.APPROVED)
+        self.assertEqual(response["approved_by"], self.admin.id)
+        self.assertEqual(
+            [term["amount"] for term in response["loan_terms"]],
+            [5000, 5000, 5000, 5000],
+        )
+
+        # Loan balance is set
+        self.assertEqual(response["outstanding_amount"], 20000)
+        self.assertEqual(response["paid_terms_count"], 0)
+        self.assertEqual(response["next_due_amount"], 5000)
+        self.assertEqual(
+            response["next_due_date"], response["loan_terms"][0]["due_date"]
+        )
+
+        # Loans with different first loan terms
+        request = self.client.get(
+            f"/api/loans/{self.loan1['id']}/",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        self.assertEqual(request.json()["next_due_amount"], 3333.33)
+
+        # Error for already approved
+        request = self.client.patch(
+            "/api/loans/bulk-approve-loan/",
+            {"ids": [self.loan1["id"]]},
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        self.assertEqual(
+            request.json(),
+            [{"id": self.loan1["id"], "error": "Loan is already approved"}],
+        )
+
+    def test_api_bulk_create_loan(self):
+        """
+        Test admin bulk create loan endpoint
+        """
+        # With authorization (normal user)
+        request = self.client.post(
+            "/api/loans/bulk-create-loan/",
+            "amount,term\n10000,3\n",
+            content_type="text/csv",
+            HTTP_AUTHORIZATION=f"Token {self.user_token.key}",
+        )
+        self.assertEqual(request.status_code, status.HTTP_403_FORBIDDEN)
+
+        # CSV, invalid rows are reported and skipped
+        request = self.client.post(
+            "/api/loans/bulk-create-loan/",
+            "amount,term,user\n"
+            "10000,3,\n"
+            f"20000,4,{self.user.id}\n"
+            "0,60,\n"
+            "abc,,\n"
+            "10000,3,999999\n",
+            content_type="text/csv",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        response = request.json()
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["created"], 2)
+        self.assertEqual(
+            response["errors"],
+            [
+                {
+                    "row": 3,
+                    "errors": {
+                        "amount": [
+                            f"amount($) should be greater than or equal {AMOUNT_MIN}"
+                        ],
+                        "term": [
+                            f"term(weekly) should be less than or equal {TERM_MAX}"
+                        ],
+                    },
+                },
+                {
+                    "row": 4,
+                    "errors": {
+                        "amount": ["A valid number is required."],
+                        "term": ["This field is required."],
+                    },
+                },
+                {"row": 5, "errors": {"user": ["User does not exist"]}},
+            ],
+        )
+        self.assertEqual(Loan.objects.filter(user=self.admin).count(), 2)
+        self.assertEqual(Loan.objects.filter(user=self.user).count(), 2)
+
+        # NDJSON
+        request = self.client.post(
+            "/api/loans/bulk-create-loan/",
+            '{"amount": 5000, "term": 52, "user": %d}\n\nnot json\n' % self.user.id,
+            content_type="application/x-ndjson",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        response = request.json()
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["created"], 1)
+        self.assertEqual(
+            response["errors"],
+            [{"row": 3, "errors": {"non_field_errors": ["Invalid row"]}}],
+        )
+        self.assertEqual(Loan.objects.filter(user=self.user, term=52).count(), 1)
+
+        # Rows which are not valid UTF-8 are reported and skipped, rows are
+        # numbered by line, blank lines and lines of quoted values included
+        request = self.client.post(
+            "/api/loans/bulk-create-loan/",
+            b"amount,term,user\n"
+            b"6000,5,\n"
+            b"\n"
+            b"6000,\xff5,\n"
+            b'6000,6,"\n"\n'
+            b"\xe9,,\n"
+            b"6000,7,\n",
+            content_type="text/csv",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        response = request.json()
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["created"], 2)
+        self.assertEqual(
+            response["errors"],
+            [
+                {"row": 3, "errors": {"non_field_errors": ["Row is not valid UTF-8"]}},
+                {"row": 4, "errors": {"user": ["A valid integer is required."]}},
+                {"row": 6, "errors": {"non_field_errors": ["Row is not valid UTF-8"]}},
+            ],
+        )
+        self.assertEqual(
+            set(Loan.objects.filter(amount=6000).values_list("term", flat=True)),
+            {5, 7},
+        )
+
+        # Unsupported content type
+        request = self.client.post(
+            "/api/loans/bulk-create-loan/",
+            [{"amount": 5000, "term": 52}],
+            format="json",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        self.assertEqual(request.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_api_loan_export(self):
+        """
+        Test admin loan export endpoint
+        """
+        # With authorization (normal user)
+        request = self.client.get(
+            "/api/loans/export/", HTTP_AUTHORIZATION=f"Token {self.user_token.key}"
+        )
+        self.assertEqual(request.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Approve loan - (admin user)
+        self.client.patch(
+            f"/api/loans/{self.loan1['id']}/approve-loan/",
+            {"state": "approved"},
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+
+        # CSV, a row per loan term and a row for loan without loan terms
+        request = self.client.get(
+            "/api/loans/export/", HTTP_AUTHORIZATION=f"Token {self.admin_token.key}"
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(request["Content-Type"], "text/csv")
+        rows = list(
+            csv.DictReader(b"".join(request.streaming_content).decode().splitlines())
+        )
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(
+            [row["loan_id"] for row in rows],
+            [self.loan1["id"]] * 3 + [self.loan2["id"]],
+        )
+        self.assertEqual(
+            [row["loan_term_amount"] for row in rows],
+            ["3333.33", "3333.33", "3333.34", ""],
+        )
+
+        # NDJSON, filtered by state
+        request = self.client.get(
+            "/api/loans/export/?output=ndjson&state=pending",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(request["Content-Type"], "application/x-ndjson")
+        rows = [
+            json.loads(line)
+            for line in b"".join(request.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["loan_id"], self.loan2["id"])
+        self.assertEqual(rows[0]["amount"], 20000)
+        self.assertIsNone(rows[0]["loan_term_id"])
+
+        # Filtered by created date range
+        request = self.client.get(
+            "/api/loans/export/?output=ndjson&created_before=2000-01-01T00:00:00Z",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        self.assertEqual(b"".join(request.streaming_content), b"")
+
     def test_api_loan_list(self):
         """
         Test list loan user specific and all endpoint
@@ -235,6 +553,11 @@ class LoanTestCase(APITestCase):
         self.assertEqual(response["state"], LoanState.APPROVED)
         self.assertEqual(response["loan_terms"][0]["status"], LoanTermStatus.PAID)
         self.assertEqual(response["loan_terms"][0]["paid_amount"], 3333.33)
+        self.assertAlmostEqual(response["outstanding_amount"], 6666.67)
+        self.assertEqual(response["paid_terms_count"], 1)
+        self.assertEqual(
+            response["next_due_date"], response["loan_terms"][1]["due_date"]
+        )
 
         # Second term repayment
         request = self.client.post(
@@ -259,6 +582,10 @@ class LoanTestCase(APITestCase):
         self.assertEqual(response["state"], LoanState.PAID)
         self.assertEqual(response["loan_terms"][2]["status"], LoanTermStatus.PAID)
         self.assertEqual(response["loan_terms"][2]["paid_amount"], 3333.34)
+        self.assertEqual(response["outstanding_amount"], 0)
+        self.assertEqual(response["paid_terms_count"], 3)
+        self.assertIsNone(response["next_due_date"])
+        self.assertIsNone(response["next_due_amount"])
 
         # Check already fully paid loan
         request = self.client.post(
@@ -281,3 +608,1500 @@ class LoanTestCase(APITestCase):
         self.assertEqual(
             response["error"], "Loan is not approved or loan terms does not exists"
         )
+
+        # Check payment of a loan id which is not a UUID
+        request = self.client.post(
+            "/api/loans/abc/loan-repayment/",
+            {"amount": 3333.34},
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        self.assertEqual(request.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_portfolio_summary(self):
+        """
+        Test portfolio summary is maintained by loan writes
+        """
+        authorization = f"Token {self.admin_token.key}"
+
+        # Approve, bulk approve and fully repay loans
+        self.client.patch(
+            f"/api/loans/{self.loan1['id']}/approve-loan/",
+            {"state": "approved"},
+            HTTP_AUTHORIZATION=authorization,
+        )
+        self.client.patch(
+            "/api/loans/bulk-approve-loan/",
+            {"ids": [self.loan2["id"]]},
+            HTTP_AUTHORIZATION=authorization,
+        )
+        for amount in (3333.33, 3333.33, 3333.34):
+            request = self.client.post(
+                f"/api/loans/{self.loan1['id']}/loan-repayment/",
+                {"amount": amount},
+                HTTP_AUTHORIZATION=authorization,
+            )
+            self.assertEqual(request.status_code, status.HTTP_200_OK)
+
+        # Bulk create loans
+        self.client.post(
+            "/api/loans/bulk-create-loan/",
+            "amount,term\n5000,2\n7000,7\n",
+            content_type="text/csv",
+            HTTP_AUTHORIZATION=authorization,
+        )
+
+        summary = {
+            row.state: row for row in PortfolioSummary.objects.filter(loans_count__gt=0)
+        }
+        self.assertEqual(summary[LoanState.PAID].loans_count, 1)
+        self.assertEqual(summary[LoanState.PAID].collected_amount, 10000)
+        self.assertAlmostEqual(summary[LoanState.APPROVED].outstanding_amount, 20000)
+        self.assertEqual(summary[LoanState.PENDING].loans_count, 2)
+        self.assertEqual(summary[LoanState.PENDING].amount, 12000)
+
+        # Nothing to fix
+        self.assertEqual(rebuild_summary(), 0)
+
+        # Drift is reported and fixed by the rebuild command
+        PortfolioSummary.objects.filter(state=LoanState.PENDING).update(loans_count=5)
+        with self.assertRaises(CommandError):
+            call_command("rebuild_portfolio_summary", "--check", stdout=StringIO())
+        self.assertEqual(
+            PortfolioSummary.objects.get(state=LoanState.PENDING).loans_count, 2
+        )
+        call_command("rebuild_portfolio_summary", "--check", stdout=StringIO())
+
+        # Admin updates of loan amounts and states
+        pending = Loan.objects.filter(state=LoanState.PENDING).order_by("amount")
+        for path, data in (
+            (f"/api/loans/{self.loan2['id']}/", {"amount": 9000}),
+            (f"/api/loans/{self.loan1['id']}/", {"state": LoanState.APPROVED}),
+            (f"/api/loans/{pending[0].id}/approve-loan/", {"state": LoanState.PAID}),
+            (f"/api/loans/{pending[1].id}/approve-loan/", {"amount": 8000}),
+        ):
+            request = self.client.patch(path, data, HTTP_AUTHORIZATION=authorization)
+            self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            PortfolioSummary.objects.get(state=LoanState.APPROVED).collected_amount,
+            10000,
+        )
+
+        self.assertEqual(rebuild_summary(), 0)
+
+        # Overdue loan terms
+        LoanTerm.objects.filter(loan_id=self.loan2["id"]).update(
+            due_date=timezone.now() - timedelta(days=1)
+        )
+        sweep_overdue_batch(timezone.now())
+
+        # Loans added and updated in the admin
+        loan_admin = LoanAdmin(Loan, site)
+        request = RequestFactory().post("/admin/loans/loan/")
+        request.user = self.admin
+        loan_admin.save_model(
+            request,
+            Loan(user=self.admin, amount=3000, term=2, state=LoanState.APPROVED),
+            None,
+            False,
+        )
+        loan = Loan.objects.get(id=self.loan2["id"])
+        loan.state = LoanState.PENDING
+        loan_admin.save_model(request, loan, None, True)
+        self.assertEqual(rebuild_summary(), 0)
+
+        # Loans deleted in the admin, and along with their user
+        self.assertTrue(OverdueSummary.objects.exclude(terms_count=0).exists())
+        Loan.objects.filter(id=self.loan2["id"]).delete()
+        self.user.delete()
+        self.assertFalse(OverdueSummary.objects.exclude(terms_count=0).exists())
+        self.assertEqual(rebuild_summary(), 0)
+
+        # Summary tables of existing loans are computed by the migration
+        PortfolioSummary.objects.all().delete()
+        migration = import_module("apps.loans.migrations.0010_backfill_summaries")
+        migration.backfill_summaries(apps, None)
+        self.assertEqual(rebuild_summary(), 0)
+
+
+class LoanQueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    def setUp(self):
+        # Init Client
+        self.client = APIClient()
+
+        # Create admin user and token
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="admin@@password"
+        )
+        self.admin_token = Token.objects.create(user=self.admin)
+
+        # Create user and token
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com", password="user@@password"
+        )
+        self.user_token = Token.objects.create(user=self.user)
+
+    def create_approved_loans(self, user, count, term=4):
+        now = timezone.now()
+        loans = Loan.objects.bulk_create(
+            Loan(
+                user=user,
+                amount=10000,
+                term=term,
+                state=LoanState.APPROVED,
+                approved_by=self.admin,
+                approved_date=now,
+                outstanding_amount=10000,
+                next_due_date=now + timedelta(days=7),
+                next_due_amount=10000 / term,
+            )
+            for _ in range(count)
+        )
+        LoanTerm.objects.bulk_create(
+            LoanTerm(
+                loan=loan,
+                amount=10000 / term,
+                due_date=now + timedelta(days=7 * (i + 1)),
+            )
+            for loan in loans
+            for i in range(term)
+        )
+        return loans
+
+    def test_api_loan_list_query_budget(self):
+        """
+        Test list loan endpoint query count does not grow with page size
+        """
+        for count in (1, 25):
+            self.create_approved_loans(self.user, count)
+
+            # User specific
+            with self.assertQueryBudget(LOAN_LIST_QUERY_BUDGET):
+                request = self.client.get(
+                    "/api/loans/",
+                    HTTP_AUTHORIZATION=f"Token {self.user_token.key}",
+                )
+            self.assertEqual(request.status_code, status.HTTP_200_OK)
+
+            # Admin user - ?all=true
+            with self.assertQueryBudget(LOAN_LIST_QUERY_BUDGET):
+                request = self.client.get(
+                    "/api/loans/?all=True",
+                    HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+                )
+            self.assertEqual(request.status_code, status.HTTP_200_OK)
+
+        response = request.json()
+        self.assertEqual(response["count"], 26)
+        loan_terms = response["results"][0]["loan_terms"]
+        self.assertEqual(len(loan_terms), 4)
+        self.assertEqual(
+            [term["due_date"] for term in loan_terms],
+            sorted(term["due_date"] for term in loan_terms),
+        )
+
+    def test_api_loan_list_without_terms(self):
+        """
+        Test list loan endpoint without loan terms does not query loan terms
+        """
+        self.create_approved_loans(self.user, 5)
+
+        with self.assertQueryBudget(LOAN_LIST_QUERY_BUDGET - 1):
+            request = self.client.get(
+                "/api/loans/?terms=false",
+                HTTP_AUTHORIZATION=f"Token {self.user_token.key}",
+            )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        loan = request.json()["results"][0]
+        self.assertNotIn("loan_terms", loan)
+        self.assertEqual(loan["outstanding_amount"], 10000)
+        self.assertEqual(loan["next_due_amount"], 2500)
+
+    def test_api_loan_retrieve_query_budget(self):
+        """
+        Test retrieve loan endpoint query count does not grow with loan terms
+        """
+        (loan,) = self.create_approved_loans(self.user, 1, term=52)
+
+        with self.assertQueryBudget(LOAN_DETAIL_QUERY_BUDGET):
+            request = self.client.get(
+                f"/api/loans/{loan.id}/",
+                HTTP_AUTHORIZATION=f"Token {self.user_token.key}",
+            )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(request.json()["loan_terms"]), 52)
+
+    def test_api_loan_retrieve_conditional_get(self):
+        """
+        Test retrieve loan endpoint ETag / Last-Modified validators
+        """
+        (loan,) = self.create_approved_loans(self.user, 1, term=4)
+        url = f"/api/loans/{loan.id}/"
+        authorization = f"Token {self.user_token.key}"
+
+        request = self.client.get(url, HTTP_AUTHORIZATION=authorization)
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        etag = request["ETag"]
+        self.assertTrue(request.has_header("Last-Modified"))
+
+        # Not modified, only the auth and validators queries
+        with self.assertQueryBudget(2):
+            request = self.client.get(
+                url, HTTP_AUTHORIZATION=authorization, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(request.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(request["ETag"], etag)
+
+        # Repayment changes the validators
+        request = self.client.post(
+            f"/api/loans/{loan.id}/loan-repayment/",
+            {"amount": 2500},
+            HTTP_AUTHORIZATION=authorization,
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+
+        request = self.client.get(
+            url, HTTP_AUTHORIZATION=authorization, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(request["ETag"], etag)
+
+        # Other users loan
+        other_token = Token.objects.create(
+            user=User.objects.create_user(username="other")
+        )
+        request = self.client.get(
+            url,
+            HTTP_AUTHORIZATION=f"Token {other_token.key}",
+            HTTP_IF_NONE_MATCH=request["ETag"],
+        )
+        self.assertEqual(request.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_api_loan_list_conditional_get(self):
+        """
+        Test list loan endpoint ETag validators
+        """
+        self.create_approved_loans(self.user, 2)
+        authorization = f"Token {self.user_token.key}"
+
+        request = self.client.get("/api/loans/", HTTP_AUTHORIZATION=authorization)
+        etag = request["ETag"]
+
+        # Not modified
+        request = self.client.get(
+            "/api/loans/", HTTP_AUTHORIZATION=authorization, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(request.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # Other page or query params
+        request = self.client.get(
+            "/api/loans/?pagination=cursor",
+            HTTP_AUTHORIZATION=authorization,
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+
+        # New loan
+        self.create_approved_loans(self.user, 1)
+        request = self.client.get(
+            "/api/loans/", HTTP_AUTHORIZATION=authorization, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(request.json()["count"], 3)
+
+    def test_api_loan_analytics(self):
+        """
+        Test admin portfolio analytics endpoint
+        """
+        (loan,) = self.create_approved_loans(self.user, 1, term=4)
+        Loan.objects.create(user=self.user, amount=5000, term=2)
+        now = timezone.now()
+        terms = list(loan.loan_term.order_by("due_date"))
+        LoanTerm.objects.filter(pk=terms[0].pk).update(
+            due_date=now - timedelta(days=100),
+            status=LoanTermStatus.PAID,
+            paid_amount=2500,
+        )
+        LoanTerm.objects.filter(pk=terms[1].pk).update(
+            due_date=now - timedelta(days=45)
+        )
+        LoanTerm.objects.filter(pk=terms[2].pk).update(due_date=now - timedelta(days=3))
+        rebuild_summary()
+
+        # Loan terms past due count as overdue once marked by the sweep
+        response = self.client.get(
+            "/api/loans/analytics/", HTTP_AUTHORIZATION=f"Token {self.admin_token.key}"
+        ).json()
+        self.assertEqual(response["overdue"]["count"], 0)
+        call_command("sweep_overdue", stdout=StringIO())
+
+        # With authorization (normal user)
+        request = self.client.get(
+            "/api/loans/analytics/", HTTP_AUTHORIZATION=f"Token {self.user_token.key}"
+        )
+        self.assertEqual(request.status_code, status.HTTP_403_FORBIDDEN)
+
+        # With authorization (admin user)
+        with self.assertQueryBudget(3):
+            request = self.client.get(
+                "/api/loans/analytics/",
+                HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+            )
+        response = request.json()
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["loans"], {"count": 2, "amount": 15000})
+        self.assertEqual(
+            response["by_state"],
+            [
+                {"state": LoanState.PENDING, "count": 1, "amount": 5000},
+                {"state": LoanState.APPROVED, "count": 1, "amount": 10000},
+                {"state": LoanState.PAID, "count": 0, "amount": 0},
+            ],
+        )
+        self.assertEqual(response["collected_amount"], 2500)
+        self.assertEqual(response["outstanding_amount"], 7500)
+        self.assertEqual(response["overdue"]["count"], 2)
+        self.assertEqual(response["overdue"]["amount"], 5000)
+        self.assertEqual(
+            response["overdue"]["buckets"],
+            [
+                {"bucket": "0-30", "count": 1, "amount": 2500},
+                {"bucket": "31-60", "count": 1, "amount": 2500},
+                {"bucket": "61-90", "count": 0, "amount": 0},
+                {"bucket": "90+", "count": 0, "amount": 0},
+            ],
+        )
+
+        # Filtered by state
+        request = self.client.get(
+            "/api/loans/analytics/?state=pending",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        response = request.json()
+        self.assertEqual(response["loans"], {"count": 1, "amount": 5000})
+        self.assertEqual(response["outstanding_amount"], 0)
+
+        # Summary days and live totals for a partial day agree
+        summary = self.client.get(
+            "/api/loans/analytics/",
+            {
+                "created_after": (now - timedelta(days=1))
+                .replace(hour=0, minute=0, second=0, microsecond=0)
+                .isoformat()
+            },
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        ).json()
+        live = self.client.get(
+            "/api/loans/analytics/",
+            {"created_after": (now - timedelta(hours=1)).isoformat()},
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        ).json()
+        self.assertEqual(summary, live)
+        self.assertEqual(summary["collected_amount"], 2500)
+
+        # Repaid overdue loan terms leave the overdue summary
+        repay_loan(loan.pk, 2500)
+        response = self.client.get(
+            "/api/loans/analytics/", HTTP_AUTHORIZATION=f"Token {self.admin_token.key}"
+        ).json()
+        self.assertEqual(response["overdue"]["count"], 1)
+        self.assertEqual(response["overdue"]["buckets"][0]["count"], 1)
+        self.assertEqual(response["overdue"]["buckets"][1]["count"], 0)
+        self.assertEqual(rebuild_summary(), 0)
+
+    def test_overdue_buckets(self):
+        """
+        Test overdue buckets are by days past due day, from the due day
+        """
+        today = timezone.localdate()
+        for days in (0, 30, 31, 60, 61, 90, 91):
+            OverdueSummary.objects.create(
+                day=today - timedelta(days=120),
+                state=LoanState.APPROVED,
+                due_day=today - timedelta(days=days),
+                terms_count=1,
+                amount=days,
+            )
+
+        overdue = portfolio_analytics(
+            Loan.objects.none(),
+            LoanTerm.objects.none(),
+            summaries=PortfolioSummary.objects.all(),
+            overdue_summaries=OverdueSummary.objects.all(),
+        )["overdue"]
+        self.assertEqual(overdue["count"], 7)
+        self.assertEqual(
+            overdue["buckets"],
+            [
+                {"bucket": "0-30", "count": 2, "amount": 30},
+                {"bucket": "31-60", "count": 2, "amount": 91},
+                {"bucket": "61-90", "count": 2, "amount": 151},
+                {"bucket": "90+", "count": 1, "amount": 91},
+            ],
+        )
+
+    def test_api_bulk_approve_loan_query_budget(self):
+        """
+        Test bulk approve loan endpoint query count does not grow with loans
+        """
+        for count in (1, 20):
+            loans = Loan.objects.bulk_create(
+                Loan(user=self.user, amount=10000, term=4) for _ in range(count)
+            )
+            rebuild_summary()
+
+            # Including one summary UPDATE per (day, state), INSERT on first use
+            with self.assertQueryBudget(11):
+                request = self.client.patch(
+                    "/api/loans/bulk-approve-loan/",
+                    {"ids": [str(loan.id) for loan in loans]},
+                    HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+                )
+            self.assertEqual(request.status_code, status.HTTP_200_OK)
+            self.assertEqual(LoanTerm.objects.filter(loan__in=loans).count(), count * 4)
+
+    def test_sweep_overdue(self):
+        """
+        Test overdue sweep marks pending loan terms past due, in batches
+        """
+        loans = self.create_approved_loans(self.user, 3, term=4)
+        now = timezone.now()
+        # Two loan terms past due per loan, one of them paid on the first loan
+        LoanTerm.objects.filter(due_date__lte=now + timedelta(days=14)).update(
+            due_date=now - timedelta(days=1)
+        )
+        paid = loans[0].loan_term.order_by("due_date").first()
+        LoanTerm.objects.filter(pk=paid.pk).update(status=LoanTermStatus.PAID)
+        Loan.objects.update(updated=now - timedelta(days=1))
+        rebuild_summary()
+
+        out = StringIO()
+        call_command("sweep_overdue", "--dry-run", stdout=out)
+        self.assertIn("5 loan terms would be marked overdue", out.getvalue())
+        self.assertFalse(LoanTerm.objects.filter(status=LoanTermStatus.OVERDUE))
+
+        # Per batch: touch loans, group the batch, an overdue summary UPDATE per
+        # (day, state, due day) and mark, in a transaction (savepoint in tests),
+        # the summary row is inserted on first use
+        with self.assertQueryBudget(3 * 6 + 3):
+            call_command("sweep_overdue", "--batch-size", "2", stdout=out)
+        self.assertIn("5 loan terms marked overdue in 3 batches", out.getvalue())
+        self.assertEqual(
+            LoanTerm.objects.filter(status=LoanTermStatus.OVERDUE).count(), 5
+        )
+        self.assertEqual(LoanTerm.objects.get(pk=paid.pk).status, LoanTermStatus.PAID)
+        self.assertFalse(Loan.objects.filter(updated__lt=now))
+        self.assertEqual(
+            list(OverdueSummary.objects.values_list("terms_count", "amount")),
+            [(5, 12500)],
+        )
+
+        # Overdue loan terms move with the state of their loan
+        request = self.client.patch(
+            f"/api/loans/{loans[2].pk}/",
+            {"state": LoanState.PENDING},
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            OverdueSummary.objects.get(state=LoanState.PENDING).terms_count, 2
+        )
+        self.assertEqual(rebuild_summary(), 0)
+
+        # Nothing left, overdue loan terms are still repaid first
+        call_command("sweep_overdue", stdout=out)
+        self.assertIn("0 loan terms marked overdue", out.getvalue())
+        repay_loan(loans[1].pk, 2500)
+        self.assertEqual(
+            LoanTerm.objects.filter(
+                loan=loans[1], status=LoanTermStatus.OVERDUE
+            ).count(),
+            1,
+        )
+        self.assertEqual(
+            OverdueSummary.objects.get(state=LoanState.APPROVED).terms_count, 2
+        )
+        self.assertEqual(rebuild_summary(), 0)
+
+    def test_seed_loans(self):
+        """
+        Test seeded portfolios are deterministic and consistent
+        """
+        now = timezone.now()
+
+        def portfolio():
+            return list(
+                Loan.objects.order_by("id").values_list(
+                    "id", "user__username", "amount", "term", "state", "created"
+                )
+            ), list(
+                LoanTerm.objects.order_by("id").values_list(
+                    "id", "loan", "amount", "status", "due_date", "paid_date"
+                )
+            )
+
+        counts = seed_loans(10, 200, seed=1, chunk_size=30, now=now)
+        self.assertEqual(counts["users"], 11)
+        self.assertEqual(counts["loans"], Loan.objects.count())
+        self.assertEqual(counts["loan_terms"], LoanTerm.objects.count())
+        self.assertEqual(rebuild_summary(), 0)
+        self.assertEqual(
+            set(Loan.objects.values_list("state", flat=True)), set(LoanState.values)
+        )
+        # Loans pass the loan creation rules
+        self.assertFalse(
+            Loan.objects.exclude(
+                amount__gte=AMOUNT_MIN,
+                amount__lte=AMOUNT_MAX,
+                term__gte=TERM_MIN,
+                term__lte=TERM_MAX,
+            ).exists()
+        )
+
+        # Balance fields match loan terms
+        for loan in Loan.objects.prefetch_related("loan_term"):
+            unpaid = sorted(
+                (loan_term.due_date, loan_term.amount)
+                for loan_term in loan.loan_term.all()
+                if loan_term.status != LoanTermStatus.PAID
+            )
+            self.assertAlmostEqual(
+                loan.outstanding_amount, sum(amount for _, amount in unpaid)
+            )
+            self.assertEqual(
+                (loan.next_due_date, loan.next_due_amount),
+                unpaid[0] if unpaid else (None, None),
+            )
+            if loan.state != LoanState.PENDING:
+                self.assertEqual(loan.paid_terms_count + len(unpaid), loan.term)
+            self.assertEqual(loan.state == LoanState.PAID, loan.closed_date is not None)
+
+        # Same seed, same portfolio, whatever the chunk size
+        expected = portfolio()
+        User.objects.filter(username__startswith="seed").delete()
+        seed_loans(10, 200, seed=1, chunk_size=7, now=now)
+        self.assertEqual(portfolio(), expected)
+
+        with self.assertRaisesMessage(CommandError, "seed* already exist"):
+            call_command("seed_loans", "--users", "1", stdout=StringIO())
+        out = StringIO()
+        call_command(
+            "seed_loans",
+            "--users",
+            "2",
+            "--loans",
+            "5",
+            "--username-prefix",
+            "other",
+            stdout=out,
+        )
+        self.assertIn("3 users, 5 loans and", out.getvalue())
+
+    def test_api_loan_list_validators_query_budget(self):
+        """
+        Test list loan endpoint validators are computed from the page's rows,
+        without aggregating the filtered loans
+        """
+        self.create_approved_loans(self.user, 60)
+        authorization = f"Token {self.user_token.key}"
+        # Search index lookup, once per process
+        search_loans(Loan.objects.all(), "user")
+
+        for url in (
+            "/api/loans/?pagination=cursor",
+            "/api/loans/?pagination=cursor&search=user",
+        ):
+            with self.assertQueryBudget(LOAN_LIST_QUERY_BUDGET - 1) as queries:
+                request = self.client.get(url, HTTP_AUTHORIZATION=authorization)
+            self.assertEqual(request.status_code, status.HTTP_200_OK)
+            loan_queries = [
+                query["sql"]
+                for query in queries.captured_queries
+                if 'FROM "loans_loan"' in query["sql"]
+            ]
+            self.assertEqual(len(loan_queries), 1)
+            self.assertIn("LIMIT 51", loan_queries[0])
+            self.assertNotRegex(loan_queries[0], r"\b(COUNT|MAX)\(")
+
+            # Not modified, loan terms are not loaded
+            with self.assertQueryBudget(LOAN_LIST_QUERY_BUDGET - 2):
+                request = self.client.get(
+                    url,
+                    HTTP_AUTHORIZATION=authorization,
+                    HTTP_IF_NONE_MATCH=request["ETag"],
+                )
+            self.assertEqual(request.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A loan of the page is updated
+        etag = request["ETag"]
+        loan = Loan.objects.filter(user=self.user).order_by("created", "id").first()
+        loan.save()
+        request = self.client.get(
+            "/api/loans/?pagination=cursor&search=user",
+            HTTP_AUTHORIZATION=authorization,
+            HTTP_IF_NONE_MATCH=etag,
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(request["ETag"], etag)
+
+    def test_api_loan_list_cursor_pagination(self):
+        """
+        Test list loan endpoint with cursor pagination
+        """
+        loans = self.create_approved_loans(self.user, 60)
+
+        with self.assertQueryBudget(LOAN_LIST_QUERY_BUDGET - 1):
+            request = self.client.get(
+                "/api/loans/?pagination=cursor",
+                HTTP_AUTHORIZATION=f"Token {self.user_token.key}",
+            )
+        response = request.json()
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertNotIn("count", response)
+        self.assertIsNone(response["previous"])
+        self.assertEqual(len(response["results"]), 50)
+        seen = [loan["id"] for loan in response["results"]]
+
+        # Loan created while paging is not returned twice or skipped
+        self.create_approved_loans(self.user, 1)
+
+        request = self.client.get(
+            response["next"], HTTP_AUTHORIZATION=f"Token {self.user_token.key}"
+        )
+        response = request.json()
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response["next"])
+        seen += [loan["id"] for loan in response["results"]]
+
+        self.assertEqual(len(seen), 61)
+        self.assertEqual(len(set(seen)), 61)
+        self.assertEqual(set(seen[:60]), {str(loan.id) for loan in loans})
+
+
+class LoanQueryPlanTestCase(QueryPlanMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="user", email="user@example.com", password="user@@password"
+        )
+        self.loan = Loan.objects.create(user=self.user, amount=10000, term=3)
+
+    def test_loan_list_query_plan(self):
+        """
+        Test loan list queries are served by indexes
+        """
+        # User specific loans
+        self.assertNoSequentialScan(
+            Loan.objects.filter(user=self.user).order_by("created", "id")[:50]
+        )
+
+        # All loans, cursor pagination
+        self.assertNoSequentialScan(
+            Loan.objects.filter(created__gt=self.loan.created).order_by(
+                "created", "id"
+            )[:50]
+        )
+
+    def test_loan_term_query_plan(self):
+        """
+        Test loan term repayment, prefetch and overdue queries are served by indexes
+        """
+        # Unpaid loan terms of a loan (repayment)
+        self.assertNoSequentialScan(
+            LoanTerm.objects.filter(
+                loan=self.loan, status__in=UNPAID_LOAN_TERM_STATUSES
+            ).order_by("due_date")
+        )
+
+        # Prefetched loan terms of a page of loans
+        self.assertNoSequentialScan(
+            LoanTerm.objects.filter(loan__in=[self.loan]).order_by("due_date")
+        )
+
+        # Overdue loan terms
+        self.assertNoSequentialScan(
+            LoanTerm.objects.filter(
+                status__in=UNPAID_LOAN_TERM_STATUSES, due_date__lt=timezone.now()
+            )
+        )
+
+        # Overdue sweep batches
+        self.assertNoSequentialScan(
+            overdue_terms(timezone.now()).order_by("due_date", "id")[:100]
+        )
+
+        # Admin date hierarchy, a month of loan terms
+        now = timezone.now()
+        self.assertNoSequentialScan(
+            LoanTerm.objects.filter(
+                due_date__gte=now, due_date__lt=now + timedelta(days=31)
+            ).order_by("-id")[:100]
+        )
+
+    def test_loan_search_query_plan(self):
+        """
+        Test loan search is served by the search index
+        """
+        self.assertNoSequentialScan(search_loans(Loan.objects.all(), "user example"))
+
+    def test_sequential_scan_detection(self):
+        """
+        Test query plan check fails on unindexed filters
+        """
+        with self.assertRaises(AssertionError):
+            self.assertNoSequentialScan(Loan.objects.filter(amount__gt=0))
+
+
+class LoanAsyncViewTestCase(TransactionTestCase):
+    """
+    Async views query the database from worker threads, data is committed.
+    """
+
+    # Reads go to the replica (mirroring the test database) when configured
+    databases = "__all__"
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin")
+        self.user = User.objects.create_user(username="user")
+        self.other = User.objects.create_user(username="other")
+        self.admin_token = Token.objects.create(user=self.admin)
+        self.user_token = Token.objects.create(user=self.user)
+        self.other_token = Token.objects.create(user=self.other)
+
+        self.loan = Loan.objects.create(user=self.user, amount=10000, term=3)
+        Loan.objects.create(user=self.other, amount=5000, term=2)
+        approve_loans([self.loan.pk], approved_by=self.admin)
+
+    def sync_get(self, path, token):
+        return APIClient().get(path, HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    async def test_async_views_parity(self):
+        """
+        Test async read endpoints match the sync endpoints
+        """
+        for sync_path, async_path, token in (
+            ("/api/loans/", "/api/async/loans/", self.user_token),
+            (
+                "/api/loans/?all=true&pagination=cursor&terms=false",
+                "/api/async/loans/?all=true&pagination=cursor&terms=false",
+                self.admin_token,
+            ),
+            (
+                f"/api/loans/{self.loan.pk}/",
+                f"/api/async/loans/{self.loan.pk}/",
+                self.user_token,
+            ),
+            (
+                f"/api/loans/{self.loan.pk}/terms/",
+                f"/api/async/loans/{self.loan.pk}/terms/",
+                self.admin_token,
+            ),
+        ):
+            expected = await sync_to_async(self.sync_get)(sync_path, token)
+            response = await self.async_client.get(
+                async_path, AUTHORIZATION=f"Token {token.key}"
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response["Content-Type"], "application/json")
+            self.assertEqual(
+                json.loads(response.content.replace(b"/async", b"")),
+                expected.json(),
+            )
+
+            # Not modified
+            response = await self.async_client.get(
+                async_path,
+                AUTHORIZATION=f"Token {token.key}",
+                IF_NONE_MATCH=response["ETag"],
+            )
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_async_views_errors(self):
+        """
+        Test async read endpoints authentication, access and errors
+        """
+        path = f"/api/async/loans/{self.loan.pk}/"
+        for token, expected in (
+            (None, status.HTTP_401_UNAUTHORIZED),
+            ("invalid", status.HTTP_401_UNAUTHORIZED),
+            (self.other_token.key, status.HTTP_403_FORBIDDEN),
+            (self.admin_token.key, status.HTTP_200_OK),
+        ):
+            headers = {"AUTHORIZATION": f"Token {token}"} if token else {}
+            response = await self.async_client.get(path, **headers)
+            self.assertEqual(response.status_code, expected)
+            if expected == status.HTTP_401_UNAUTHORIZED:
+                self.assertEqual(response["WWW-Authenticate"], "Token")
+                self.assertIn("detail", response.json())
+
+        authorization = f"Token {self.user_token.key}"
+        response = await self.async_client.get(
+            f"/api/async/loans/{uuid.uuid4()}/terms/", AUTHORIZATION=authorization
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.async_client.get(
+            "/api/async/loans/?pagination=invalid", AUTHORIZATION=authorization
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("pagination", response.json())
+        response = await self.async_client.post(
+            "/api/async/loans/", AUTHORIZATION=authorization
+        )
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class RecordingReplicaRouter(ReplicaRouter):
+    """
+    ReplicaRouter recording read routes, reads stay on the test database.
+    """
+
+    def __init__(self):
+        self.routes = []
+
+    def db_for_read(self, model, **hints):
+        self.routes.append((model, super().db_for_read(model, **hints)))
+
+
+@mock.patch("mini_aspire.db_routers.replica_configured", return_value=True)
+class LoanReplicaRoutingTestCase(TransactionTestCase):
+    """
+    Outside of a test transaction, reads in transactions stay on the primary.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin")
+        self.user = User.objects.create_user(username="user")
+        self.admin_token = Token.objects.create(user=self.admin)
+        self.user_token = Token.objects.create(user=self.user)
+        self.loan = Loan.objects.create(user=self.user, amount=10000, term=3)
+        self.router = RecordingReplicaRouter()
+
+    def loan_routes(self):
+        return {
+            database
+            for model, database in self.router.routes
+            if model._meta.app_label == "loans"
+        }
+
+    def routing(self):
+        return override_settings(
+            DATABASE_ROUTERS=[self.router],
+            MIDDLEWARE=["mini_aspire.db_routers.ReplicaRoutingMiddleware"]
+            + settings.MIDDLEWARE,
+        )
+
+    def test_replica_router(self, replica_configured):
+        """
+        Test reads after a write in the same request stay on the primary
+        """
+
+        router = ReplicaRouter()
+
+        def view(request):
+            routes = [router.db_for_read(Loan)]
+            router.db_for_write(Loan)
+            return routes + [router.db_for_read(Loan)]
+
+        view.replica_reads = True
+        middleware = ReplicaRoutingMiddleware(view)
+
+        for method, expected in (
+            ("get", ["replica", "default"]),
+            ("head", ["replica", "default"]),
+            ("post", ["default", "default"]),
+        ):
+
+            def get_response(request):
+                middleware.process_view(request, view, (), {})
+                return view(request)
+
+            middleware.get_response = get_response
+            request = getattr(RequestFactory(), method)("/api/loans/")
+            self.assertEqual(middleware(request), expected)
+
+        # Outside of a request, and for authentication models
+        self.assertEqual(router.db_for_read(Loan), "default")
+        self.assertEqual(router.db_for_read(Token), "default")
+
+    def test_replica_reads(self, replica_configured):
+        """
+        Test GET requests to loan endpoints read loans from the replica
+        """
+        client = APIClient()
+        with self.routing():
+            for path, token in (
+                ("/api/loans/", self.user_token),
+                (f"/api/loans/{self.loan.pk}/", self.user_token),
+                (f"/api/loans/{self.loan.pk}/terms/", self.user_token),
+                ("/api/loans/analytics/", self.admin_token),
+            ):
+                self.router.routes.clear()
+                client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+                response = client.get(path)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(self.loan_routes(), {"replica"})
+
+            # Writes and their reads stay on the primary
+            self.router.routes.clear()
+            client.credentials(HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+            response = client.patch(
+                f"/api/loans/{self.loan.pk}/approve-loan/", {"state": "approved"}
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.loan_routes(), {"default"})
+
+    async def test_async_replica_reads(self, replica_configured):
+        """
+        Test async loan endpoints read loans from the replica
+        """
+        with self.routing():
+            response = await self.async_client.get(
+                f"/api/async/loans/{self.loan.pk}/",
+                AUTHORIZATION=f"Token {self.user_token.key}",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.loan_routes(), {"replica"})
+
+
+@override_settings(
+    DATABASE_ROUTERS=["mini_aspire.db_routers.ReplicaRouter"],
+    MIDDLEWARE=["mini_aspire.db_routers.ReplicaRoutingMiddleware"]
+    + settings.MIDDLEWARE,
+)
+class LoanSQLiteReplicaTestCase(TransactionTestCase):
+    """
+    A second SQLite database as the replica, not mirroring the primary: the
+    replica loan has another amount than the primary loan.
+    """
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        replica = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.path.join(directory.name, "replica.sqlite3"),
+        }
+        patcher = mock.patch.dict(settings.DATABASES, {REPLICA_DB_ALIAS: replica})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        connections.ensure_defaults(REPLICA_DB_ALIAS)
+        connections.prepare_test_settings(REPLICA_DB_ALIAS)
+        self.addCleanup(self.close_replica)
+        call_command("migrate", database=REPLICA_DB_ALIAS, verbosity=0)
+
+        self.admin = User.objects.create_superuser(username="admin")
+        self.user = User.objects.create_user(username="user")
+        self.admin_token = Token.objects.create(user=self.admin)
+        self.user_token = Token.objects.create(user=self.user)
+        self.loan = Loan.objects.create(user=self.user, amount=10000, term=3)
+
+        User.objects.using(REPLICA_DB_ALIAS).bulk_create(User.objects.order_by("pk"))
+        Loan.objects.using(REPLICA_DB_ALIAS).create(
+            id=self.loan.id, user=self.user, amount=20000, term=3
+        )
+        PortfolioSummary.objects.using(REPLICA_DB_ALIAS).create(
+            day=timezone.localdate(self.loan.created),
+            state=LoanState.PENDING,
+            loans_count=1,
+            amount=20000,
+        )
+
+    def close_replica(self):
+        connections[REPLICA_DB_ALIAS].close()
+        del connections[REPLICA_DB_ALIAS]
+
+    def test_replica_reads(self):
+        """
+        Test GET requests to loan endpoints read loans from the replica
+        """
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.user_token.key}")
+        response = client.get("/api/loans/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [loan["amount"] for loan in response.json()["results"]], [20000]
+        )
+
+        response = client.get(f"/api/loans/{self.loan.pk}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["amount"], 20000)
+
+        client.credentials(HTTP_AUTHORIZATION=f"Token {self.admin_token.key}")
+        response = client.get("/api/loans/analytics/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["loans"], {"count": 1, "amount": 20000})
+
+        # Writes and their reads stay on the primary
+        response = client.patch(
+            f"/api/loans/{self.loan.pk}/approve-loan/", {"state": "approved"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["amount"], 10000)
+        self.assertEqual(response.json()["state"], LoanState.APPROVED)
+        self.assertEqual(
+            Loan.objects.using(REPLICA_DB_ALIAS).get().state, LoanState.PENDING
+        )
+
+    def test_read_after_write(self):
+        """
+        Test reads after a write in a GET request stay on the primary
+        """
+
+        def view(request):
+            amounts = [Loan.objects.get().amount]
+            Loan.objects.update(term=4)
+            return amounts + [Loan.objects.get().amount]
+
+        view.replica_reads = True
+        middleware = ReplicaRoutingMiddleware(view)
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware.get_response = get_response
+        self.assertEqual(
+            middleware(RequestFactory().get("/api/loans/")), [20000, 10000]
+        )
+        self.assertEqual(Loan.objects.get().term, 4)
+        self.assertEqual(Loan.objects.using(REPLICA_DB_ALIAS).get().term, 3)
+
+
+@skipUnless(connection.features.has_select_for_update, "Row locks are not supported")
+class LoanRepaymentConcurrencyTestCase(TransactionTestCase):
+    threads = 20
+
+    def test_concurrent_loan_repayment(self):
+        """
+        Test concurrent repayments of a loan pay each loan term exactly once
+        """
+        user = User.objects.create_user(username="user", password="user@@password")
+        loan = Loan.objects.create(
+            user=user, amount=10000, term=10, state=LoanState.APPROVED
+        )
+        now = timezone.now()
+        LoanTerm.objects.bulk_create(
+            LoanTerm(loan=loan, amount=1000, due_date=now + timedelta(days=7 * i))
+            for i in range(1, 11)
+        )
+
+        barrier = Barrier(self.threads)
+        results = []
+
+        def pay():
+            try:
+                barrier.wait()
+                results.append(repay_loan(loan.pk, 1000))
+            except RepaymentError as e:
+                results.append(str(e))
+            finally:
+                connection.close()
+
+        threads = [Thread(target=pay) for _ in range(self.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 10 repayments, the last one closes the loan, the rest are rejected
+        self.assertEqual(results.count(False), 9)
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(results.count("Loan is already fully paid"), 10)
+
+        loan.refresh_from_db()
+        self.assertEqual(loan.state, LoanState.PAID)
+        self.assertIsNotNone(loan.closed_date)
+        self.assertEqual(
+            list(loan.loan_term.values_list("status", "paid_amount").distinct()),
+            [(LoanTermStatus.PAID, 1000)],
+        )
+
+
+class LoanRepresentationTestCase(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="admin")
+        self.user = User.objects.create_user(username="user")
+
+        # Pending, approved, partially and fully paid loans
+        loans = [
+            Loan.objects.create(user=self.user, amount=amount, term=term)
+            for amount, term in ((10000, 3), (20000, 4), (5000, 2), (7000, 1))
+        ]
+        approve_loans([loan.pk for loan in loans[1:]], approved_by=self.admin)
+        repay_loan(loans[2].pk, 2500)
+        repay_loan(loans[3].pk, 7000)
+
+    def test_loan_representations_parity(self):
+        """
+        Test read path representations match LoanSerializer and LoanListSerializer
+        """
+        loans = Loan.objects.order_by("created", "id")
+        rows = loans.values(*LOAN_COLUMNS)
+
+        for terms, serializer_class in (
+            (True, LoanSerializer),
+            (False, LoanListSerializer),
+        ):
+            expected = serializer_class(
+                loans.prefetch_related(
+                    Prefetch(
+                        "loan_term", queryset=LoanTerm.objects.order_by("due_date")
+                    )
+                ),
+                many=True,
+            ).data
+            representations = loan_representations(rows, terms=terms)
+
+            self.assertEqual(len(representations), 4)
+            for loan, representation in zip(expected, representations):
+                self.assertEqual(list(representation), list(loan))
+                self.assertEqual(
+                    json.loads(json.dumps(representation)),
+                    json.loads(json.dumps(loan)),
+                )
+
+    def test_fast_json_renderer_parity(self):
+        """
+        Test orjson renderer output matches JSONRenderer, with and without orjson
+        """
+        data = {
+            "results": loan_representations(
+                Loan.objects.order_by("created").values(*LOAN_COLUMNS)
+            ),
+            "uuid": uuid.uuid4(),
+            "datetime": timezone.now(),
+            "date": timezone.now().date(),
+            "text": "line\u2028separator",
+            "state": LoanState.PAID,
+            "lazy": gettext_lazy("Loan"),
+            1: 0.1,
+        }
+        expected = JSONRenderer().render(data)
+        self.assertEqual(FastJSONRenderer().render(data), expected)
+        with mock.patch("mini_aspire.renderers.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(data), expected)
+
+        # Indented output
+        self.assertEqual(
+            FastJSONRenderer().render(data, "application/json; indent=2"),
+            JSONRenderer().render(data, "application/json; indent=2"),
+        )
+
+    def test_fast_json_parser(self):
+        """
+        Test orjson parser, with and without orjson
+        """
+        body = JSONRenderer().render({"amount": 3333.33, "ids": ["a", "\u00e9"]})
+        for backend in (orjson, None):
+            with mock.patch("mini_aspire.renderers.orjson", backend), mock.patch(
+                "mini_aspire.parsers.orjson", backend
+            ):
+                self.assertEqual(
+                    FastJSONParser().parse(BytesIO(body)),
+                    {"amount": 3333.33, "ids": ["a", "\u00e9"]},
+                )
+                for invalid in (b"{", b'{"amount": NaN}'):
+                    with self.assertRaises(ParseError):
+                        FastJSONParser().parse(BytesIO(invalid))
+
+
+class LoanScheduleTestCase(SimpleTestCase):
+    def test_split_amount(self):
+        """
+        Test instalments are cent exact and add up to the loan amount
+        """
+        self.assertEqual(split_amount(10000, 3), (3333.33, 3333.33, 3333.34))
+        self.assertEqual(split_amount(20000, 3), (6666.66, 6666.67, 6666.67))
+        self.assertEqual(split_amount(1000, 4), (250.0, 250.0, 250.0, 250.0))
+
+        for amount, term in ((1000, 7), (123456.78, 52), (1000000, 51)):
+            instalments = split_amount(amount, term)
+            self.assertEqual(len(instalments), term)
+            self.assertEqual(sum(round(i * 100) for i in instalments), amount * 100)
+            self.assertLessEqual(max(instalments) - min(instalments), 0.011)
+
+    def test_due_dates(self):
+        """
+        Test weekly, biweekly and monthly due dates
+        """
+        start = datetime(2022, 1, 31, 12, 0, tzinfo=timezone.utc)
+
+        schedule = build_schedule(1000, 2, start)
+        self.assertEqual(
+            schedule.due_dates, (start + timedelta(days=7), start + timedelta(days=14))
+        )
+
+        schedule = build_schedule(1000, 2, start, LoanTermFrequency.BIWEEKLY)
+        self.assertEqual(
+            schedule.due_dates, (start + timedelta(days=14), start + timedelta(days=28))
+        )
+
+        # Day is clamped to the end of shorter months
+        schedule = build_schedule(1000, 3, start, LoanTermFrequency.MONTHLY)
+        self.assertEqual(
+            [due_date.date().isoformat() for due_date in schedule.due_dates],
+            ["2022-02-28", "2022-03-31", "2022-04-30"],
+        )
+
+    def test_build_schedules(self):
+        """
+        Test batch schedules match single loan schedules
+        """
+        start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+        amounts = (1000, 20000, 1000)
+        terms = (3, 52, 3)
+
+        # Shared start date
+        schedules = build_schedules(amounts, terms, start)
+        self.assertEqual(
+            schedules,
+            [build_schedule(a, t, start) for a, t in zip(amounts, terms)],
+        )
+
+        # Start date per loan
+        starts = [start + timedelta(days=i) for i in range(3)]
+        schedules = build_schedules(amounts, terms, starts)
+        self.assertEqual(
+            schedules,
+            [build_schedule(a, t, s) for a, t, s in zip(amounts, terms, starts)],
+        )
+
+
+class LoanAdminTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="admin@@password"
+        )
+        self.client.force_login(self.admin)
+
+    def create_loans(self, count):
+        users = [
+            User.objects.create(username=f"user{uuid.uuid4().hex}")
+            for _ in range(count)
+        ]
+        loans = Loan.objects.bulk_create(
+            Loan(
+                user=user,
+                amount=10000,
+                term=2,
+                state=LoanState.APPROVED,
+                approved_by=self.admin,
+                approved_date=timezone.now(),
+            )
+            for user in users
+        )
+        LoanTerm.objects.bulk_create(
+            LoanTerm(loan=loan, amount=5000, due_date=timezone.now())
+            for loan in loans
+            for _ in range(2)
+        )
+        return loans
+
+    def changelists(self, loan):
+        today = timezone.now()
+        yield "/admin/loans/loan/"
+        yield f"/admin/loans/loan/?user__id__exact={loan.user_id}&state=approved"
+        yield f"/admin/loans/loan/?created__year={today.year}"
+        yield "/admin/loans/loanterm/"
+        yield f"/admin/loans/loanterm/?loan__user__id__exact={loan.user_id}"
+        yield f"/admin/loans/loanterm/?due_date__year={today.year}"
+
+    def test_changelist_query_budget(self):
+        """
+        Test admin changelist query count does not grow with the rows shown
+        """
+        for count in (1, 30):
+            loans = self.create_loans(count)
+            for path in self.changelists(loans[0]):
+                with self.assertQueryBudget(LOAN_ADMIN_CHANGELIST_QUERY_BUDGET):
+                    response = self.client.get(path)
+                self.assertEqual(response.status_code, status.HTTP_200_OK, path)
+
+    def test_changelist_filters(self):
+        """
+        Test user filters render the selected user only, as an autocomplete
+        """
+        loan, other_loan = self.create_loans(2)
+        response = self.client.get(f"/admin/loans/loan/?user__id__exact={loan.user_id}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, 'data-field-name="user"')
+        self.assertContains(response, "admin/js/autocomplete_filter.js")
+        self.assertContains(response, loan.user.username)
+        self.assertNotContains(response, other_loan.user.username)
+        self.assertEqual(list(response.context["cl"].result_list), [loan])
+
+        response = self.client.get(
+            "/admin/autocomplete/",
+            {
+                "app_label": "loans",
+                "model_name": "loan",
+                "field_name": "user",
+                "term": other_loan.user.username,
+            },
+        )
+        self.assertEqual(
+            response.json()["results"],
+            [{"id": str(other_loan.user_id), "text": other_loan.user.username}],
+        )
+
+    def test_estimated_count(self):
+        """
+        Test unfiltered changelists are counted from table statistics
+        """
+        self.create_loans(3)
+        queryset = Loan.objects.order_by("-id")
+        self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 3)
+
+        with mock.patch(
+            "apps.accounts.paginators.estimated_count", return_value=50000
+        ), mock.patch.object(EstimatedCountPaginator, "estimate_above", 10000):
+            self.assertEqual(EstimatedCountPaginator(queryset, 100).count, 50000)
+            # Filtered changelists are counted exactly
+            self.assertEqual(
+                EstimatedCountPaginator(queryset.filter(term=2), 100).count, 3
+            )
+            response = self.client.get("/admin/loans/loan/")
+            self.assertEqual(response.context["cl"].result_count, 50000)
+
+
+class LoanSearchTestCase(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username="admin", email="admin@example.com", password="admin@@password"
+        )
+        self.admin_token = Token.objects.create(user=self.admin)
+        self.alice = User.objects.create_user(
+            username="alice",
+            email="alice@example.com",
+            first_name="Alice",
+            last_name="Tan",
+        )
+        self.alice_token = Token.objects.create(user=self.alice)
+        self.bob = User.objects.create_user(
+            username="bob", email="bob@example.org", first_name="Bob", last_name="Lee"
+        )
+        self.alice_loan = Loan.objects.create(user=self.alice, amount=1000, term=4)
+        self.bob_loan = Loan.objects.create(user=self.bob, amount=2000, term=8)
+
+    def search(self, query):
+        return set(search_loans(Loan.objects.all(), query))
+
+    def test_search_documents(self):
+        """
+        Test search documents follow loan and user writes
+        """
+        self.assertEqual(
+            self.alice_loan.search_document.document,
+            f"{self.alice_loan.id.hex} alice alice tan alice@example.com",
+        )
+
+        # Bulk created loans
+        (loan,) = Loan.objects.bulk_create([Loan(user=self.bob, amount=3000, term=4)])
+        self.assertEqual(self.search("bob@example"), {self.bob_loan, loan})
+
+        # Borrower renamed
+        self.bob.last_name = "Wong"
+        self.bob.save()
+        self.assertEqual(self.search("wong"), {self.bob_loan, loan})
+        self.assertEqual(self.search("lee"), set())
+
+        # Loan moved to another borrower
+        Loan.objects.filter(pk=loan.pk).update(user=self.alice)
+        self.assertEqual(self.search("alice"), {self.alice_loan, loan})
+
+        loan.delete()
+        self.assertEqual(self.search("alice"), {self.alice_loan})
+        self.assertEqual(LoanSearchDocument.objects.count(), 2)
+
+    def test_search_loans(self):
+        """
+        Test loans match when their document contains every word
+        """
+        self.assertEqual(self.search("ALICE"), {self.alice_loan})
+        self.assertEqual(self.search("lic ta"), {self.alice_loan})
+        self.assertEqual(self.search("example"), {self.alice_loan, self.bob_loan})
+        self.assertEqual(self.search("example .org"), {self.bob_loan})
+        self.assertEqual(self.search("alice bob"), set())
+        self.assertEqual(self.search(str(self.bob_loan.id)), {self.bob_loan})
+        self.assertEqual(self.search(self.bob_loan.id.hex[:8]), {self.bob_loan})
+        # FTS query syntax is matched literally
+        self.assertEqual(self.search('alice" OR "bob'), set())
+        self.assertEqual(self.search("ali*"), set())
+        self.assertEqual(self.search("%"), set())
+        self.assertEqual(self.search("  "), {self.alice_loan, self.bob_loan})
+
+        # Related models
+        LoanTerm.objects.create(loan=self.bob_loan, amount=500)
+        self.assertEqual(
+            set(search_loans(LoanTerm.objects.all(), "bob", prefix="loan__")),
+            set(LoanTerm.objects.filter(loan=self.bob_loan)),
+        )
+
+    def test_search_without_fts_index(self):
+        """
+        Test SQLite without FTS5 trigram support skips the index, and searches
+        documents with LIKE conditions
+        """
+        migration = import_module("apps.loans.migrations.0008_loansearchdocument")
+        with mock.patch.object(migration, "sqlite_fts_trigram", return_value=False):
+            statements = migration.sqlite_statements("auth_user")
+        self.assertFalse(any("fts5" in statement for statement in statements))
+        self.assertTrue(
+            any("fts5" in statement for statement in migration.sqlite_statements("u"))
+        )
+
+        with mock.patch("apps.loans.search.has_fts_index", return_value=False):
+            self.assertEqual(self.search("ALICE"), {self.alice_loan})
+            self.assertEqual(self.search("lic ta"), {self.alice_loan})
+            self.assertEqual(self.search("example .org"), {self.bob_loan})
+            self.assertEqual(self.search("%"), set())
+
+    def test_api_loan_list_search(self):
+        """
+        Test list loan endpoint search, within the loans a user can list
+        """
+        request = self.client.get(
+            "/api/loans/?all=true&search=bob",
+            HTTP_AUTHORIZATION=f"Token {self.admin_token.key}",
+        )
+        self.assertEqual(request.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [loan["id"] for loan in request.json()["results"]],
+            [str(self.bob_loan.id)],
+        )
+
+        for search, count in (("bob", 0), ("tan", 1), ("", 1)):
+            request = self.client.get(
+                "/api/loans/",
+                {"search": search, "pagination": "cursor"},
+                HTTP_AUTHORIZATION=f"Token {self.alice_token.key}",
+            )
+            self.assertEqual(request.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(request.json()["results"]), count, search)
+
+    def test_admin_search(self):
+        """
+        Test admin changelists and loan autocomplete use the search index
+        """
+        self.client.force_login(self.admin)
+        response = self.client.get("/admin/loans/loan/", {"q": "alice tan"})
+        self.assertEqual(list(response.context["cl"].result_list), [self.alice_loan])
+
+        LoanTerm.objects.create(loan=self.bob_loan, amount=500)
+        response = self.client.get("/admin/loans/loanterm/", {"q": "bob"})
+        self.assertEqual(
+            [term.loan_id for term in response.context["cl"].result_list],
+            [self.bob_loan.id],
+        )
+
+        response = self.client.get(
+            "/admin/autocomplete/",
+            {
+                "app_label": "loans",
+                "model_name": "loanterm",
+                "field_name": "loan",
+                "term": "bob",
+            },
+        )
+        self.assertEqual(
+            [result["id"] for result in response.json()["results"]],
+            [str(self.bob_loan.id)],
+        )
@@ -1,36 +1,127 @@
-from datetime import datetime, timedelta
-
 from django.db import transaction, IntegrityError
+from django.db.models import Prefetch
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
 
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema
 from rest_framework import status
 
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import UnsupportedMediaType
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
-from apps.loans.choices import LoanState, LoanTermStatus
-from apps.loans.models import Loan, LoanTerm
+from apps.loans.analytics import day_aligned, portfolio_analytics
+from apps.loans.approvals import approve_loans
+from apps.loans.choices import LoanState
+from apps.loans.etags import conditional_response, loans_validators, set_validators
+from apps.loans.exports import STREAMS, export_rows
+from apps.loans.imports import IMPORT_CONTENT_TYPES, import_loans, read_rows
+from apps.loans.models import Loan, LoanTerm, OverdueSummary, PortfolioSummary
+from apps.loans.repayments import RepaymentError, repay_loan
+from apps.loans.reads import (
+    loan_access_validators,
+    loan_detail,
+    loan_terms,
+    loans_pagination_class,
+    loans_queryset,
+)
+from apps.loans.representations import LOAN_COLUMNS, loan_representations
+from apps.loans.schedules import build_schedule
+from apps.loans.summary import record_updated
 from apps.loans.serializers import (
     LoanSerializer,
+    LoanAnalyticsSerializer,
     LoanApproveInputSerializer,
+    LoanBulkApproveInputSerializer,
+    LoanBulkApproveResultSerializer,
     LoanCreateInputSerializer,
+    LoanExportQuerySerializer,
+    LoanFilterQuerySerializer,
+    LoanImportResultSerializer,
     LoanListQuerySerializer,
     LoanRePaymentInputSerializer,
+    LoanTermSerializer,
 )
+from apps.monitoring.profiling import ProfiledViewMixin
 
 
-class LoanViewSet(ModelViewSet):
+class LoanViewSet(ProfiledViewMixin, ModelViewSet):
     queryset = Loan.objects.all()
     serializer_class = LoanSerializer
     http_method_names = ["get", "patch", "post"]
     permission_classes = (IsAuthenticated,)
+    # GET requests read from the read replica, see mini_aspire.db_routers
+    replica_reads = True
+
+    def get_queryset(self):
+        # Load users and ordered loan terms in the same pass to avoid N+1 queries
+        return (
+            super()
+            .get_queryset()
+            .select_related("user", "approved_by")
+            .prefetch_related(
+                Prefetch("loan_term", queryset=LoanTerm.objects.order_by("due_date"))
+            )
+        )
+
+    def filter_loans(self, queryset, query_params, prefix=""):
+        """
+        Filter loans by LoanFilterQuerySerializer query params.
+
+        prefix: lookup path to the loan, to filter related models (loan terms).
+        """
+        if "state" in query_params:
+            queryset = queryset.filter(**{f"{prefix}state": query_params["state"]})
+        if "created_after" in query_params:
+            queryset = queryset.filter(
+                **{f"{prefix}created__gte": query_params["created_after"]}
+            )
+        if "created_before" in query_params:
+            queryset = queryset.filter(
+                **{f"{prefix}created__lt": query_params["created_before"]}
+            )
+        return queryset
+
+    def filter_summaries(self, queryset, query_params):
+        """
+        Filter portfolio (or overdue) summaries by LoanFilterQuerySerializer
+        query params.
+
+        Returns None when the created date range does not fall on summary days.
+        """
+        created_after = query_params.get("created_after")
+        created_before = query_params.get("created_before")
+        if not (day_aligned(created_after) and day_aligned(created_before)):
+            return None
+
+        if "state" in query_params:
+            queryset = queryset.filter(state=query_params["state"])
+        if created_after is not None:
+            queryset = queryset.filter(day__gte=timezone.localdate(created_after))
+        if created_before is not None:
+            queryset = queryset.filter(day__lt=timezone.localdate(created_before))
+        return queryset
+
+    def perform_update(self, serializer):
+        # Admin updates of the loan state or amount, with their summary deltas
+        instance = serializer.instance
+        before = (instance.state, instance.amount, instance.outstanding_amount)
+        with transaction.atomic():
+            serializer.save()
+            record_updated(instance, *before)
 
     def get_permissions(self):
-        if self.action in ["partial_update", "approve_loan"]:
+        if self.action in [
+            "partial_update",
+            "approve_loan",
+            "bulk_approve_loan",
+            "bulk_create_loan",
+            "export",
+            "analytics",
+        ]:
             self.permission_classes = (IsAdminUser,)
         return super().get_permissions()
 
@@ -42,25 +133,45 @@ class LoanViewSet(ModelViewSet):
         query_param all:
         - true: Show all loans.
         - false: Only user specific loans.
-        """
-        queryset = self.get_queryset()
 
+        query_param pagination:
+        - page: Page number pagination with total count (default).
+        - cursor: Cursor pagination ordered by (created, id), without total count.
+
+        query_param terms:
+        - true: Include loan terms (default).
+        - false: Only loans with their balance fields, loan terms are not loaded.
+
+        query_param search:
+        - Loans whose id or borrower's username, names or email contain every
+          word, served by a search index.
+
+        Supports conditional GET with ETag / Last-Modified validators.
+        """
         query_serializer = LoanListQuerySerializer(data=request.query_params)
         query_serializer.is_valid(raise_exception=True)
         query_params = query_serializer.data
 
-        _all = query_params.get("all")
+        queryset = loans_queryset(request.user, query_params)
+        self.pagination_class = loans_pagination_class(query_params)
 
-        if not _all or not request.user.is_staff:
-            queryset = queryset.filter(user=request.user)
+        # Read path, loan columns only and loan terms of the page in one query
+        page = self.paginate_queryset(queryset.values(*LOAN_COLUMNS))
+        if page is None:
+            page = list(queryset.values(*LOAN_COLUMNS))
 
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        # Not modified, skip loading loan terms and serializing loans
+        validators = loans_validators(page, request, self.paginator)
+        response = conditional_response(request, validators)
+        if response is not None:
+            return response
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        data = loan_representations(page, terms=query_params.get("terms"))
+        if self.paginator is not None:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response(data)
+        return set_validators(response, validators)
 
     @extend_schema(request=LoanCreateInputSerializer)
     def create(self, request, *args, **kwargs):
@@ -70,21 +181,73 @@ class LoanViewSet(ModelViewSet):
         self.serializer_class = LoanCreateInputSerializer
         return super().create(request, *args, **kwargs)
 
+    @extend_schema(
+        request={
+            content_type: OpenApiTypes.STR for content_type in IMPORT_CONTENT_TYPES
+        },
+        responses=LoanImportResultSerializer,
+    )
+    @action(methods=["post"], detail=False, url_path="bulk-create-loan")
+    def bulk_create_loan(self, request, *args, **kwargs):
+        """
+        Bulk create loans by admin endpoint.
+
+        - Request body is a CSV (text/csv) or NDJSON (application/x-ndjson) file,
+          with amount, term and optional user (id) columns.
+        - Rows are validated like loan creation, invalid rows are reported per row
+          and do not stop the upload.
+        - Loans are created for the user column, defaults to the admin user.
+        """
+        content_type = request.content_type.split(";")[0].strip()
+        if content_type not in IMPORT_CONTENT_TYPES:
+            raise UnsupportedMediaType(content_type)
+
+        rows = read_rows(request.stream, IMPORT_CONTENT_TYPES[content_type])
+        created, errors = import_loans(rows, request.user)
+
+        return Response(
+            LoanImportResultSerializer({"created": created, "errors": errors}).data
+        )
+
     def retrieve(self, request, *args, **kwargs):
         """
         Get a loan  details endpoint.
 
         - User check with restrict user to view others loan details.
         - Admin can access any loan details.
+        - Supports conditional GET with ETag / Last-Modified validators.
         """
-        queryset = self.get_object()
+        loan_id = self.kwargs[self.lookup_field]
 
         # Check user and staff status
-        if queryset.user != request.user and not request.user.is_staff:
-            raise PermissionDenied()
+        validators = loan_access_validators(loan_id, request.user)
+
+        # Not modified, skip loading and serializing the loan
+        response = conditional_response(request, validators)
+        if response is not None:
+            return response
+
+        # Read path, same output as LoanSerializer
+        data = loan_detail(loan_id)
+        if data is None:
+            raise Http404
+        return set_validators(Response(data), validators)
+
+    @extend_schema(responses=LoanTermSerializer(many=True))
+    @action(methods=["get"], detail=True, url_path="terms")
+    def terms(self, request, *args, **kwargs):
+        """
+        Get loan terms of a loan endpoint, ordered by due date.
 
-        serializer = self.get_serializer(queryset)
-        return Response(serializer.data)
+        - Same access rules and conditional GET as loan details.
+        """
+        loan_id = self.kwargs[self.lookup_field]
+        validators = loan_access_validators(loan_id, request.user)
+
+        response = conditional_response(request, validators)
+        if response is not None:
+            return response
+        return set_validators(Response(loan_terms(loan_id)), validators)
 
     @extend_schema(request=LoanApproveInputSerializer)
     @action(methods=["patch"], detail=True, url_path="approve-loan")
@@ -111,6 +274,7 @@ class LoanViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+        before = (instance.state, instance.amount, instance.outstanding_amount)
         try:
             with transaction.atomic():
                 serializer = self.get_serializer(
@@ -118,105 +282,153 @@ class LoanViewSet(ModelViewSet):
                 )
                 if serializer.is_valid(raise_exception=True):
                     # Partial update
-                    self.perform_update(serializer)
+                    serializer.save()
 
                     if request.data.get("state") == LoanState.APPROVED:
                         # Update approved_date and approved_by
                         instance.approved_date = timezone.now()
                         instance.approved_by = request.user
-                        instance.save()
 
                         # Create loan terms here (weekly)
-                        loan_amount = instance.amount
-                        loan_term = instance.term
-
-                        # Calculate loan term amount
-                        calculate_term_amount = round(loan_amount / loan_term, 2)
-                        final_amount_diff = round(
-                            loan_amount - (calculate_term_amount * loan_term), 2
+                        schedule = build_schedule(
+                            instance.amount, instance.term, instance.approved_date
                         )
 
-                        loan_terms = list()
-                        due_date = instance.approved_date
-                        for term in range(loan_term):
-                            # Add diff to last payment
-                            if term == (loan_term - 1):
-                                calculate_term_amount = (
-                                    calculate_term_amount + final_amount_diff
-                                )
-
-                            # Calculate due_date (weekly)
-                            due_date = due_date + timedelta(days=7)
-
-                            # For bulk create loan terms
-                            loan_terms.append(
-                                LoanTerm(
-                                    loan=instance,
-                                    amount=calculate_term_amount,
-                                    due_date=due_date,
-                                )
-                            )
+                        # Loan balance, nothing paid yet
+                        instance.outstanding_amount = instance.amount
+                        instance.paid_terms_count = 0
+                        instance.next_due_amount = schedule.amounts[0]
+                        instance.next_due_date = schedule.due_dates[0]
+                        instance.save()
+                        loan_terms = [
+                            LoanTerm(loan=instance, amount=amount, due_date=due_date)
+                            for amount, due_date in zip(*schedule)
+                        ]
+
                         # Bulk create loan terms
                         LoanTerm.objects.bulk_create(loan_terms, batch_size=1000)
+
+                        # Invalidate prefetched (empty) loan terms
+                        instance._prefetched_objects_cache = {}
+
+                    # Summary deltas of the new state or amount
+                    record_updated(instance, *before)
                 return Response(serializer.data)
         except IntegrityError as e:
             transaction.rollback()
             return Response(data={"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        request=LoanBulkApproveInputSerializer,
+        responses=LoanBulkApproveResultSerializer(many=True),
+    )
+    @action(methods=["patch"], detail=False, url_path="bulk-approve-loan")
+    def bulk_approve_loan(self, request, *args, **kwargs):
+        """
+        Bulk approve loans by admin endpoint.
+
+        - Only admin have access to approve loans.
+        - Pending loans are approved and their loan terms are created.
+        - Result per loan, with an error for loans which can not be approved.
+        """
+        input_serializer = LoanBulkApproveInputSerializer(data=request.data)
+        input_serializer.is_valid(raise_exception=True)
+
+        try:
+            results = approve_loans(
+                input_serializer.validated_data["ids"], approved_by=request.user
+            )
+        except IntegrityError as e:
+            return Response(data={"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(LoanBulkApproveResultSerializer(results, many=True).data)
+
+    @extend_schema(
+        parameters=[LoanExportQuerySerializer],
+        responses={
+            (200, "text/csv"): OpenApiTypes.STR,
+            (200, "application/x-ndjson"): OpenApiTypes.STR,
+        },
+    )
+    @action(methods=["get"], detail=False, url_path="export")
+    def export(self, request, *args, **kwargs):
+        """
+        Export loans with their loan terms by admin endpoint.
+
+        - A row per loan term, streamed as CSV or NDJSON.
+        - Filter by state and created date range.
+        """
+        query_serializer = LoanExportQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        query_params = query_serializer.validated_data
+
+        queryset = self.filter_loans(Loan.objects.all(), query_params)
+        # Rows are streamed after the request is routed, keep its database
+        queryset = queryset.using(queryset.db)
+
+        output = query_params["output"]
+        stream, content_type = STREAMS[output]
+        response = StreamingHttpResponse(
+            stream(export_rows(queryset)), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="loans.{output}"'
+        return response
+
+    @extend_schema(
+        parameters=[LoanFilterQuerySerializer], responses=LoanAnalyticsSerializer
+    )
+    @action(methods=["get"], detail=False, url_path="analytics")
+    def analytics(self, request, *args, **kwargs):
+        """
+        Portfolio analytics by admin endpoint.
+
+        - Loans count and amount, total and by state.
+        - Collected and outstanding amounts.
+        - Overdue amounts (loan terms marked by sweep_overdue), bucketed by days
+          past due date.
+        - Filter by state and created date range.
+
+        Read from the portfolio and overdue summary tables, unless the created
+        date range does not fall on whole days.
+        """
+        query_serializer = LoanFilterQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        query_params = query_serializer.validated_data
+
+        data = portfolio_analytics(
+            self.filter_loans(Loan.objects.all(), query_params),
+            self.filter_loans(LoanTerm.objects.all(), query_params, prefix="loan__"),
+            summaries=self.filter_summaries(
+                PortfolioSummary.objects.all(), query_params
+            ),
+            overdue_summaries=self.filter_summaries(
+                OverdueSummary.objects.all(), query_params
+            ),
+        )
+        return Response(LoanAnalyticsSerializer(data).data)
+
     @extend_schema(request=LoanRePaymentInputSerializer)
     @action(methods=["post"], detail=True, url_path="loan-repayment")
     def loan_payment(self, request, *args, **kwargs):
         """
         Loan repayment endpoint.
+
+        - Pays the earliest pending loan term, amount should be equal to its amount.
+        - Loan is marked as paid with the last loan term repayment.
         """
-        instance = self.get_object()
-        amount = request.data.get("amount", 0)
+        input_serializer = LoanRePaymentInputSerializer(data=request.data)
+        input_serializer.is_valid(raise_exception=True)
 
         try:
-            with transaction.atomic():
-                loan_terms = instance.loan_term.filter(status=LoanTermStatus.PENDING)
-                # Check for pending loan terms
-                if loan_terms.exists():
-                    # Check for last payment and mark loan is paid
-                    if len(loan_terms) == 1:
-                        # Update loan state and closed_date
-                        instance.state = LoanState.PAID
-                        instance.closed_date = timezone.now()
-                        instance.save()
-
-                    # Loop loan term and address repayment and break loop after payment
-                    for term in loan_terms:
-                        if term.status != LoanTermStatus.PAID:
-                            if amount != term.amount:
-                                return Response(
-                                    data={
-                                        "error": f"Loan repayment amount should be equal to {term.amount}"
-                                    },
-                                    status=status.HTTP_400_BAD_REQUEST,
-                                )
-                            term.status = LoanTermStatus.PAID
-                            term.paid_date = timezone.now()
-                            term.paid_amount = amount
-                            term.save()
-                            break
-                else:
-                    # Update only loan terms and loan is not paid status
-                    if instance.loan_term.filter().exists():
-                        return Response(
-                            data={"error": "Loan is already fully paid"},
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-                    else:
-                        return Response(
-                            data={
-                                "error": "Loan is not approved or loan terms does not exists"
-                            },
-                            status=status.HTTP_400_BAD_REQUEST,
-                        )
-
+            repay_loan(
+                self.kwargs[self.lookup_field],
+                input_serializer.validated_data["amount"],
+            )
+        except RepaymentError as e:
+            return Response(data={"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except IntegrityError as e:
-            transaction.rollback()
             return Response(data={"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        instance = self.get_object()
         serializer = self.get_serializer(instance, many=False)
         return Response(serializer.data)
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.monitoring"
+
+    def ready(self):
+        from apps.monitoring.metrics import (
+            install_query_timer,
+            install_serializer_timer,
+        )
+
+        install_query_timer()
+        install_serializer_timer()
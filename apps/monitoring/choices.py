@@ -0,0 +1,6 @@
+from django.db import models
+
+
+class QueryFindingKind(models.TextChoices):
+    SLOW = "slow", "Slow query"
+    N_PLUS_ONE = "n_plus_one", "Repeated query (N+1)"
@@ -0,0 +1,156 @@
+"""
+Sampled slow query and N+1 detector.
+
+A QUERY_INSPECTION_SAMPLE_RATE share of requests is inspected (0, the
+default, disables it). Queries of an inspected request are grouped by shape,
+their SQL with parameter lists collapsed, parameters are never recorded:
+
+- Queries slower than SLOW_QUERY_MS are slow queries.
+- Shapes run N_PLUS_ONE_REPEATS times or more are likely N+1 queries.
+
+Findings are logged with the endpoint and view (and action) of the request,
+and aggregated per endpoint in QueryFinding, see `manage.py query_report`.
+Requests which are not inspected only pay for a random() call.
+"""
+
+import hashlib
+import logging
+import random
+import re
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from apps.monitoring.choices import QueryFindingKind
+from apps.monitoring.models import QueryFinding
+
+logger = logging.getLogger(__name__)
+
+# "%s, %s, %s" parameter lists, IN (...) and multi-row VALUES
+_PARAMETER_LIST = re.compile(r"%s(?:\s*,\s*%s)+")
+_VALUES_LIST = re.compile(r"\((?:%s, \.\.\.|%s)\)(?:\s*,\s*\((?:%s, \.\.\.|%s)\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def query_shape(sql):
+    """
+    SQL with parameter lists collapsed, same shape for any number of values.
+    """
+    shape = _PARAMETER_LIST.sub("%s, ...", _WHITESPACE.sub(" ", sql.strip()))
+    return _VALUES_LIST.sub("(%s, ...), ...", shape)
+
+
+def sample():
+    """
+    Returns a QueryInspection for an inspected request, None otherwise.
+    """
+    rate = settings.QUERY_INSPECTION_SAMPLE_RATE
+    if rate and random.random() < rate:
+        return QueryInspection()
+    return None
+
+
+def request_view(request):
+    """
+    Endpoint (method and route) and view (and viewset action) of a request.
+    """
+    match = request.resolver_match
+    if match is None:
+        return f"{request.method} unmatched", ""
+    view = match.func
+    view_name = getattr(view, "cls", view).__name__
+    actions = getattr(view, "actions", None)
+    if actions and request.method.lower() in actions:
+        view_name += f".{actions[request.method.lower()]}"
+    return f"{request.method} {match.view_name}", view_name
+
+
+class QueryInspection:
+    """
+    Queries of an inspected request, by SQL.
+    """
+
+    def __init__(self):
+        self.queries = defaultdict(list)
+
+    def record(self, sql, elapsed):
+        self.queries[sql].append(elapsed)
+
+    def findings(self):
+        """
+        Yield (kind, shape, durations) of slow and repeated query shapes.
+        """
+        shapes = defaultdict(list)
+        for sql, durations in self.queries.items():
+            shapes[query_shape(sql)] += durations
+
+        slow = settings.SLOW_QUERY_MS / 1000
+        for shape, durations in shapes.items():
+            slow_durations = [duration for duration in durations if duration >= slow]
+            if slow_durations:
+                yield QueryFindingKind.SLOW, shape, slow_durations
+            if len(durations) >= settings.N_PLUS_ONE_REPEATS:
+                yield QueryFindingKind.N_PLUS_ONE, shape, durations
+
+
+def report_findings(request, inspection):
+    """
+    Log the findings of an inspected request and aggregate them per endpoint.
+    """
+    endpoint, view = None, None
+    for kind, shape, durations in inspection.findings():
+        if endpoint is None:
+            endpoint, view = request_view(request)
+        total_ms = sum(durations) * 1000
+        max_ms = max(durations) * 1000
+        if kind == QueryFindingKind.SLOW:
+            logger.warning(
+                "Slow query, %.1f ms in %s (%s): %s", max_ms, endpoint, view, shape
+            )
+        else:
+            logger.warning(
+                "Possible N+1, %d identical queries (%.1f ms) in %s (%s): %s",
+                len(durations),
+                total_ms,
+                endpoint,
+                view,
+                shape,
+            )
+        record_finding(endpoint, view, kind, shape, durations, total_ms, max_ms)
+
+
+def record_finding(endpoint, view, kind, shape, durations, total_ms, max_ms):
+    shape_hash = hashlib.sha1(shape.encode()).hexdigest()
+    rows = QueryFinding.objects.filter(
+        endpoint=endpoint, kind=kind, shape_hash=shape_hash
+    )
+    updates = {
+        "view": view,
+        "requests_count": F("requests_count") + 1,
+        "queries_count": F("queries_count") + len(durations),
+        "max_repeats": Greatest("max_repeats", len(durations)),
+        "total_ms": F("total_ms") + total_ms,
+        "max_ms": Greatest("max_ms", max_ms),
+    }
+    if rows.update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            QueryFinding.objects.create(
+                endpoint=endpoint,
+                view=view,
+                kind=kind,
+                shape_hash=shape_hash,
+                shape=shape,
+                requests_count=1,
+                queries_count=len(durations),
+                max_repeats=len(durations),
+                total_ms=total_ms,
+                max_ms=max_ms,
+            )
+    except IntegrityError:
+        # Created concurrently
+        rows.update(**updates)
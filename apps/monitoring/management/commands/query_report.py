@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum
+
+from apps.monitoring.choices import QueryFindingKind
+from apps.monitoring.models import QueryFinding
+
+
+class Command(BaseCommand):
+    help = (
+        "Report slow and repeated (N+1) queries found in inspected requests, "
+        "per endpoint, see QUERY_INSPECTION_SAMPLE_RATE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--endpoint",
+            help="Only report endpoints containing this text, e.g. loan-list.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10,
+            help="Query shapes reported per endpoint, by total time.",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete the reported findings, to start a new sampling period.",
+        )
+
+    def handle(self, *args, **options):
+        findings = QueryFinding.objects.all()
+        if options["endpoint"]:
+            findings = findings.filter(endpoint__icontains=options["endpoint"])
+
+        endpoints = (
+            findings.values("endpoint")
+            .annotate(total=Sum("total_ms"))
+            .order_by("-total", "endpoint")
+        )
+        if not endpoints:
+            self.stdout.write("No slow or N+1 queries found.")
+
+        for row in endpoints:
+            endpoint_findings = list(
+                findings.filter(endpoint=row["endpoint"]).order_by("-total_ms")
+            )
+            views = sorted(
+                {finding.view for finding in endpoint_findings if finding.view}
+            )
+            self.stdout.write(
+                self.style.MIGRATE_HEADING(
+                    f"{row['endpoint']} ({', '.join(views)}), {row['total']:.1f} ms"
+                )
+            )
+            for finding in endpoint_findings[: options["limit"]]:
+                if finding.kind == QueryFindingKind.SLOW:
+                    summary = (
+                        f"slow: {finding.queries_count} queries, "
+                        f"max {finding.max_ms:.1f} ms"
+                    )
+                else:
+                    summary = (
+                        f"N+1: up to {finding.max_repeats} per request, "
+                        f"{finding.queries_count} queries"
+                    )
+                self.stdout.write(
+                    f"  {summary}, {finding.total_ms:.1f} ms in "
+                    f"{finding.requests_count} requests"
+                )
+                self.stdout.write(f"    {finding.shape}")
+
+        if options["clear"]:
+            deleted, _ = findings.delete()
+            self.stdout.write(f"{deleted} findings cleared.")
@@ -0,0 +1,239 @@
+"""
+Per request performance metrics, see PerformanceMiddleware.
+
+A request's metrics (RequestMetrics) live in a context variable, so database
+work done in worker threads (async views) is recorded against the request too.
+Queries are timed by a database execute wrapper installed once per connection,
+serializer output (the data property of DRF serializers) by a wrapper installed
+once per serializer base class.
+
+Requests are aggregated per route into histograms, kept in process memory and
+exported in the Prometheus text format: scrape every worker process.
+"""
+
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import ListSerializer, Serializer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 10240, 102400, 1048576, 10485760)
+# Method label values, other methods are labelled "other"
+METHODS = frozenset(("GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"))
+
+# name: (type, help, buckets)
+METRICS = {
+    "http_request_duration_seconds": (
+        "histogram",
+        "Request wall time.",
+        DURATION_BUCKETS,
+    ),
+    "http_request_phase_duration_seconds": (
+        "histogram",
+        "Request time by phase (db, auth, serialize, render), phases other "
+        "than db exclude database time.",
+        DURATION_BUCKETS,
+    ),
+    "http_request_queries": (
+        "histogram",
+        "Database queries per request.",
+        QUERIES_BUCKETS,
+    ),
+    "http_response_size_bytes": (
+        "histogram",
+        "Response body size, streaming responses excluded.",
+        SIZE_BUCKETS,
+    ),
+}
+
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """
+    Metrics of a request: database time and queries, phase durations.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.db_time = 0.0
+        self.queries = 0
+        self.phases = {}
+        self.active_phases = set()
+        # QueryInspection of a sampled request, see apps.monitoring.inspection
+        self.inspection = None
+
+
+@contextmanager
+def collect_metrics():
+    """
+    Yield the RequestMetrics of the block, recorded by queries and timing().
+    """
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+def time_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper, records queries of the current request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = perf_counter() - started
+        metrics.db_time += elapsed
+        metrics.queries += 1
+        if metrics.inspection is not None:
+            metrics.inspection.record(sql, elapsed)
+
+
+def install_query_timer():
+    def on_connection_created(sender, connection, **kwargs):
+        if time_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(time_query)
+
+    connection_created.connect(
+        on_connection_created, weak=False, dispatch_uid="monitoring_query_timer"
+    )
+
+
+def _timed_data(data):
+    def timed_data(serializer):
+        with timing("serialize"):
+            return data(serializer)
+
+    timed_data.timed = True
+    return timed_data
+
+
+def install_serializer_timer():
+    """
+    Record serializer output as the serialize phase, for every response built
+    from serializer.data, whatever the view.
+    """
+    for serializer_class in (Serializer, ListSerializer):
+        data = serializer_class.data.fget
+        if not getattr(data, "timed", False):
+            serializer_class.data = property(_timed_data(data))
+
+
+@contextmanager
+def timing(phase):
+    """
+    Record the time spent in the block as a phase of the current request,
+    database time excluded. Does nothing outside of a request, and in nested
+    blocks of the same phase.
+    """
+    metrics = _current.get()
+    if metrics is None or phase in metrics.active_phases:
+        yield
+        return
+    metrics.active_phases.add(phase)
+    started, db_time = perf_counter(), metrics.db_time
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - started - (metrics.db_time - db_time)
+        metrics.phases[phase] = metrics.phases.get(phase, 0) + elapsed
+        metrics.active_phases.discard(phase)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # A count per bucket, non cumulative, and +Inf last
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """
+    Histograms by metric name and labels, thread safe.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = Histogram(METRICS[name][2])
+        histogram.observe(value)
+
+    def observe_request(self, route, method, status, duration, metrics, size=None):
+        method = method if method in METHODS else "other"
+        labels = (("route", route), ("method", method))
+        with self.lock:
+            self._observe(
+                "http_request_duration_seconds",
+                labels + (("status", str(status)),),
+                duration,
+            )
+            for phase, value in (("db", metrics.db_time), *metrics.phases.items()):
+                self._observe(
+                    "http_request_phase_duration_seconds",
+                    labels + (("phase", phase),),
+                    value,
+                )
+            self._observe("http_request_queries", labels, metrics.queries)
+            if size is not None:
+                self._observe("http_response_size_bytes", labels, size)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        """
+        Histograms in the Prometheus text exposition format.
+        """
+        with self.lock:
+            histograms = sorted(
+                (key, list(histogram.counts), histogram.sum)
+                for key, histogram in self.histograms.items()
+            )
+
+        lines = []
+        for name, (metric_type, description, buckets) in METRICS.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {metric_type}"]
+            for (metric, labels), counts, total in histograms:
+                if metric != name:
+                    continue
+                count = 0
+                for bound, bucket_count in zip((*buckets, "+Inf"), counts):
+                    count += bucket_count
+                    bucket_labels = _labels(labels + (("le", str(bound)),))
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {total}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    return "{%s}" % ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+registry = Registry()
@@ -0,0 +1,78 @@
+import asyncio
+from time import perf_counter
+
+from django.conf import settings
+
+from apps.monitoring.inspection import report_findings, sample
+from apps.monitoring.metrics import collect_metrics, registry
+from mini_aspire.async_utils import database_sync_to_async
+
+
+def server_timing(duration, metrics, size=None):
+    """
+    Server-Timing header value, durations in milliseconds.
+    """
+    entries = [
+        f"total;dur={duration * 1000:.1f}",
+        f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+    ]
+    entries += [
+        f"{phase};dur={value * 1000:.1f}" for phase, value in metrics.phases.items()
+    ]
+    if size is not None:
+        entries.append(f'size;desc="{size} bytes"')
+    return ", ".join(entries)
+
+
+class PerformanceMiddleware:
+    """
+    Records wall time, database time and queries, phase durations (auth,
+    serialize, render) and response size of every request.
+
+    - Sets them as a Server-Timing header, unless SERVER_TIMING is False.
+    - Aggregates them in per route histograms, see apps.monitoring.views.metrics.
+    - Inspects a sample of requests for slow and N+1 queries, see
+      apps.monitoring.inspection.
+
+    Should be first in MIDDLEWARE, so the time of other middleware is included.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the middleware as a coroutine, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        with collect_metrics() as metrics:
+            metrics.inspection = sample()
+            response = self.get_response(request)
+        if metrics.inspection is not None:
+            report_findings(request, metrics.inspection)
+        return self.record(request, response, metrics)
+
+    async def __acall__(self, request):
+        with collect_metrics() as metrics:
+            metrics.inspection = sample()
+            response = await self.get_response(request)
+        if metrics.inspection is not None:
+            await database_sync_to_async(report_findings)(request, metrics.inspection)
+        return self.record(request, response, metrics)
+
+    def record(self, request, response, metrics):
+        duration = perf_counter() - metrics.started
+        size = None if response.streaming else len(response.content)
+
+        match = request.resolver_match
+        route = match.view_name if match is not None else "unmatched"
+        registry.observe_request(
+            route, request.method, response.status_code, duration, metrics, size
+        )
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = server_timing(duration, metrics, size)
+        return response
@@ -0,0 +1,76 @@
+# Generated by Django 3.2.13 on 2026-10-18 06:23
+
+from django.db import migrations, models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="QueryFinding",
+            fields=[
+                (
+                    "id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                ("updated", models.DateTimeField(auto_now=True)),
+                ("endpoint", models.CharField(max_length=200, verbose_name="endpoint")),
+                (
+                    "view",
+                    models.CharField(blank=True, max_length=200, verbose_name="view"),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("slow", "Slow query"),
+                            ("n_plus_one", "Repeated query (N+1)"),
+                        ],
+                        max_length=30,
+                        verbose_name="kind",
+                    ),
+                ),
+                (
+                    "shape_hash",
+                    models.CharField(max_length=40, verbose_name="shape hash"),
+                ),
+                ("shape", models.TextField(verbose_name="shape")),
+                (
+                    "requests_count",
+                    models.IntegerField(default=0, verbose_name="requests count"),
+                ),
+                (
+                    "queries_count",
+                    models.IntegerField(default=0, verbose_name="queries count"),
+                ),
+                (
+                    "max_repeats",
+                    models.IntegerField(default=0, verbose_name="max repeats"),
+                ),
+                ("total_ms", models.FloatField(default=0, verbose_name="total ms")),
+                ("max_ms", models.FloatField(default=0, verbose_name="max ms")),
+            ],
+            options={
+                "verbose_name": "Query Finding",
+                "verbose_name_plural": "Query Findings",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="queryfinding",
+            constraint=models.UniqueConstraint(
+                fields=("endpoint", "kind", "shape_hash"),
+                name="query_finding_endpoint_kind_shape_uniq",
+            ),
+        ),
+    ]
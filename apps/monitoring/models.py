@@ -0,0 +1,37 @@
+from django.db import models
+from django.utils.translation import ugettext_lazy as _
+
+from apps.accounts.models import BaseModel
+from apps.monitoring.choices import QueryFindingKind
+
+
+class QueryFinding(BaseModel):
+    """
+    Slow and repeated (N+1) query shapes of an endpoint, aggregated over
+    inspected requests, see apps.monitoring.inspection.
+    """
+
+    endpoint = models.CharField(_("endpoint"), max_length=200)
+    view = models.CharField(_("view"), max_length=200, blank=True)
+    kind = models.CharField(_("kind"), choices=QueryFindingKind.choices, max_length=30)
+    shape_hash = models.CharField(_("shape hash"), max_length=40)
+    shape = models.TextField(_("shape"))
+    # Inspected requests the query shape was found in
+    requests_count = models.IntegerField(_("requests count"), default=0)
+    queries_count = models.IntegerField(_("queries count"), default=0)
+    max_repeats = models.IntegerField(_("max repeats"), default=0)
+    total_ms = models.FloatField(_("total ms"), default=0)
+    max_ms = models.FloatField(_("max ms"), default=0)
+
+    def __str__(self):
+        return f"{self.endpoint}, {self.kind}: {self.shape[:80]}"
+
+    class Meta:
+        verbose_name = _("Query Finding")
+        verbose_name_plural = _("Query Findings")
+        constraints = [
+            models.UniqueConstraint(
+                fields=["endpoint", "kind", "shape_hash"],
+                name="query_finding_endpoint_kind_shape_uniq",
+            )
+        ]
@@ -0,0 +1,189 @@
+"""
+On demand profiling of API requests.
+
+Requests of staff users sending an `X-Profile: 1` header to a view using
+ProfiledViewMixin run under cProfile, with their queries recorded (SQL without
+parameters, start and duration). Each profile is stored in PROFILE_DIR as:
+
+- <id>.json: request, call tree (cumulative time) and SQL timeline.
+- <id>.prof: cProfile stats, for pstats or snakeviz.
+
+Only the newest PROFILE_RETENTION profiles are kept. The profile id is sent in
+the X-Profile-Id response header, see apps.monitoring.views for downloads.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import re
+import uuid
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.template.response import SimpleTemplateResponse
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+# X-Profile header values requesting a profile, case insensitive
+PROFILE_HEADER_VALUES = ("1", "true", "yes", "on")
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_ID = re.compile(r"^\d{8}T\d{12}-[0-9a-f]{8}$")
+# Functions in the call tree, by cumulative time
+CALL_TREE_LIMIT = 60
+
+
+class RequestProfile:
+    """
+    cProfile profiler and SQL timeline of a request.
+    """
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.queries = []
+        self.started = None
+        self.duration = None
+        self.wrappers = ExitStack()
+
+    def start(self):
+        for connection in connections.all():
+            self.wrappers.enter_context(connection.execute_wrapper(self.record_query))
+        self.started = perf_counter()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.duration = perf_counter() - self.started
+        self.wrappers.close()
+
+    def record_query(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(
+                {
+                    "database": context["connection"].alias,
+                    "start_ms": round((started - self.started) * 1000, 3),
+                    "duration_ms": round((perf_counter() - started) * 1000, 3),
+                    "sql": sql,
+                    "many": many,
+                }
+            )
+
+    def call_tree(self):
+        """
+        Functions by cumulative time, and the functions they called.
+        """
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=output)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(CALL_TREE_LIMIT)
+        stats.print_callees(CALL_TREE_LIMIT)
+        return output.getvalue()
+
+
+def profile_path(profile_id, extension):
+    return os.path.join(settings.PROFILE_DIR, f"{profile_id}.{extension}")
+
+
+def list_profiles():
+    """
+    Ids of stored profiles, newest first.
+    """
+    try:
+        names = os.listdir(settings.PROFILE_DIR)
+    except FileNotFoundError:
+        return []
+    profile_ids = {name[:-5] for name in names if name.endswith(".json")}
+    return sorted(
+        (profile_id for profile_id in profile_ids if PROFILE_ID.match(profile_id)),
+        reverse=True,
+    )
+
+
+def save_profile(profile, request, response, view):
+    """
+    Store a profile, drop the oldest ones over PROFILE_RETENTION. Returns its id.
+    """
+    created = timezone.now()
+    profile_id = f"{created:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    report = {
+        "id": profile_id,
+        "created": created.isoformat(),
+        "user": request.user.username,
+        "method": request.method,
+        "path": request.path,
+        "view": view,
+        "status": response.status_code,
+        "duration_ms": round(profile.duration * 1000, 3),
+        "queries_count": len(profile.queries),
+        "queries_ms": round(sum(query["duration_ms"] for query in profile.queries), 3),
+        "call_tree": profile.call_tree(),
+        "queries": profile.queries,
+    }
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    profile.profiler.dump_stats(profile_path(profile_id, "prof"))
+    with open(profile_path(profile_id, "json"), "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+    for old_profile_id in list_profiles()[settings.PROFILE_RETENTION :]:
+        for extension in ("json", "prof"):
+            try:
+                os.remove(profile_path(old_profile_id, extension))
+            except FileNotFoundError:
+                pass
+    return profile_id
+
+
+class ProfiledViewMixin:
+    """
+    Profile requests of staff users sending an `X-Profile: 1` header (or true,
+    yes, on), from after authentication to the rendered response. Other requests
+    only pay for a header lookup.
+    """
+
+    request_profile = None
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Stop profiling on uncaught exceptions
+            if self.request_profile is not None:
+                self.request_profile.stop()
+                self.request_profile = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        requested = request.META.get(PROFILE_HEADER, "").strip().lower()
+        if requested in PROFILE_HEADER_VALUES and request.user.is_staff:
+            self.request_profile = RequestProfile()
+            self.request_profile.start()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        profile = self.request_profile
+        if profile is None:
+            return response
+
+        try:
+            # Render here to include rendering, streamed content is not profiled
+            if isinstance(response, SimpleTemplateResponse):
+                response.render()
+        finally:
+            self.request_profile = None
+            profile.stop()
+        view = (
+            f"{type(self).__name__}.{getattr(self, 'action', None) or request.method}"
+        )
+        try:
+            response[PROFILE_ID_HEADER] = save_profile(profile, request, response, view)
+        except OSError:
+            logger.exception("Profile of %s %s not saved", request.method, view)
+        return response
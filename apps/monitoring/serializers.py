@@ -0,0 +1,20 @@
+from rest_framework import serializers
+
+
+class ProfileSerializer(serializers.Serializer):
+    id = serializers.CharField()
+    created = serializers.DateTimeField()
+    user = serializers.CharField()
+    method = serializers.CharField()
+    path = serializers.CharField()
+    view = serializers.CharField()
+    status = serializers.IntegerField()
+    duration_ms = serializers.FloatField()
+    queries_count = serializers.IntegerField()
+    queries_ms = serializers.FloatField()
+
+
+class ProfileDownloadQuerySerializer(serializers.Serializer):
+    stats = serializers.BooleanField(
+        required=False, help_text="Download the cProfile stats (.prof)."
+    )
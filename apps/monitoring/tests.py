@@ -0,0 +1,373 @@
+import json
+import os
+import re
+import tempfile
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from apps.loans.models import Loan
+from apps.loans.serializers import LoanSerializer
+from apps.monitoring.choices import QueryFindingKind
+from apps.monitoring.inspection import QueryInspection, query_shape, report_findings
+from apps.monitoring.metrics import collect_metrics, registry, timing
+from apps.monitoring.models import QueryFinding
+from apps.monitoring.profiling import PROFILE_ID_HEADER
+
+
+@override_settings(SERVER_TIMING=True, METRICS_TOKEN="secret")
+class PerformanceMiddlewareTestCase(APITestCase):
+    def setUp(self):
+        registry.clear()
+        self.admin = User.objects.create_superuser(username="admin")
+        self.user = User.objects.create_user(username="user")
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        Loan.objects.create(user=self.user, amount=10000, term=3)
+
+    def server_timing(self, response):
+        return {
+            name: params
+            for name, _, params in (
+                entry.partition(";") for entry in response["Server-Timing"].split(", ")
+            )
+        }
+
+    def get_metrics(self):
+        # The client credentials are the user's token
+        return Client().get("/metrics/", HTTP_AUTHORIZATION="Bearer secret")
+
+    def test_server_timing(self):
+        """
+        Test requests have a Server-Timing header with their phases
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/loans/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        timings = self.server_timing(response)
+        self.assertEqual(
+            set(timings), {"total", "db", "auth", "serialize", "render", "size"}
+        )
+        self.assertIn(f'desc="{len(queries)} queries"', timings["db"])
+        self.assertEqual(timings["size"], f'desc="{len(response.content)} bytes"')
+        self.assertRegex(timings["total"], r"^dur=\d+\.\d$")
+
+        with override_settings(SERVER_TIMING=False):
+            response = self.client.get("/api/loans/")
+        self.assertFalse(response.has_header("Server-Timing"))
+
+    def test_server_timing_serializers(self):
+        """
+        Test responses built from serializers record the serialize phase
+        """
+        response = self.client.post("/api/loans/", {"amount": 10000, "term": 3})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("serialize", self.server_timing(response))
+
+        loan = Loan.objects.get(id=response.json()["id"])
+        with collect_metrics() as metrics:
+            self.assertEqual(LoanSerializer(loan).data["id"], str(loan.id))
+        self.assertEqual(list(metrics.phases), ["serialize"])
+
+    def test_metrics(self):
+        """
+        Test metrics endpoint exports per route histograms
+        """
+        for _ in range(2):
+            self.client.get("/api/loans/")
+        self.client.get("/api/loans/not-a-route/")
+        self.client.get("/missing/")
+
+        response = self.get_metrics()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(
+            response["Content-Type"].startswith("text/plain; version=0.0.4")
+        )
+        metrics = response.content.decode()
+        labels = 'route="loan-list",method="GET"'
+        self.assertIn(
+            f'http_request_duration_seconds_count{{{labels},status="200"}} 2', metrics
+        )
+        self.assertIn(
+            f"http_request_duration_seconds_bucket{{{labels},"
+            'status="200",le="+Inf"} 2',
+            metrics,
+        )
+        self.assertIn(f"http_request_queries_count{{{labels}}} 2", metrics)
+        for phase in ("db", "auth", "serialize", "render"):
+            self.assertIn(
+                f"http_request_phase_duration_seconds_count{{{labels},"
+                f'phase="{phase}"}} 2',
+                metrics,
+            )
+        self.assertIn(
+            'http_request_duration_seconds_count{route="unmatched",method="GET",'
+            'status="404"} 1',
+            metrics,
+        )
+
+        # Cumulative buckets
+        counts = [
+            int(count)
+            for count in re.findall(
+                rf'http_request_queries_bucket{{{labels},le="[^"]+"}} (\d+)', metrics
+            )
+        ]
+        self.assertEqual(counts, sorted(counts))
+
+        self.client.credentials()
+        response = self.client.get("/metrics/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer other")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        # Denied when no token is configured
+        with override_settings(METRICS_TOKEN=None):
+            response = self.get_metrics()
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_method_label(self):
+        """
+        Test methods outside the HTTP verbs served share the "other" label
+        """
+        self.client.generic("PROPFIND", "/api/loans/")
+        self.client.generic("X-CUSTOM", "/api/loans/")
+
+        metrics = self.get_metrics().content.decode()
+        self.assertIn(
+            'http_request_duration_seconds_count{route="loan-list",method="other",'
+            'status="405"} 2',
+            metrics,
+        )
+        self.assertNotIn('method="PROPFIND"', metrics)
+
+    async def test_async_server_timing(self):
+        """
+        Test the middleware records requests served by the async handler
+        """
+        response = await self.async_client.get(
+            "/metrics/", authorization="Bearer secret"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("total;dur=", response["Server-Timing"])
+
+    def test_timing(self):
+        """
+        Test phases exclude database time and nested blocks
+        """
+        with timing("serialize"):
+            pass
+
+        with collect_metrics() as metrics:
+            with timing("serialize"):
+                with timing("serialize"):
+                    User.objects.count()
+        self.assertEqual(metrics.queries, 1)
+        self.assertEqual(list(metrics.phases), ["serialize"])
+        self.assertLess(metrics.phases["serialize"], metrics.db_time + 0.01)
+
+
+class QueryInspectionTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="user")
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+        self.loan = Loan.objects.create(user=self.user, amount=10000, term=3)
+
+    def test_query_shape(self):
+        """
+        Test query shapes do not depend on the number of parameters
+        """
+        self.assertEqual(
+            query_shape('SELECT  "id"\n FROM "loan" WHERE "id" IN (%s, %s, %s)'),
+            'SELECT "id" FROM "loan" WHERE "id" IN (%s, ...)',
+        )
+        self.assertEqual(
+            query_shape('INSERT INTO "loan" ("a", "b") VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO "loan" ("a", "b") VALUES (%s, ...), ...',
+        )
+
+    def test_disabled(self):
+        """
+        Test requests are not inspected by default
+        """
+        with override_settings(SLOW_QUERY_MS=0):
+            self.client.get("/api/loans/")
+        self.assertFalse(QueryFinding.objects.exists())
+
+    @override_settings(QUERY_INSPECTION_SAMPLE_RATE=1, N_PLUS_ONE_REPEATS=3)
+    def test_n_plus_one(self):
+        """
+        Test repeated identical queries of a request are reported as N+1
+        """
+        # Identical queries of different requests are not an N+1
+        for _ in range(3):
+            self.client.get(f"/api/loans/{self.loan.id}/")
+        self.assertFalse(QueryFinding.objects.exists())
+
+        with self.assertLogs("apps.monitoring.inspection", "WARNING") as logs:
+            with collect_metrics() as metrics:
+                metrics.inspection = QueryInspection()
+                for loan_id in range(4):
+                    Loan.objects.filter(id=loan_id).first()
+            report_findings(self.request("GET", "/api/loans/"), metrics.inspection)
+            report_findings(self.request("GET", "/api/loans/"), metrics.inspection)
+        self.assertIn("Possible N+1, 4 identical queries", logs.output[0])
+        self.assertIn("GET loan-list (LoanViewSet.list)", logs.output[0])
+
+        finding = QueryFinding.objects.get()
+        self.assertEqual(finding.endpoint, "GET loan-list")
+        self.assertEqual(finding.view, "LoanViewSet.list")
+        self.assertEqual(finding.kind, QueryFindingKind.N_PLUS_ONE)
+        self.assertEqual(finding.requests_count, 2)
+        self.assertEqual(finding.queries_count, 8)
+        self.assertEqual(finding.max_repeats, 4)
+        self.assertIn('WHERE "loans_loan"."id" = %s', finding.shape)
+
+    @override_settings(QUERY_INSPECTION_SAMPLE_RATE=1, SLOW_QUERY_MS=0)
+    def test_slow_query(self):
+        """
+        Test queries above SLOW_QUERY_MS are reported with their view
+        """
+        with self.assertLogs("apps.monitoring.inspection", "WARNING") as logs:
+            response = self.client.get(f"/api/loans/{self.loan.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Slow query", logs.output[0])
+        # Parameters are not logged
+        self.assertNotIn(self.token.key, "".join(logs.output))
+
+        findings = QueryFinding.objects.filter(endpoint="GET loan-detail")
+        self.assertTrue(findings.exists())
+        self.assertEqual(
+            set(findings.values_list("kind", "view")),
+            {(QueryFindingKind.SLOW, "LoanViewSet.retrieve")},
+        )
+
+        out = StringIO()
+        call_command("query_report", "--endpoint", "loan-detail", stdout=out)
+        self.assertIn("GET loan-detail (LoanViewSet.retrieve)", out.getvalue())
+        self.assertIn("slow: 1 queries", out.getvalue())
+
+        call_command("query_report", "--clear", stdout=StringIO())
+        self.assertFalse(QueryFinding.objects.exists())
+
+    def request(self, method, path):
+        request = getattr(RequestFactory(), method.lower())(path)
+        request.resolver_match = resolve(path)
+        return request
+
+
+class RequestProfilingTestCase(APITestCase):
+    def setUp(self):
+        profile_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(profile_dir.cleanup)
+        settings = override_settings(PROFILE_DIR=profile_dir.name, PROFILE_RETENTION=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.profile_dir = profile_dir.name
+
+        self.admin = User.objects.create_superuser(username="admin")
+        self.admin_token = Token.objects.create(user=self.admin)
+        self.user = User.objects.create_user(username="user")
+        self.user_token = Token.objects.create(user=self.user)
+        for _ in range(2):
+            Loan.objects.create(user=self.user, amount=10000, term=3)
+
+    def get(self, path, token, **extra):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+        return self.client.get(path, **extra)
+
+    def test_profile(self):
+        """
+        Test staff requests with an X-Profile header are profiled
+        """
+        response = self.get(
+            "/api/loans/?all=true", self.admin_token, HTTP_X_PROFILE="1"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        profile_id = response[PROFILE_ID_HEADER]
+
+        response = self.get(f"/api/profiles/{profile_id}/", self.admin_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("attachment", response["Content-Disposition"])
+        report = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(report["view"], "LoanViewSet.list")
+        self.assertEqual(report["path"], "/api/loans/")
+        self.assertEqual(report["status"], 200)
+        self.assertIn("loan_representations", report["call_tree"])
+        self.assertEqual(report["queries_count"], len(report["queries"]))
+        self.assertTrue(report["queries"])
+        self.assertEqual(
+            [query["start_ms"] for query in report["queries"]],
+            sorted(query["start_ms"] for query in report["queries"]),
+        )
+
+        for stats in ("true", "1", "yes"):
+            response = self.get(
+                f"/api/profiles/{profile_id}/?stats={stats}", self.admin_token
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                response["Content-Disposition"],
+                f'attachment; filename="{profile_id}.prof"',
+            )
+        response = self.get(f"/api/profiles/{profile_id}/?stats=0", self.admin_token)
+        self.assertEqual(
+            response["Content-Disposition"],
+            f'attachment; filename="{profile_id}.json"',
+        )
+        response = self.get(
+            f"/api/profiles/{profile_id}/?stats=maybe", self.admin_token
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_not_profiled(self):
+        """
+        Test requests without a true header, or of non staff users, are not profiled
+        """
+        response = self.get("/api/loans/", self.admin_token)
+        self.assertFalse(response.has_header(PROFILE_ID_HEADER))
+        response = self.get("/api/loans/", self.user_token, HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header(PROFILE_ID_HEADER))
+        for value in ("0", "", "false"):
+            response = self.get("/api/loans/", self.admin_token, HTTP_X_PROFILE=value)
+            self.assertFalse(response.has_header(PROFILE_ID_HEADER))
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+    def test_profiles(self):
+        """
+        Test profiles are listed to staff users only, oldest dropped
+        """
+        loan = Loan.objects.first()
+        profile_ids = [
+            self.get(path, self.admin_token, HTTP_X_PROFILE="1")[PROFILE_ID_HEADER]
+            for path in ("/api/loans/", f"/api/loans/{loan.id}/", "/api/loans/missing/")
+        ]
+        self.assertEqual(len(os.listdir(self.profile_dir)), 4)
+
+        response = self.get("/api/profiles/", self.admin_token)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(profile["id"], profile["status"]) for profile in response.data],
+            [(profile_ids[2], 404), (profile_ids[1], 200)],
+        )
+        self.assertNotIn("call_tree", response.data[0])
+
+        response = self.get(f"/api/profiles/{profile_ids[0]}/", self.admin_token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.get("/api/profiles/..%2Fsecret/", self.admin_token)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        for path in ("/api/profiles/", f"/api/profiles/{profile_ids[2]}/"):
+            response = self.get(path, self.user_token)
+            self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from apps.monitoring import views
+
+urlpatterns = [
+    # Prometheus request metrics
+    path("metrics/", views.metrics, name="metrics"),
+    # Request profiles, see apps.monitoring.profiling
+    path("api/profiles/", views.ProfileListView.as_view(), name="profile-list"),
+    path(
+        "api/profiles/<str:profile_id>/",
+        views.ProfileDownloadView.as_view(),
+        name="profile-download",
+    ),
+]
@@ -0,0 +1,84 @@
+import json
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from apps.monitoring.metrics import registry
+from apps.monitoring.profiling import PROFILE_ID, list_profiles, profile_path
+from apps.monitoring.serializers import (
+    ProfileDownloadQuerySerializer,
+    ProfileSerializer,
+)
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def metrics(request):
+    """
+    Request metrics of this process in the Prometheus text format.
+
+    Requires `Authorization: Bearer <METRICS_TOKEN>`, denied when METRICS_TOKEN
+    is not set.
+    """
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+class ProfileListView(APIView):
+    """
+    Stored request profiles, newest first, see apps.monitoring.profiling.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses=ProfileSerializer(many=True))
+    def get(self, request):
+        profiles = []
+        for profile_id in list_profiles():
+            try:
+                with open(profile_path(profile_id, "json")) as report_file:
+                    report = json.load(report_file)
+            except FileNotFoundError:
+                # Dropped by a newer profile
+                continue
+            profiles.append(report)
+        # The call tree and queries are left to downloads
+        return Response(data=ProfileSerializer(profiles, many=True).data)
+
+
+class ProfileDownloadView(APIView):
+    """
+    Download a request profile: the JSON report (call tree and SQL timeline),
+    or the cProfile stats with `?stats=true`.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        parameters=[ProfileDownloadQuerySerializer],
+        responses={(200, "application/octet-stream"): OpenApiTypes.BINARY},
+    )
+    def get(self, request, profile_id):
+        query_serializer = ProfileDownloadQuerySerializer(data=request.query_params)
+        query_serializer.is_valid(raise_exception=True)
+        stats = query_serializer.validated_data.get("stats", False)
+
+        extension = "prof" if stats else "json"
+        if not PROFILE_ID.match(profile_id):
+            raise Http404
+        try:
+            profile_file = open(profile_path(profile_id, extension), "rb")
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(
+            profile_file, as_attachment=True, filename=f"{profile_id}.{extension}"
+        )
@@ -0,0 +1,75 @@
+"""
+Portfolio analytics benchmark.
+
+Seeds a portfolio approved `--weeks` weeks ago, marks its unpaid loan terms
+past due overdue (sweep_overdue) and reports the latency and query count of the
+analytics endpoint.
+
+    $ python -m benchmarks.analytics --loans 1000000 --terms 20
+"""
+
+from datetime import timedelta
+from io import StringIO
+from statistics import mean
+
+from benchmarks.utils import (
+    argument_parser,
+    count_queries,
+    report,
+    seed_portfolio,
+    setup,
+    test_database,
+    timer,
+)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--loans", type=int, default=1000000)
+    parser.add_argument("--terms", type=int, default=20)
+    parser.add_argument("--weeks", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=5)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.utils import timezone
+    from rest_framework.test import APIClient
+
+    with test_database(args.keepdb):
+        with timer() as seeding:
+            user = seed_portfolio(
+                args.loans,
+                args.terms,
+                approved_date=timezone.now() - timedelta(weeks=args.weeks),
+            )
+        with timer() as sweep:
+            call_command("sweep_overdue", stdout=StringIO())
+
+        client = APIClient()
+        client.force_authenticate(user)
+
+        latencies = []
+        with count_queries(connection) as queries:
+            for _ in range(args.requests):
+                with timer() as elapsed:
+                    response = client.get("/api/loans/analytics/")
+                assert response.status_code == 200, response.status_code
+                latencies.append(elapsed["seconds"])
+
+        report(
+            f"Portfolio analytics ({args.loans} loans x {args.terms} terms)",
+            [
+                ("seeding seconds", f"{seeding['seconds']:.2f}"),
+                ("sweep seconds", f"{sweep['seconds']:.2f}"),
+                ("queries/request", queries["queries"] / args.requests),
+                ("mean seconds", f"{mean(latencies):.3f}"),
+                ("max seconds", f"{max(latencies):.3f}"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
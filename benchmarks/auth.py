@@ -0,0 +1,71 @@
+"""
+Token authentication benchmark.
+
+Compares queries per request and latency of GET /api/loans/{id}/ with the
+default TokenAuthentication and with CachedTokenAuthentication.
+
+    $ python -m benchmarks.auth --requests 2000
+"""
+
+from statistics import mean
+
+from benchmarks.utils import (
+    argument_parser,
+    count_queries,
+    report,
+    setup,
+    test_database,
+    timer,
+)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.contrib.auth.models import User
+    from django.core.cache import cache
+    from django.db import connection
+    from rest_framework.authentication import TokenAuthentication
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    from apps.accounts.authentication import CachedTokenAuthentication
+    from apps.loans.models import Loan
+    from apps.loans.views import LoanViewSet
+
+    with test_database(args.keepdb):
+        user = User.objects.create_user(username="benchmark")
+        token = Token.objects.create(user=user)
+        loan = Loan.objects.create(user=user, amount=10000, term=12)
+
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+        rows = []
+        for authentication_class in (TokenAuthentication, CachedTokenAuthentication):
+            LoanViewSet.authentication_classes = (authentication_class,)
+            cache.clear()
+
+            latencies = []
+            with count_queries(connection) as queries:
+                for _ in range(args.requests):
+                    with timer() as elapsed:
+                        response = client.get(f"/api/loans/{loan.id}/")
+                    assert response.status_code == 200, response.status_code
+                    latencies.append(elapsed["seconds"])
+
+            name = authentication_class.__name__
+            rows += [
+                (f"{name} queries/request", queries["queries"] / args.requests),
+                (f"{name} mean ms", f"{mean(latencies) * 1000:.3f}"),
+            ]
+
+        report(f"Loan detail ({args.requests} requests)", rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+API endpoints benchmark.
+
+Seeds a portfolio of `--loans` loans x `--terms` loan terms, sends
+`--requests` requests to each endpoint (login, register, loan create, list
+own and all loans, retrieve, approve and repayment) and reports throughput,
+p50 / p95 / p99 latency and queries per request.
+
+Requests go through the in-process test client, or over HTTP to a live
+server thread on the same test database with `--live-server`. Results are
+written as JSON to `--output`, `--compare` reports changes from a previous
+results file.
+
+    $ python -m benchmarks.endpoints --loans 10000 --output results.json
+    $ python -m benchmarks.endpoints --compare results.json --endpoints list,retrieve
+"""
+
+import json
+import platform
+import subprocess
+import threading
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from statistics import quantiles
+
+from benchmarks.utils import (
+    argument_parser,
+    report,
+    seed_portfolio,
+    setup,
+    test_database,
+    timer,
+)
+
+ENDPOINTS = (
+    "login",
+    "register",
+    "list",
+    "list_all",
+    "retrieve",
+    "create",
+    "approve",
+    "repayment",
+)
+PASSWORD = "benchmark@@password"
+
+
+class QueryCounter:
+    """
+    Database execute wrapper counting queries of every thread's connection.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self.lock:
+            self.queries += 1
+        return execute(sql, params, many, context)
+
+    def install(self):
+        from django.db import connections
+        from django.db.backends.signals import connection_created
+
+        def on_connection_created(sender, connection, **kwargs):
+            if self not in connection.execute_wrappers:
+                connection.execute_wrappers.append(self)
+
+        for connection in connections.all():
+            on_connection_created(None, connection)
+        connection_created.connect(on_connection_created, weak=False)
+
+
+class InProcessClient:
+    """
+    Requests through the WSGI handler, in the benchmark thread.
+    """
+
+    def __init__(self):
+        from rest_framework.test import APIClient
+
+        self.http = APIClient()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {"HTTP_AUTHORIZATION": f"Token {token}"} if token else {}
+        response = getattr(self.http, method)(path, data, format="json", **headers)
+        return response.status_code, response.content
+
+
+class LiveServerClient:
+    """
+    Requests over HTTP to a live server thread on the test database.
+    """
+
+    def __init__(self):
+        from django.conf import settings
+        from django.db import connections
+        from django.test.testcases import LiveServerThread, _StaticFilesHandler
+        from django.test.utils import override_settings
+
+        self.settings = override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "localhost"]
+        )
+        self.settings.enable()
+
+        # In memory SQLite databases are shared with the server thread
+        connections_override = {}
+        for connection in connections.all():
+            if connection.vendor == "sqlite" and connection.is_in_memory_db():
+                connection.inc_thread_sharing()
+                connections_override[connection.alias] = connection
+
+        self.server = LiveServerThread(
+            "localhost", _StaticFilesHandler, connections_override
+        )
+        self.server.daemon = True
+        self.server.start()
+        self.server.is_ready.wait()
+        if self.server.error:
+            raise self.server.error
+
+    def request(self, method, path, data=None, token=None):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Token {token}"
+        body = json.dumps(data) if data is not None else None
+
+        http = HTTPConnection("localhost", self.server.port)
+        try:
+            http.request(method.upper(), path, body=body, headers=headers)
+            response = http.getresponse()
+            return response.status, response.read()
+        finally:
+            http.close()
+
+    def close(self):
+        self.server.terminate()
+        self.settings.disable()
+
+
+def prepare(args):
+    """
+    Seed the portfolio and yield (endpoint, requests) pairs, requests are
+    (method, path, data, token, expected status) tuples.
+    """
+    from django.contrib.auth.models import User
+    from rest_framework.authtoken.models import Token
+
+    from apps.loans.approvals import approve_loans
+    from apps.loans.models import Loan
+
+    staff = seed_portfolio(args.loans, args.terms)
+    staff_token = Token.objects.create(user=staff).key
+    borrower = User.objects.create_user(username="borrower", password=PASSWORD)
+    borrower_token = Token.objects.create(user=borrower).key
+    seed_portfolio(args.own_loans, args.terms, user=borrower)
+    loan_ids = list(Loan.objects.filter(user=staff).values_list("id", flat=True))
+
+    def pending_loans():
+        return Loan.objects.bulk_create(
+            Loan(user=borrower, amount=1000 * args.terms, term=args.terms)
+            for _ in range(args.requests)
+        )
+
+    def requests(endpoint):
+        n = range(args.requests)
+        if endpoint == "login":
+            data = {"username": "borrower", "password": PASSWORD}
+            return [("post", "/api/auth/login/", data, None, 200) for _ in n]
+        if endpoint == "register":
+            return [
+                (
+                    "post",
+                    "/api/auth/register/",
+                    {
+                        "username": f"user{i}",
+                        "password": PASSWORD,
+                        "email": f"user{i}@example.com",
+                        "first_name": "First",
+                        "last_name": "Last",
+                    },
+                    None,
+                    201,
+                )
+                for i in n
+            ]
+        if endpoint == "list":
+            return [("get", "/api/loans/", None, borrower_token, 200) for _ in n]
+        if endpoint == "list_all":
+            path = "/api/loans/?all=true"
+            return [("get", path, None, staff_token, 200) for _ in n]
+        if endpoint == "retrieve":
+            paths = [f"/api/loans/{loan_ids[i % len(loan_ids)]}/" for i in n]
+            return [("get", path, None, staff_token, 200) for path in paths]
+        if endpoint == "create":
+            data = {"amount": 1000 * args.terms, "term": args.terms}
+            return [("post", "/api/loans/", data, borrower_token, 201) for _ in n]
+        if endpoint == "approve":
+            return [
+                (
+                    "patch",
+                    f"/api/loans/{loan.pk}/approve-loan/",
+                    {"state": "approved"},
+                    staff_token,
+                    200,
+                )
+                for loan in pending_loans()
+            ]
+        if endpoint == "repayment":
+            loans = pending_loans()
+            approve_loans([loan.pk for loan in loans], approved_by=staff)
+            return [
+                (
+                    "post",
+                    f"/api/loans/{loan.pk}/loan-repayment/",
+                    {"amount": 1000},
+                    borrower_token,
+                    200,
+                )
+                for loan in loans
+            ]
+
+    for endpoint in args.endpoints:
+        yield endpoint, requests(endpoint)
+
+
+def run(client, counter, requests):
+    latencies = []
+    queries = counter.queries
+    with timer() as total:
+        for method, path, data, token, expected in requests:
+            with timer() as elapsed:
+                status, content = client.request(method, path, data, token)
+            assert status == expected, (path, status, content[:200])
+            latencies.append(elapsed["seconds"])
+
+    percentiles = quantiles(latencies, n=100)
+    return {
+        "requests": len(latencies),
+        "requests_per_sec": round(len(latencies) / total["seconds"], 1),
+        "p50_ms": round(percentiles[49] * 1000, 3),
+        "p95_ms": round(percentiles[94] * 1000, 3),
+        "p99_ms": round(percentiles[98] * 1000, 3),
+        "queries_per_request": round((counter.queries - queries) / len(latencies), 2),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ("git", "rev-parse", "--short", "HEAD"),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def change(before, after):
+    if not before:
+        return ""
+    return f" ({(after - before) / before:+.0%})"
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--loans", type=int, default=1000)
+    parser.add_argument("--terms", type=int, default=12)
+    parser.add_argument("--own-loans", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument(
+        "--endpoints",
+        type=lambda value: value.split(","),
+        default=ENDPOINTS,
+        help=f"comma separated, of {', '.join(ENDPOINTS)}",
+    )
+    parser.add_argument("--live-server", action="store_true")
+    parser.add_argument("--output", help="JSON results file")
+    parser.add_argument("--compare", help="JSON results file of a previous run")
+    args = parser.parse_args()
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    if args.requests < 2:
+        parser.error("--requests should be at least 2")
+
+    setup()
+
+    import django
+    from django.db import connection
+
+    previous = {}
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)["endpoints"]
+
+    with test_database(args.keepdb):
+        counter = QueryCounter()
+        counter.install()
+        client = LiveServerClient() if args.live_server else InProcessClient()
+
+        results = {}
+        try:
+            for endpoint, requests in prepare(args):
+                results[endpoint] = run(client, counter, requests)
+        finally:
+            if args.live_server:
+                client.close()
+
+        output = {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "client": "live-server" if args.live_server else "in-process",
+            "loans": args.loans,
+            "terms": args.terms,
+            "endpoints": results,
+        }
+
+    rows = []
+    for endpoint, result in results.items():
+        before = previous.get(endpoint, {})
+        rows += [
+            (
+                f"{endpoint} {name}",
+                f"{value}{change(before.get(name), value)}",
+            )
+            for name, value in result.items()
+            if name != "requests"
+        ]
+    report(
+        f"API endpoints ({args.loans} loans x {args.terms} terms, "
+        f"{args.requests} requests per endpoint, {output['client']} client)",
+        rows,
+    )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(output, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
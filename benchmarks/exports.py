@@ -0,0 +1,62 @@
+"""
+Loan export benchmark.
+
+Streams every loan term of a seeded portfolio through the export endpoint and
+reports rows/sec and peak RSS. Peak RSS should not grow with the export size.
+
+    $ python -m benchmarks.exports --loans 20000 --terms 50 --output csv
+"""
+
+from benchmarks.utils import (
+    argument_parser,
+    peak_rss_mb,
+    report,
+    seed_portfolio,
+    setup,
+    test_database,
+    timer,
+)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--loans", type=int, default=20000)
+    parser.add_argument("--terms", type=int, default=50)
+    parser.add_argument("--output", choices=("csv", "ndjson"), default="csv")
+    args = parser.parse_args()
+
+    setup()
+
+    from rest_framework.test import APIClient
+
+    with test_database(args.keepdb):
+        with timer() as seeding:
+            user = seed_portfolio(args.loans, args.terms)
+
+        client = APIClient()
+        client.force_authenticate(user)
+
+        rss_before = peak_rss_mb()
+        rows = size = 0
+        with timer() as elapsed:
+            response = client.get(f"/api/loans/export/?output={args.output}")
+            for chunk in response.streaming_content:
+                rows += chunk.count(b"\n")
+                size += len(chunk)
+
+        report(
+            f"Loan export ({args.output})",
+            [
+                ("seeding seconds", f"{seeding['seconds']:.2f}"),
+                ("rows", rows),
+                ("megabytes", f"{size / 1024 / 1024:.1f}"),
+                ("seconds", f"{elapsed['seconds']:.2f}"),
+                ("rows/sec", f"{rows / elapsed['seconds']:.0f}"),
+                ("peak RSS before export MB", f"{rss_before:.1f}"),
+                ("peak RSS after export MB", f"{peak_rss_mb():.1f}"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Sync (WSGI) vs async (ASGI) loan read endpoints load test.
+
+Runs in one process: `--clients` concurrent clients send `--requests`
+requests, through the WSGI handler served by `--threads` worker threads, and
+through the ASGI handler (event loop) with the same number of threads for
+database work. Reports throughput and p50 / p99 latency, waiting for a free
+worker included. `--db-latency` adds a delay to every query, as a remote or
+busy database would.
+
+    $ python -m benchmarks.load --endpoint list --clients 64 --threads 4
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+
+from benchmarks.utils import (
+    argument_parser,
+    report,
+    seed_portfolio,
+    setup,
+    test_database,
+    timer,
+)
+
+PATHS = {
+    "list": ("/api/loans/?terms=false", "/api/async/loans/?terms=false"),
+    "detail": ("/api/loans/{id}/", "/api/async/loans/{id}/"),
+    "terms": ("/api/loans/{id}/terms/", "/api/async/loans/{id}/terms/"),
+}
+
+
+def add_db_latency(seconds):
+    import time
+
+    from django.db.backends.signals import connection_created
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(seconds)
+        return execute(sql, params, many, context)
+
+    def on_connection_created(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(on_connection_created, weak=False)
+
+
+def run_wsgi(path, authorization, args):
+    from django.test import Client
+
+    local = threading.local()
+    requests = iter(range(args.requests))
+    lock = threading.Lock()
+    latencies = []
+
+    def handle():
+        # Runs in a worker thread, requests are served first in, first out
+        if not hasattr(local, "http"):
+            local.http = Client()
+        return local.http.get(path, HTTP_AUTHORIZATION=authorization)
+
+    def client(workers):
+        while True:
+            with lock:
+                if next(requests, None) is None:
+                    return
+            with timer() as elapsed:
+                response = workers.submit(handle).result()
+            assert response.status_code == 200, response.status_code
+            latencies.append(elapsed["seconds"])
+
+    with timer() as total:
+        with ThreadPoolExecutor(max_workers=args.threads) as workers:
+            with ThreadPoolExecutor(max_workers=args.clients) as clients:
+                futures = [clients.submit(client, workers) for _ in range(args.clients)]
+                for future in futures:
+                    future.result()
+    return latencies, total["seconds"]
+
+
+def run_asgi(path, authorization, args):
+    from django.test import AsyncClient
+
+    latencies = []
+
+    async def client(http, requests):
+        for _ in requests:
+            with timer() as elapsed:
+                response = await http.get(path, AUTHORIZATION=authorization)
+            assert response.status_code == 200, response.status_code
+            latencies.append(elapsed["seconds"])
+
+    async def main():
+        # Same number of threads for database work as WSGI worker threads
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=args.threads)
+        )
+        http = AsyncClient()
+        requests = iter(range(args.requests))
+        await asyncio.gather(*(client(http, requests) for _ in range(args.clients)))
+
+    with timer() as total:
+        asyncio.run(main())
+    return latencies, total["seconds"]
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--endpoint", choices=tuple(PATHS), default="list")
+    parser.add_argument("--loans", type=int, default=50)
+    parser.add_argument("--terms", type=int, default=12)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--db-latency", type=float, default=0, help="milliseconds")
+    args = parser.parse_args()
+
+    setup()
+
+    from rest_framework.authtoken.models import Token
+
+    from apps.loans.models import Loan
+
+    with test_database(args.keepdb):
+        user = seed_portfolio(args.loans, args.terms)
+        token = Token.objects.create(user=user)
+        authorization = f"Token {token.key}"
+        loan_id = Loan.objects.values_list("id", flat=True).first()
+        if args.db_latency:
+            add_db_latency(args.db_latency / 1000)
+
+        rows = []
+        for name, run, path in zip(
+            ("WSGI", "ASGI"), (run_wsgi, run_asgi), PATHS[args.endpoint]
+        ):
+            latencies, seconds = run(path.format(id=loan_id), authorization, args)
+            percentiles = quantiles(latencies, n=100)
+            rows += [
+                (f"{name} requests/sec", f"{len(latencies) / seconds:.0f}"),
+                (f"{name} p50 ms", f"{percentiles[49] * 1000:.1f}"),
+                (f"{name} p99 ms", f"{percentiles[98] * 1000:.1f}"),
+            ]
+
+        report(
+            f"Loan {args.endpoint} load ({args.requests} requests, "
+            f"{args.clients} clients, {args.threads} threads, "
+            f"{args.db_latency:g} ms query latency)",
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+JSON renderer and parser benchmark.
+
+Encodes a loan list page (50 loans x 52 loan terms by default) with
+JSONRenderer (stdlib json) and FastJSONRenderer (orjson), parses it back with
+JSONParser and FastJSONParser, and reports times and bytes/sec.
+
+    $ python -m benchmarks.renderers --loans 50 --terms 52 --repeat 200
+"""
+
+from io import BytesIO
+
+from benchmarks.utils import (
+    argument_parser,
+    report,
+    seed_portfolio,
+    setup,
+    test_database,
+    timer,
+)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--loans", type=int, default=50)
+    parser.add_argument("--terms", type=int, default=52)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    setup()
+
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+
+    from apps.loans.models import Loan
+    from apps.loans.representations import LOAN_COLUMNS, loan_representations
+    from mini_aspire.parsers import FastJSONParser
+    from mini_aspire.renderers import FastJSONRenderer, orjson
+
+    if orjson is None:
+        print("orjson is not installed, FastJSONRenderer falls back to stdlib json")
+
+    with test_database(args.keepdb):
+        seed_portfolio(args.loans, args.terms)
+        page = {
+            "count": args.loans,
+            "next": None,
+            "previous": None,
+            "results": loan_representations(Loan.objects.values(*LOAN_COLUMNS)),
+        }
+
+    rows = []
+    for renderer, json_parser in (
+        (JSONRenderer(), JSONParser()),
+        (FastJSONRenderer(), FastJSONParser()),
+    ):
+        with timer() as encoding:
+            for _ in range(args.repeat):
+                body = renderer.render(page)
+        with timer() as decoding:
+            for _ in range(args.repeat):
+                json_parser.parse(BytesIO(body))
+
+        size = len(body) * args.repeat
+        name = type(renderer).__name__
+        rows += [
+            (f"{name} ms/encode", f"{encoding['seconds'] * 1000 / args.repeat:.2f}"),
+            (f"{name} MB/sec", f"{size / encoding['seconds'] / 1024 / 1024:.1f}"),
+            (
+                f"{type(json_parser).__name__} ms/parse",
+                f"{decoding['seconds'] * 1000 / args.repeat:.2f}",
+            ),
+        ]
+
+    report(
+        f"JSON rendering ({args.loans} loans x {args.terms} terms, "
+        f"{len(body) / 1024:.0f} KB page)",
+        rows,
+    )
+
+
+if __name__ == "__main__":
+    main()
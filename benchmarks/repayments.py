@@ -0,0 +1,106 @@
+"""
+Concurrent loan repayment benchmark.
+
+Many threads pay the same loans at once, every loan term has to be paid
+exactly once and every loan has to be closed.
+
+    $ python -m benchmarks.repayments --loans 100 --terms 52 --threads 16
+"""
+
+from datetime import timedelta
+from queue import Empty, Queue
+from threading import Thread
+
+from benchmarks.utils import argument_parser, report, setup, test_database, timer
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--loans", type=int, default=100)
+    parser.add_argument("--terms", type=int, default=52)
+    parser.add_argument("--threads", type=int, default=16)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.utils import timezone
+
+    from apps.loans.choices import LoanState, LoanTermStatus
+    from apps.loans.models import Loan, LoanTerm
+    from apps.loans.repayments import RepaymentError, repay_loan
+
+    with test_database(args.keepdb):
+        threads = args.threads
+        if not connection.features.has_select_for_update:
+            # SQLite has no row locks and rejects concurrent writers
+            print(f"{connection.vendor} has no row locks, running with 1 thread")
+            threads = 1
+
+        user = User.objects.create_user(username="benchmark")
+        now = timezone.now()
+        loans = Loan.objects.bulk_create(
+            Loan(user=user, amount=100 * args.terms, term=args.terms)
+            for _ in range(args.loans)
+        )
+        Loan.objects.update(state=LoanState.APPROVED, approved_date=now)
+        LoanTerm.objects.bulk_create(
+            (
+                LoanTerm(loan=loan, amount=100, due_date=now + timedelta(weeks=i))
+                for loan in loans
+                for i in range(1, args.terms + 1)
+            ),
+            batch_size=1000,
+        )
+
+        # All threads pay the same loan, one loan after another
+        payments = Queue()
+        for loan in loans:
+            for _ in range(args.terms):
+                payments.put(loan.pk)
+
+        errors = []
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        loan_id = payments.get_nowait()
+                    except Empty:
+                        return
+                    try:
+                        repay_loan(loan_id, 100)
+                    except RepaymentError as e:
+                        errors.append(str(e))
+            finally:
+                connection.close()
+
+        workers = [Thread(target=worker) for _ in range(threads)]
+        with timer() as elapsed:
+            for thread in workers:
+                thread.start()
+            for thread in workers:
+                thread.join()
+
+        repayments = args.loans * args.terms
+        paid_terms = LoanTerm.objects.filter(status=LoanTermStatus.PAID).count()
+        paid_loans = Loan.objects.filter(state=LoanState.PAID).count()
+
+        report(
+            "Loan repayments",
+            [
+                ("vendor", connection.vendor),
+                ("threads", threads),
+                ("repayments", repayments),
+                ("errors", len(errors)),
+                ("seconds", f"{elapsed['seconds']:.2f}"),
+                ("repayments/sec", f"{repayments / elapsed['seconds']:.0f}"),
+                ("paid terms", f"{paid_terms}/{repayments}"),
+                ("paid loans", f"{paid_loans}/{args.loans}"),
+            ],
+        )
+
+
+if __name__ == "__main__":
+    main()
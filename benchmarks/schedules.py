@@ -0,0 +1,74 @@
+"""
+Loan term schedule benchmark.
+
+Compares the schedule engine to the per term loop formerly used by
+LoanViewSet.approve_loan.
+
+    $ python -m benchmarks.schedules --loans 100000 --terms 52
+"""
+
+import random
+from datetime import datetime, timedelta, timezone
+
+from benchmarks.utils import argument_parser, report, setup, timer
+
+
+def legacy_schedule(loan_amount, loan_term, start):
+    calculate_term_amount = round(loan_amount / loan_term, 2)
+    final_amount_diff = round(loan_amount - (calculate_term_amount * loan_term), 2)
+
+    schedule = list()
+    due_date = start
+    for term in range(loan_term):
+        if term == (loan_term - 1):
+            calculate_term_amount = calculate_term_amount + final_amount_diff
+        due_date = due_date + timedelta(days=7)
+        schedule.append((calculate_term_amount, due_date))
+    return schedule
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--loans", type=int, default=100000)
+    parser.add_argument("--terms", type=int, default=52)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    setup()
+
+    from apps.loans.schedules import build_schedules, split_amount
+
+    rng = random.Random(args.seed)
+    amounts = [rng.randrange(1000, 1000000, 500) for _ in range(args.loans)]
+    terms = [args.terms] * args.loans
+    start = datetime(2022, 1, 1, tzinfo=timezone.utc)
+    starts = [start + timedelta(seconds=i) for i in range(args.loans)]
+    total = args.loans * args.terms
+
+    with timer() as legacy:
+        for amount, term in zip(amounts, terms):
+            legacy_schedule(amount, term, start)
+
+    split_amount.cache_clear()
+    with timer() as shared:
+        build_schedules(amounts, terms, start)
+
+    split_amount.cache_clear()
+    with timer() as per_loan:
+        build_schedules(amounts, terms, starts)
+
+    report(
+        f"Loan term schedules ({args.loans} loans x {args.terms} terms)",
+        [
+            ("legacy loop seconds", f"{legacy['seconds']:.2f}"),
+            ("legacy loop terms/sec", f"{total / legacy['seconds']:.0f}"),
+            ("engine shared start seconds", f"{shared['seconds']:.2f}"),
+            ("engine shared start terms/sec", f"{total / shared['seconds']:.0f}"),
+            ("engine per loan start seconds", f"{per_loan['seconds']:.2f}"),
+            ("engine per loan start terms/sec", f"{total / per_loan['seconds']:.0f}"),
+        ],
+    )
+
+
+if __name__ == "__main__":
+    main()
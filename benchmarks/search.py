@@ -0,0 +1,153 @@
+"""
+Loan search benchmark, search index against icontains.
+
+Seeds synthetic users and loans (as `manage.py seed_loans`, without the loan
+terms search does not read) and times the first
+page (50 loans) and the count of loans found for a few searches, with the
+search index (apps.loans.search) and with icontains lookups across the loan
+-> user join, as the admin searched before.
+
+    $ python -m benchmarks.search --users 100000 --loans 1000000
+"""
+
+from functools import reduce
+from operator import and_, or_
+from statistics import median
+
+from benchmarks.utils import argument_parser, report, setup, test_database, timer
+
+ICONTAINS_FIELDS = (
+    "id",
+    "user__username",
+    "user__first_name",
+    "user__last_name",
+    "user__email",
+)
+PAGE_SIZE = 50
+
+
+def icontains_search(queryset, query):
+    from django.db.models import Q
+
+    words = query.split()
+    if not words:
+        return queryset
+    return queryset.filter(
+        reduce(
+            and_,
+            (
+                reduce(
+                    or_,
+                    (Q(**{f"{field}__icontains": word}) for field in ICONTAINS_FIELDS),
+                )
+                for word in words
+            ),
+        )
+    )
+
+
+def seed(users, loans, seed, chunk_size):
+    """
+    Create users and their loans, without loan terms.
+    """
+    import random
+
+    from django.db import transaction
+    from django.utils import timezone
+
+    from apps.loans.models import Loan
+    from apps.loans.seeding import LOAN_FIELDS, generate_loan, insert_rows, seed_users
+
+    rng = random.Random(seed)
+    now = timezone.now()
+    staff_id, user_ids = seed_users(rng, users, chunk_size, "seed", now)
+    for offset in range(0, loans, chunk_size):
+        rows = [
+            # A few users hold most loans, as seed_loans
+            generate_loan(
+                rng,
+                user_ids[int(len(user_ids) * rng.random() ** 3)],
+                staff_id,
+                now,
+                365,
+            )[0]
+            for _ in range(min(chunk_size, loans - offset))
+        ]
+        with transaction.atomic():
+            insert_rows(Loan, LOAN_FIELDS, rows)
+
+
+def measure(queryset, repeat):
+    """
+    Median seconds of the first page and of the count, and the count.
+    """
+    pages, counts = [], []
+    for _ in range(repeat):
+        with timer() as elapsed:
+            list(queryset[:PAGE_SIZE])
+        pages.append(elapsed["seconds"])
+        with timer() as elapsed:
+            count = queryset.count()
+        counts.append(elapsed["seconds"])
+    return median(pages), median(counts), count
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--loans", type=int, default=1000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.db import connection
+
+    from apps.loans.models import Loan
+    from apps.loans.search import search_loans
+    from apps.loans.seeding import SEED_CHUNK_SIZE
+
+    with test_database(args.keepdb):
+        if not Loan.objects.exists():
+            with timer() as seeding:
+                seed(args.users, args.loans, args.seed, SEED_CHUNK_SIZE)
+            print(f"Seeded in {seeding['seconds']:.1f} seconds")
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+        loan_id = Loan.objects.order_by("created").values_list("id", flat=True)[
+            args.loans // 2
+        ]
+        searches = (
+            ("username", f"seed{args.users // 2:08d}"),
+            ("username part", f"{args.users // 3:08d}"[-5:]),
+            ("first and last name", "alex tan"),
+            ("loan id prefix", loan_id.hex[:8]),
+            ("no match", "nomatch"),
+        )
+
+        loans = Loan.objects.order_by("created", "id")
+        rows = []
+        for label, query in searches:
+            index = measure(search_loans(loans, query), args.repeat)
+            icontains = measure(icontains_search(loans, query), args.repeat)
+            assert index[2] == icontains[2], (query, index[2], icontains[2])
+            rows += [
+                (
+                    f"{label} ({query!r}, {index[2]} loans)",
+                    f"page {index[0] * 1000:.1f} ms vs {icontains[0] * 1000:.1f} ms, "
+                    f"count {index[1] * 1000:.1f} ms vs "
+                    f"{icontains[1] * 1000:.1f} ms",
+                ),
+            ]
+
+        report(
+            f"Loan search, index vs icontains ({args.loans} loans, "
+            f"{args.users} users, {connection.vendor})",
+            rows,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Loan read path benchmark.
+
+Loads and serializes pages of a seeded portfolio with LoanSerializer over
+model instances (prefetched loan terms) and with the values() based read
+path used by the list and retrieve endpoints, and reports loans/sec.
+
+    $ python -m benchmarks.serializers --loans 5000 --terms 12
+"""
+
+from benchmarks.utils import (
+    argument_parser,
+    report,
+    seed_portfolio,
+    setup,
+    test_database,
+    timer,
+)
+
+
+def main():
+    parser = argument_parser(__doc__)
+    parser.add_argument("--loans", type=int, default=5000)
+    parser.add_argument("--terms", type=int, default=12)
+    parser.add_argument("--page-size", type=int, default=50)
+    args = parser.parse_args()
+
+    setup()
+
+    from django.db.models import Prefetch
+
+    from apps.loans.models import Loan, LoanTerm
+    from apps.loans.representations import LOAN_COLUMNS, loan_representations
+    from apps.loans.serializers import LoanListSerializer, LoanSerializer
+
+    def pages(queryset):
+        for offset in range(0, args.loans, args.page_size):
+            yield queryset[offset : offset + args.page_size]
+
+    with test_database(args.keepdb):
+        seed_portfolio(args.loans, args.terms)
+        loans = Loan.objects.order_by("created", "id")
+        instances = loans.prefetch_related(
+            Prefetch("loan_term", queryset=LoanTerm.objects.order_by("due_date"))
+        )
+        rows = loans.values(*LOAN_COLUMNS)
+
+        rates = []
+        for terms, serializer_class in (
+            (True, LoanSerializer),
+            (False, LoanListSerializer),
+        ):
+            with timer() as before:
+                for page in pages(instances if terms else loans):
+                    serializer_class(page, many=True).data
+            with timer() as after:
+                for page in pages(rows):
+                    loan_representations(page, terms=terms)
+
+            label = "with loan terms" if terms else "without loan terms"
+            rates += [
+                (
+                    f"{serializer_class.__name__} loans/sec ({label})",
+                    f"{args.loans / before['seconds']:.0f}",
+                ),
+                (
+                    f"read path loans/sec ({label})",
+                    f"{args.loans / after['seconds']:.0f}",
+                ),
+                ("speedup", f"{before['seconds'] / after['seconds']:.1f}x"),
+            ]
+
+        report(
+            f"Loan read path ({args.loans} loans x {args.terms} terms, "
+            f"pages of {args.page_size})",
+            rates,
+        )
+
+
+if __name__ == "__main__":
+    main()
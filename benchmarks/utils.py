@@ -0,0 +1,152 @@
+"""
+Benchmark helpers.
+
+Benchmarks run offline against a throwaway test database created from the
+configured DATABASES settings, development data is never touched.
+"""
+
+import argparse
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mini_aspire.settings")
+    django.setup()
+
+
+def argument_parser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "--keepdb",
+        action="store_true",
+        help="Preserve the test database between runs",
+    )
+    return parser
+
+
+@contextmanager
+def test_database(keepdb=False):
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    setup_test_environment(debug=False)
+    old_config = setup_databases(verbosity=0, interactive=False, keepdb=keepdb)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+@contextmanager
+def timer():
+    """
+    Yield a dict, its "seconds" key is set on exit.
+    """
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return peak / 1024
+
+
+@contextmanager
+def count_queries(connection):
+    """
+    Yield a dict, its "queries" key counts executed queries.
+    """
+    result = {"queries": 0}
+
+    def execute(execute, sql, params, many, context):
+        result["queries"] += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(execute):
+        yield result
+
+
+def report(title, rows):
+    width = max(len(name) for name, _ in rows) + 2
+    print(title)
+    for name, value in rows:
+        print(f"  {name:<{width}} {value}")
+
+
+def seed_portfolio(loans, terms, chunk_size=5000, approved_date=None, user=None):
+    """
+    Create approved loans with weekly loan terms, half of the terms paid.
+
+    Loans are created in chunks, memory does not grow with the portfolio size.
+    Loans belong to user, defaults to a new staff user. Loan terms are due
+    weekly from approved_date, defaults to now. The portfolio summary is
+    rebuilt once seeded.
+    """
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+
+    from apps.loans.choices import LoanState, LoanTermStatus
+    from apps.loans.models import Loan, LoanTerm
+    from apps.loans.schedules import build_schedule
+    from apps.loans.summary import rebuild_summary
+
+    if user is None:
+        user = User.objects.create_user(username="benchmark", is_staff=True)
+    now = timezone.now()
+    approved_date = approved_date or now
+    schedule = build_schedule(1000 * terms, terms, approved_date)
+    paid_terms = terms // 2
+
+    for offset in range(0, loans, chunk_size):
+        batch = Loan.objects.bulk_create(
+            Loan(
+                user=user,
+                amount=1000 * terms,
+                term=terms,
+                state=LoanState.APPROVED,
+                approved_by=user,
+                approved_date=approved_date,
+                outstanding_amount=sum(schedule.amounts[paid_terms:]),
+                paid_terms_count=paid_terms,
+                next_due_date=schedule.due_dates[paid_terms],
+                next_due_amount=schedule.amounts[paid_terms],
+            )
+            for _ in range(min(chunk_size, loans - offset))
+        )
+        LoanTerm.objects.bulk_create(
+            (
+                LoanTerm(
+                    loan=loan,
+                    amount=amount,
+                    due_date=due_date,
+                    status=LoanTermStatus.PAID if paid else LoanTermStatus.PENDING,
+                    paid_amount=amount if paid else 0,
+                    paid_date=now if paid else None,
+                )
+                for loan in batch
+                for i, (amount, due_date) in enumerate(zip(*schedule))
+                for paid in (i < paid_terms,)
+            ),
+            batch_size=1000,
+        )
+    rebuild_summary()
+    return user
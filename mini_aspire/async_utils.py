@@ -0,0 +1,24 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func):
+    """
+    sync_to_async for database work of async views.
+
+    Django 3.2 has no async ORM and runs thread sensitive code in a single
+    shared thread under ASGI, so database work runs in the thread pool instead
+    (thread_sensitive=False). As at the end of a request, the thread's
+    connection is closed or kept for reuse according to CONN_MAX_AGE.
+    """
+
+    @wraps(func)
+    def run(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)
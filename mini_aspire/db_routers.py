@@ -0,0 +1,106 @@
+"""
+Read replica routing for read-only loan traffic.
+
+GET and HEAD requests to views with `replica_reads = True` (LoanViewSet,
+analytics included, and the async loan views) read from the "replica"
+database. Everything else stays on the primary ("default"):
+
+- Writes, and every read after a write in the same request, so a request
+  reads its own writes.
+- Reads inside a transaction on the primary.
+- Authentication reads (users, tokens), a new token is usable right away.
+"""
+
+import asyncio
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+
+# Always read from the primary
+PRIMARY_APP_LABELS = ("auth", "authtoken", "sessions", "contenttypes")
+
+
+class ReplicaRouting:
+    """
+    Routing state of a request, shared by the threads serving it.
+    """
+
+    def __init__(self):
+        self.replica = False
+        self.pinned = False
+
+
+_routing = ContextVar("replica_routing", default=None)
+
+
+def replica_configured():
+    return REPLICA_DB_ALIAS in settings.DATABASES
+
+
+class ReplicaRouter:
+    """
+    Database router sending read-only loan traffic to the replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        routing = _routing.get()
+        if (
+            routing is None
+            or not routing.replica
+            or routing.pinned
+            or not replica_configured()
+            or model._meta.app_label in PRIMARY_APP_LABELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        routing = _routing.get()
+        if routing is not None:
+            # Read your writes, until the end of the request
+            routing.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Same data on both databases
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Marks GET and HEAD requests to replica_reads views for the ReplicaRouter.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the middleware as a coroutine, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _routing.set(ReplicaRouting())
+        try:
+            return self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+    async def __acall__(self, request):
+        token = _routing.set(ReplicaRouting())
+        try:
+            return await self.get_response(request)
+        finally:
+            _routing.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view = getattr(view_func, "cls", view_func)
+        if request.method in ("GET", "HEAD") and getattr(view, "replica_reads", False):
+            _routing.get().replica = True
@@ -0,0 +1,44 @@
+from rest_framework.renderers import JSONRenderer
+
+from apps.monitoring.metrics import timing
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Datetimes are passed to the encoder's default(), so they are formatted as
+# with JSONRenderer; UUIDs, floats, dicts and lists are encoded by orjson
+ORJSON_OPTIONS = orjson and orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer backed by orjson, with the same output for API payloads.
+
+    Falls back to JSONRenderer (stdlib json) when orjson is not installed and
+    for output orjson does not support: indented (browsable API), ASCII only
+    or non-compact JSON. orjson encodes NaN and infinite floats as null.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with timing("render"):
+            return self._render(data, accepted_media_type, renderer_context)
+
+    def _render(self, data, accepted_media_type, renderer_context):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default, option=ORJSON_OPTIONS
+        )
+        # Same as JSONRenderer, output is a strict javascript subset
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(
+            b"\xe2\x80\xa9", b"\\u2029"
+        )
@@ -51,9 +51,12 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "apps.accounts",
     "apps.loans",
+    "apps.monitoring",
 ]
 
 MIDDLEWARE = [
+    # First, the time of other middleware is included
+    "apps.monitoring.middleware.PerformanceMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -101,6 +104,56 @@ DATABASES = {
     }
 }
 
+# Read replica, optional: read-only loan traffic (GET requests to the loan
+# endpoints) is read from it, see mini_aspire.db_routers
+if env("DATABASE_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        "ENGINE": env("DATABASE_REPLICA_ENGINE", DATABASES["default"]["ENGINE"]),
+        "NAME": env("DATABASE_REPLICA_NAME"),
+        "USER": env("DATABASE_REPLICA_USER", DATABASES["default"]["USER"]),
+        "HOST": env("DATABASE_REPLICA_HOST", DATABASES["default"]["HOST"]),
+        "PORT": env("DATABASE_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "PASSWORD": env("DATABASE_REPLICA_PASSWORD", DATABASES["default"]["PASSWORD"]),
+        # Tests read and write the primary test database
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["mini_aspire.db_routers.ReplicaRouter"]
+    MIDDLEWARE.insert(2, "mini_aspire.db_routers.ReplicaRoutingMiddleware")
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": env(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": env("CACHE_LOCATION", ""),
+    }
+}
+
+# Seconds an authenticated token is cached (0 disables it), only with a cache
+# shared by the worker processes, see CachedTokenAuthentication
+AUTH_TOKEN_CACHE_TIMEOUT = int(env("AUTH_TOKEN_CACHE_TIMEOUT", 60))
+
+# Request metrics, see apps.monitoring: Server-Timing response header (off by
+# default, it discloses internals), and the token required by the metrics
+# endpoint (disabled when not set)
+SERVER_TIMING = env("SERVER_TIMING", "0") == "1"
+METRICS_TOKEN = env("METRICS_TOKEN")
+
+# Slow query and N+1 detection, see apps.monitoring.inspection: share of
+# requests inspected (0 disables it), slow query threshold in milliseconds and
+# identical queries in a request flagged as N+1
+QUERY_INSPECTION_SAMPLE_RATE = float(env("QUERY_INSPECTION_SAMPLE_RATE", 0))
+SLOW_QUERY_MS = float(env("SLOW_QUERY_MS", 100))
+N_PLUS_ONE_REPEATS = int(env("N_PLUS_ONE_REPEATS", 5))
+
+# Request profiles of staff users (X-Profile header), see
+# apps.monitoring.profiling: directory and number of profiles kept
+PROFILE_DIR = env("PROFILE_DIR", str(os.path.join(BASE_DIR, "profiles")))
+PROFILE_RETENTION = int(env("PROFILE_RETENTION", 20))
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -147,9 +200,19 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework.authentication.TokenAuthentication",
+        "apps.accounts.authentication.CachedTokenAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticated",),
+    # orjson backed JSON, stdlib json when orjson is not installed
+    "DEFAULT_RENDERER_CLASSES": (
+        "mini_aspire.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "mini_aspire.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 50,
     "TEST_REQUEST_DEFAULT_FORMAT": "json",
@@ -29,6 +29,10 @@ urlpatterns = [
     path("api/auth/login/", CustomObtainAuthToken.as_view(), name="token_login"),
     path("api/auth/register/", RegisterUserView.as_view(), name="register"),
     path("api/loans/", include("apps.loans.urls")),
+    # Async read endpoints, served without blocking under ASGI
+    path("api/async/loans/", include("apps.loans.async_urls")),
+    # Request metrics and profiles
+    path("", include("apps.monitoring.urls")),
     # Swagger
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),